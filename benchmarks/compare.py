@@ -0,0 +1,48 @@
+"""
+Compare two benchmark JSON files.
+
+    python -m benchmarks.compare base.json new.json [--threshold 1.10]
+
+Prints new/base ratios of wall time and peak memory per (case, size) and
+exits 1 if any wall-time ratio exceeds the threshold.
+"""
+from __future__ import annotations
+import argparse
+import json
+import sys
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return {(r["case"], r["size"]): r for r in json.load(f)["results"]}
+
+def compare(base: dict, new: dict) -> list:
+    rows = []
+    for key in sorted(base.keys() & new.keys()):
+        b, n = base[key], new[key]
+        rows.append({
+            "case": key[0], "size": key[1],
+            "wall_ratio": n["wall_s"] / b["wall_s"] if b["wall_s"] else float("inf"),
+            "mem_ratio": n["peak_mem_bytes"] / b["peak_mem_bytes"] if b["peak_mem_bytes"] else float("inf"),
+            "base_ms": b["wall_s"] * 1e3, "new_ms": n["wall_s"] * 1e3,
+        })
+    return rows
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("base")
+    ap.add_argument("new")
+    ap.add_argument("--threshold", type=float, default=1.10)
+    args = ap.parse_args(argv)
+
+    rows = compare(load(args.base), load(args.new))
+    worse = 0
+    for r in rows:
+        flag = ""
+        if r["wall_ratio"] > args.threshold:
+            flag, worse = "  <-- slower", worse + 1
+        print(f"{r['case']:<38} {r['size']:>7}  {r['base_ms']:10.2f} -> {r['new_ms']:10.2f} ms"
+              f"  x{r['wall_ratio']:.2f} time  x{r['mem_ratio']:.2f} mem{flag}")
+    return 1 if worse else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Seeded synthetic instances for the benchmarks.
+
+`make_instance(n, seed)` scales every axis with n: n ports for the
+financials/LP path and n buyers (spread over countries) for the buyer
+allocators, over a fixed 12-month horizon. Same (n, seed) -> same instance.
+"""
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+from models import LNGBuyer, SELL_POSITION
+from model.curves import CurveSet, ForwardCurve, month_starts
+
+RATINGS = ["AAA", "AA", "A", "BBB", "BB", "B", "CCC"]
+PROFILES = ["Utility", "Trader", "Industrial", "Portfolio"]
+N_MONTHS = 12
+
+def make_months(n_months: int = N_MONTHS, start: str = "2026-01") -> list:
+    return [pd.Timestamp(d).strftime("%b-%Y") for d in month_starts(start, n_months)]
+
+def make_curves(months: list, rng: np.random.Generator) -> CurveSet:
+    "HH / BRENT_MMBTU / JKM monthly curves: a level, a winter bump and a little noise."
+    t = np.arange(len(months))
+    winter = np.cos(2 * np.pi * t / 12.0)
+    def curve(name, level, season, noise):
+        values = level + season * winter + rng.normal(0.0, noise, len(months))
+        return ForwardCurve.from_points(dict(zip(months, np.round(values, 3))), name=name)
+    return CurveSet({
+        "HH": curve("HH", 3.5, 0.6, 0.1),
+        "BRENT_MMBTU": curve("BRENT_MMBTU", 12.0, 0.4, 0.2),
+        "JKM": curve("JKM", 12.5, 1.5, 0.3),
+    })
+
+def make_ports(n: int, rng: np.random.Generator) -> pd.DataFrame:
+    "Same schema as data/ports.csv."
+    return pd.DataFrame({
+        "name": [f"Port {i}" for i in range(n)],
+        "code": [f"P{i:06d}" for i in range(n)],
+        "distance_nm": rng.uniform(300.0, 12_000.0, n).round(0),
+        "monthly_capacity_cargo": rng.integers(1, 15, n).astype(float),
+        "handling_fee_per_unit": rng.uniform(0.1, 0.5, n).round(3),
+    })
+
+def make_buyers(n: int, months: list, curves: CurveSet, countries: list, rng: np.random.Generator) -> list:
+    "LNGBuyers priced off JKM plus a buyer spread; PD comes from LNGBuyer's rating table."
+    jkm = curves["JKM"](months)
+    spread = rng.normal(0.5, 0.8, n)
+    country = rng.integers(0, len(countries), n)
+    rating = rng.integers(0, len(RATINGS), n)
+    profile = rng.integers(0, len(PROFILES), n)
+    negotiation = rng.uniform(0.9, 1.1, n)
+    return [
+        LNGBuyer(
+            name=f"Buyer {i:06d}",
+            country=countries[country[i]],
+            profile=PROFILES[profile[i]],
+            credit_rating=RATINGS[rating[i]],
+            negotiation_factor=float(negotiation[i]),
+            price={m: float(p) for m, p in zip(months, np.round(jkm + spread[i], 4))},
+        )
+        for i in range(n)
+    ]
+
+def make_instance(n: int, seed: int = 0, n_months: int = N_MONTHS) -> dict:
+    """
+    Returns ports_df, price_map, assumptions, supply (cargo units) for the
+    LP path and months, curves, countries, buyers, final_costs, caps,
+    buyer_total_by_mc, monthly_supply (MMBtu) for the buyer allocators.
+    """
+    rng = np.random.default_rng(seed)
+    months = make_months(n_months)
+    curves = make_curves(months, rng)
+
+    ports = make_ports(n, rng)
+    price_map = dict(zip(ports["code"], rng.uniform(9.0, 16.0, n).round(3)))
+    assumptions = {
+        "boiloff_rate_per_1000nm": 0.0015,
+        "freight_cost_per_nm_per_unit": 0.0005,
+        "variable_cost_per_unit": 5.0,
+        "carbon_cost_per_unit": 0.0,
+    }
+    supply = float(ports["monthly_capacity_cargo"].sum() * 0.6)
+
+    n_countries = max(3, min(50, n // 20))
+    countries = [f"C{k:02d}" for k in range(n_countries)]
+    buyers = make_buyers(n, months, curves, countries, rng)
+    hh = curves["HH"](months)
+    final_costs = {
+        m: {c: float(v) for c, v in zip(countries, np.round(hh[i] * 1.15 + 6.0 + rng.uniform(0.0, 2.0, n_countries), 4))}
+        for i, m in enumerate(months)
+    }
+    # caps sized so that a month's caps are ~2x the monthly supply
+    monthly_supply = SELL_POSITION * max(1.0, n / 8.0)
+    cap_scale = 2.0 * monthly_supply / n
+    caps = {m: {b.name: float(v) for b, v in zip(buyers, rng.uniform(0.0, 2.0 * cap_scale, n).round(0))}
+            for m in months}
+    buyer_total_by_mc = {}
+    for m in months:
+        per_country = dict.fromkeys(countries, 0.0)
+        for b in buyers:
+            per_country[b.country] += caps[m][b.name]
+        buyer_total_by_mc[m] = {c: 0.8 * v for c, v in per_country.items()}
+    return {
+        "n": n, "seed": seed,
+        "ports_df": ports, "price_map": price_map, "assumptions": assumptions, "supply": supply,
+        "months": months, "curves": curves, "countries": countries, "buyers": buyers,
+        "final_costs": final_costs, "caps": caps, "buyer_total_by_mc": buyer_total_by_mc,
+        "monthly_supply": monthly_supply,
+    }
@@ -0,0 +1,225 @@
+"""
+Benchmark harness.
+
+    python -m benchmarks.run                              # default sizes, all cases
+    python -m benchmarks.run --sizes 10 1000 --cases greedy --out bench.json
+
+Each case is timed `--repeat` times after one warm-up call (wall time via
+perf_counter), then run once more under tracemalloc for peak Python heap.
+Cases that call a solver also report solver time. Results are written as
+JSON (see `benchmarks.compare` to diff two runs).
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.generate import make_instance, make_months
+from model.allocation import greedy_allocate, greedy_profit_table
+from model.credit import credit_risk_tables
+from model.financials import build_unit_profit_table, unit_profit_arrays
+from model.network import network_profit_table
+from model.optimisation import AllocationModel, optimise_allocation, optimise_cargo_lots
+from model.simulation import simulate_pnl
+from model.stochastic import scenario_arrays, solve_two_stage
+
+DEFAULT_SIZES = [10, 100, 1_000, 10_000, 100_000]
+REPORTED = ("solver_s", "method")  # keys a case may return alongside its timing
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return {"solver_s": time.perf_counter() - t0}
+
+def _case_unit_profit_table(inst):
+    return lambda: build_unit_profit_table(inst["ports_df"], inst["price_map"], inst["assumptions"])
+
+def _case_optimise_closed_form(inst):
+    table = build_unit_profit_table(inst["ports_df"], inst["price_map"], inst["assumptions"])
+    return lambda: optimise_allocation(table, inst["supply"])
+
+def _case_optimise_cbc(inst):
+    # a no-op extra constraint forces the PuLP/CBC path
+    table = build_unit_profit_table(inst["ports_df"], inst["price_map"], inst["assumptions"])
+
+    def run():
+        model = AllocationModel(table, inst["supply"], extra_constraints=[lambda m, x: None])
+        model.solve()
+        return {"solver_s": model._lp.solutionTime}
+    return run
+
+def _greedy_arrays(inst):
+    months, buyers = inst["months"], inst["buyers"]
+    price = np.array([[b.price[m] for b in buyers] for m in months])
+    cost = np.array([[inst["final_costs"][m][b.country] for b in buyers] for m in months])
+    cap = np.array([[inst["caps"][m][b.name] for b in buyers] for m in months])
+    pd_ = np.array([b.probability_of_default for b in buyers])
+    return price, cost, cap, pd_
+
+def _case_greedy_profit_table(inst):
+    # the whole-horizon greedy table; the app runs the same greedy_allocate month by month (IncrementalAllocator)
+    arrays = _greedy_arrays(inst)
+
+    def run():
+        greedy_profit_table(inst["buyers"], inst["months"], inst["final_costs"], inst["caps"],
+                            inst["monthly_supply"])
+        return _timed(lambda: greedy_allocate(*arrays, inst["monthly_supply"]))
+    return run
+
+def _case_greedy_sensitivity(inst):
+    arrays = _greedy_arrays(inst)
+    return lambda: greedy_allocate(*arrays, inst["monthly_supply"], sensitivity=True)
+
+def _case_network(inst, **kwargs):
+    def run():
+        out = network_profit_table(inst["buyers"], inst["months"], inst["final_costs"], inst["caps"],
+                                   inst["buyer_total_by_mc"], inst["monthly_supply"], **kwargs)
+        return {"method": out["result"]["method"]}
+    return run
+
+def _case_credit_monte_carlo(inst):
+    table = greedy_profit_table(inst["buyers"], inst["months"], inst["final_costs"], inst["caps"],
+                                inst["monthly_supply"])["table"]
+    return lambda: credit_risk_tables(table, paths=100_000)
+
+def _case_simulated_pnl(inst):
+    codes = inst["ports_df"]["code"]
+    inputs = {"assumptions": {**inst["assumptions"], "supply_cargo_units": inst["supply"]},
+              "prices_usd_per_unit": inst["price_map"], "market_volatility": dict.fromkeys(codes, 0.2)}
+    return lambda: simulate_pnl(inst["ports_df"], inputs, inst["months"], paths=100_000)
+
+def _case_cargo_lots(inst, n_months: int = 60):
+    # seasonal prices over a multi-year horizon; vessels tied up for the round trip at 15 knots
+    months = make_months(n_months)
+    season = 1.0 + 0.2 * np.cos(2 * np.pi * np.arange(n_months) / 12.0)
+    prices = season[:, None] * np.array([inst["price_map"][c] for c in inst["ports_df"]["code"]])
+    unit_profit = unit_profit_arrays(inst["ports_df"], prices, inst["assumptions"])["unit_profit"]
+    capacity = inst["ports_df"]["monthly_capacity_cargo"].to_numpy()
+    voyage_months = np.ceil(2 * inst["ports_df"]["distance_nm"].to_numpy() / (15 * 24) / 30)
+    lots, fleet = np.floor(inst["supply"]), int(1.5 * inst["supply"])
+    return lambda: optimise_cargo_lots(unit_profit, np.broadcast_to(capacity, unit_profit.shape), lots, 1.0,
+                                       voyage_months, fleet, lot_volume=1.0, months=months, bound=False)
+
+def _case_two_stage(inst, paths: int = 100):
+    codes = inst["ports_df"]["code"]
+    inputs = {"assumptions": inst["assumptions"], "prices_usd_per_unit": inst["price_map"],
+              "market_volatility": dict.fromkeys(codes, 0.25)}
+    scenarios = [{"name": "Base"}, {"name": "Outage", "capacity_multipliers": {codes[0]: 0.5}},
+                 {"name": "Shock", "price_shocks": {codes[len(codes) // 2]: 3.0}}]
+    data = scenario_arrays(inst["ports_df"], inputs, make_months(12), scenarios, paths=paths)
+    lots = np.floor(inst["supply"])
+    return lambda: solve_two_stage(data["profit"], data["capacity"], lots, data["prob"], cancel_cost=1.0,
+                                   max_cancel=lots)
+
+# name -> (setup(instance) -> zero-arg callable, largest size to run)
+CASES = {
+    "financials.build_unit_profit_table": (_case_unit_profit_table, None),
+    "optimisation.closed_form": (_case_optimise_closed_form, None),
+    "optimisation.cbc": (_case_optimise_cbc, 10_000),
+    "allocation.greedy_profit_table": (_case_greedy_profit_table, None),
+    "allocation.greedy_sensitivity": (_case_greedy_sensitivity, None),
+    "network.tree": (_case_network, None),
+    "network.ssp_storage": (lambda inst: _case_network(inst, storage_cost=0.05), 10_000),
+    "credit.monte_carlo_100k_paths": (_case_credit_monte_carlo, 1_000),
+    "simulation.pnl_100k_paths": (_case_simulated_pnl, 100),
+    "optimisation.cargo_lots_60_months": (_case_cargo_lots, 100),
+    "stochastic.benders_300_scenarios": (_case_two_stage, 10_000),
+}
+
+def measure(fn, repeat: int, budget_s: float) -> dict:
+    fn()  # warm-up (imports, caches, first-touch allocations)
+    walls, extra = [], {}
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        walls.append(time.perf_counter() - t0)
+        if isinstance(out, dict):
+            for k in REPORTED:
+                if k in out:
+                    extra.setdefault(k, []).append(out[k])
+        if sum(walls) > budget_s:
+            break
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    row = {
+        "wall_s": statistics.median(walls),
+        "wall_min_s": min(walls),
+        "repeats": len(walls),
+        "peak_mem_bytes": peak,
+    }
+    for k, vals in extra.items():
+        row[k] = statistics.median(vals) if isinstance(vals[0], (int, float)) else vals[0]
+    return row
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment() -> dict:
+    import pandas as pd
+    import pulp
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_rev": _git_rev(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "pulp": pulp.__version__,
+    }
+
+def run(sizes, cases=None, seed: int = 0, repeat: int = 5, budget_s: float = 30.0, log=print) -> dict:
+    names = [n for n in CASES if not cases or any(c in n for c in cases)]
+    results = []
+    for n in sizes:
+        t0 = time.perf_counter()
+        inst = make_instance(n, seed)
+        log(f"n={n}: instance built in {time.perf_counter() - t0:.2f}s")
+        for name in names:
+            setup, max_n = CASES[name]
+            if max_n is not None and n > max_n:
+                continue
+            row = {"case": name, "size": n, **measure(setup(inst), repeat, budget_s)}
+            results.append(row)
+            log(f"  {name:<38} {row['wall_s'] * 1e3:10.2f} ms  peak {row['peak_mem_bytes'] / 2**20:8.1f} MiB")
+    return {"env": environment(), "seed": seed, "results": results}
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    ap.add_argument("--cases", nargs="*", help="substring filters on case names")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--budget", type=float, default=30.0, help="stop repeating a case after this many seconds")
+    ap.add_argument("--out", default=None, help="JSON output path (default benchmarks/results/<rev>-<time>.json)")
+    args = ap.parse_args(argv)
+
+    report = run(args.sizes, args.cases, args.seed, args.repeat, args.budget)
+    out = args.out
+    if out is None:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        out = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results",
+                           f"{report['env']['git_rev'] or 'local'}-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+from __future__ import annotations
+import numpy as np
+from models import BuyerBook
+from . import trace
+from .sensitivity import fill_sensitivity, filled_before
+
+@trace.traced("allocation.greedy")
+def greedy_allocate(price, cost, cap, pd_, supply, sensitivity: bool = False) -> dict:
+    """
+    Month-by-month greedy fill on (months, buyers) arrays.
+
+    For every month, buyers with cap > 0 and a finite price are ranked by
+    margin = price - cost (descending, ties keep buyer order) and filled up to
+    their cap until that month's supply is used (the app's allocation rule, run
+    per month by `model.incremental.IncrementalAllocator`), done with one
+    argsort and one cumsum.
+
+    price, cost, cap : (M, B) arrays; NaN price = buyer has no price that month
+    pd_              : (B,) or (M, B) probability of default
+    supply           : scalar or (M,) supply per month
+
+    Returns a dict with
+      "allocation" (M, B), "leftover" (M,), "margin" (M, B) and
+      "columns": one array per allocated row (take > 0), in month then rank
+      order: month_idx, buyer_idx, volume, price, final_cost, margin, profit,
+      pd, adjusted_profit.
+    With `sensitivity=True` also "sensitivity": per-month `fill_sensitivity`
+    arrays on margin under the greedy rule (supply_dual = margin of the next
+    MMBtu, profit_range[..., 1] = margin a buyer needs to get volume).
+    """
+    price = np.asarray(price, dtype=float)
+    cost = np.asarray(cost, dtype=float)
+    cap = np.asarray(cap, dtype=float)
+    n_m, n_b = price.shape
+    pd_ = np.broadcast_to(np.asarray(pd_, dtype=float), (n_m, n_b))
+    supply = np.broadcast_to(np.asarray(supply, dtype=float), (n_m,))
+
+    valid = (cap > 0) & ~np.isnan(price)
+    margin = price - cost
+    order = np.argsort(-np.where(valid, margin, -np.inf), axis=1, kind="stable")
+
+    cap_sorted = np.take_along_axis(np.where(valid, cap, 0.0), order, axis=1)
+    take_sorted = np.clip(supply[:, None] - filled_before(cap_sorted, axis=1), 0.0, cap_sorted)
+
+    allocation = np.zeros((n_m, n_b))
+    np.put_along_axis(allocation, order, take_sorted, axis=1)
+    leftover = np.maximum(supply - cap_sorted.sum(axis=1), 0.0)
+
+    month_idx, rank = np.nonzero(take_sorted > 0)
+    buyer_idx = order[month_idx, rank]
+    volume = take_sorted[month_idx, rank]
+    row_margin = margin[month_idx, buyer_idx]
+    row_pd = pd_[month_idx, buyer_idx]
+    profit = row_margin * volume
+    out = {
+        "allocation": allocation,
+        "leftover": leftover,
+        "margin": margin,
+        "columns": {
+            "month_idx": month_idx,
+            "buyer_idx": buyer_idx,
+            "volume": volume,
+            "price": price[month_idx, buyer_idx],
+            "final_cost": cost[month_idx, buyer_idx],
+            "margin": row_margin,
+            "profit": profit,
+            "pd": row_pd,
+            "adjusted_profit": profit * (1 - row_pd),
+        },
+    }
+    if sensitivity:
+        out["sensitivity"] = fill_sensitivity(margin, cap, supply, allocation, positive_only=False)
+    return out
+
+PROFIT_TABLE_COLUMNS = [
+    "Month", "Country", "Buyer", "Allocated Volume (MMBtu)", "Buyer Price ($/MMBtu)",
+    "Final Cost ($/MMBtu)", "Margin ($/MMBtu)", "Profit (USD)", "Credit Rating",
+    "Probability of Default", "Adjusted Profit (USD)", "Profile",
+]
+
+def buyer_arrays(buyers, months: list, final_costs: dict, buyer_caps_by_month: dict | None = None) -> dict:
+    """
+    (months x buyers) price / cost / cap arrays plus pd (buyers,) and country
+    labels for a list of LNGBuyer-likes or a BuyerBook. A BuyerBook is read
+    column-wise (no per-buyer lookups); its own caps are used when
+    buyer_caps_by_month is None.
+    """
+    if isinstance(buyers, BuyerBook):
+        labels = buyers.country_labels
+        by_country = np.array([[final_costs[m].get(c, np.nan) for c in labels] for m in months], dtype=float)
+        if buyer_caps_by_month is None:
+            cap = buyers.cap_matrix(months)
+        else:
+            cap = np.zeros((len(months), len(buyers)))
+            for k, m in enumerate(months):
+                for name, v in buyer_caps_by_month.get(m, {}).items():
+                    i = buyers.name_index.get(name)
+                    if i is not None:
+                        cap[k, i] = v
+        return {
+            "price": buyers.price_matrix(months),
+            "cost": by_country[:, buyers.country_code],
+            "cap": cap,
+            "pd": buyers.pd,
+            "country": buyers.country,
+            "names": buyers.names,
+        }
+    caps = buyer_caps_by_month or {}
+    return {
+        "price": np.array([[b.price.get(m, np.nan) for b in buyers] for m in months], dtype=float),
+        "cost": np.array([[final_costs[m][b.country] for b in buyers] for m in months], dtype=float),
+        "cap": np.array([[caps.get(m, {}).get(b.name, 0.0) for b in buyers] for m in months], dtype=float),
+        "pd": np.array([getattr(b, "probability_of_default", 0.0) for b in buyers], dtype=float),
+        "country": [b.country for b in buyers],
+        "names": [b.name for b in buyers],
+    }
+
+def _buyer_column(buyers, attr: str, idx) -> list:
+    "One attribute for the buyers at `idx`; column-wise for a BuyerBook."
+    if isinstance(buyers, BuyerBook):
+        if attr == "name":
+            return [buyers.names[j] for j in idx]
+        labels, codes = {"country": (buyers.country_labels, buyers.country_code),
+                         "credit_rating": (buyers.rating_labels, buyers.rating_code),
+                         "profile": (buyers.profile_labels, buyers.profile_code)}[attr]
+        return np.asarray(labels, dtype=object)[codes[idx]].tolist()
+    return [getattr(buyers[j], attr) for j in idx]
+
+@trace.traced("allocation.profit_table")
+def profit_table(res: dict, months: list, buyers):
+    "App-facing DataFrame for a `greedy_allocate` result; `months` are labels, `buyers` LNGBuyer-likes or a BuyerBook."
+    import pandas as pd
+
+    cols = res["columns"]
+    mi, bi = cols["month_idx"], cols["buyer_idx"]
+    return pd.DataFrame({
+        "Month": [months[i] for i in mi],
+        "Country": _buyer_column(buyers, "country", bi),
+        "Buyer": _buyer_column(buyers, "name", bi),
+        "Allocated Volume (MMBtu)": cols["volume"],
+        "Buyer Price ($/MMBtu)": cols["price"],
+        "Final Cost ($/MMBtu)": cols["final_cost"],
+        "Margin ($/MMBtu)": cols["margin"],
+        "Profit (USD)": cols["profit"],
+        "Credit Rating": _buyer_column(buyers, "credit_rating", bi),
+        "Probability of Default": cols["pd"],
+        "Adjusted Profit (USD)": cols["adjusted_profit"],
+        "Profile": _buyer_column(buyers, "profile", bi),
+    }, columns=PROFIT_TABLE_COLUMNS)
+
+def greedy_profit_table(buyers, months: list, final_costs: dict, buyer_caps_by_month: dict | None,
+                        monthly_supply_mmbtu) -> dict:
+    """
+    Greedy allocation straight from the buyer book.
+
+    buyers:       LNGBuyer-likes (name, country, price {month: $/MMBtu}, probability_of_default, ...)
+                  or a BuyerBook
+    months:       month labels
+    final_costs:  {month: {country: $/MMBtu}}
+    buyer_caps_by_month: {month: {buyer_name: cap_mmbtu}} (not modified); None = the book's caps
+
+    Returns {"table": DataFrame, "leftover": {month: MMBtu},
+             "caps_drawn": {month: {buyer_name: cap - allocated}} for allocated buyers}.
+    """
+    arr = buyer_arrays(buyers, months, final_costs, buyer_caps_by_month)
+    cap, names = arr["cap"], arr["names"]
+
+    res = greedy_allocate(arr["price"], arr["cost"], cap, arr["pd"], monthly_supply_mmbtu)
+    cols = res["columns"]
+    caps_drawn = {m: {} for m in months}
+    for i, j, take in zip(cols["month_idx"], cols["buyer_idx"], cols["volume"]):
+        caps_drawn[months[i]][names[j]] = cap[i, j] - take
+    return {
+        "table": profit_table(res, months, buyers),
+        "leftover": {m: float(left) for m, left in zip(months, res["leftover"])},
+        "caps_drawn": caps_drawn,
+    }
@@ -0,0 +1,153 @@
+from __future__ import annotations
+import copy
+import dataclasses
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+def _feed(h, obj) -> None:
+    "Feed a canonical, type-tagged encoding of `obj` into hash `h`."
+    if obj is None or isinstance(obj, (bool, int, float, str, np.generic)):
+        h.update(f"{type(obj).__name__}:{obj!r};".encode())
+    elif isinstance(obj, pd.DataFrame):
+        h.update(b"df:" + repr((list(obj.columns), [str(t) for t in obj.dtypes])).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, pd.Series):
+        h.update(b"series:" + repr((obj.name, str(obj.dtype))).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(f"nd:{obj.dtype}:{obj.shape};".encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        h.update(f"dict:{len(obj)};".encode())
+        for k in sorted(obj, key=repr):
+            _feed(h, k)
+            _feed(h, obj[k])
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"{type(obj).__name__}:{len(obj)};".encode())
+        for v in obj:
+            _feed(h, v)
+    elif dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        h.update(f"dc:{type(obj).__qualname__};".encode())
+        _feed(h, dataclasses.asdict(obj))
+    else:
+        # callables etc. have no stable content hash; callers pass an explicit key instead
+        raise TypeError(f"cannot hash {type(obj).__name__} for the result cache")
+
+def stable_hash(*parts) -> str:
+    "Content hash of DataFrames, arrays, dataclasses and plain containers; stable across processes."
+    h = hashlib.sha256()
+    for p in parts:
+        _feed(h, p)
+    return h.hexdigest()
+
+class ResultCache:
+    """
+    Two-tier result cache keyed by `stable_hash` digests.
+    - memory: LRU bounded to `max_entries`
+    - disk (optional): one pickle per key under `disk_dir`, promoted to memory on hit
+    Values are deep-copied on the way in and out so callers can mutate what they get.
+    Safe to share between threads (e.g. Streamlit sessions): the memory tier and
+    counters sit behind a lock; `fn` in `get_or_compute` runs outside it.
+    """
+
+    def __init__(self, max_entries: int = 256, disk_dir: str | Path | None = None):
+        self.max_entries = int(max_entries)
+        self.disk_dir = Path(disk_dir) if disk_dir is not None else None
+        self._mem: OrderedDict[str, object] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.pkl"
+
+    def _remember(self, key: str, value) -> None:
+        "Insert `key` as most recent and evict the oldest; call with the lock held."
+        self._mem[key] = value
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def get(self, key: str, default=None):
+        missing = object()
+        with self._lock:
+            value = self._mem.get(key, missing)
+            if value is not missing:
+                self._mem.move_to_end(key)
+                self.hits += 1
+        if value is not missing:
+            return copy.deepcopy(value)
+        if self.disk_dir is not None:
+            path = self._path(key)
+            try:
+                with open(path, "rb") as fh:
+                    value = pickle.load(fh)
+            except FileNotFoundError:
+                pass
+            else:
+                with self._lock:
+                    self._remember(key, value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return copy.deepcopy(value)
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def put(self, key: str, value) -> None:
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._remember(key, value)
+        if self.disk_dir is not None:
+            path = self._path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, "wb") as fh:
+                pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+
+    def get_or_compute(self, key: str, fn):
+        """
+        Return the cached value for `key`, or call `fn()` and cache its result.
+        Two threads missing the same key may both compute it; the last put wins.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = fn()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        "Drop the memory tier (the disk tier is left in place)."
+        with self._lock:
+            self._mem.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                    "entries": len(self._mem), "max_entries": self.max_entries}
+
+def cached_optimise_allocation(cache: ResultCache, unit_table: pd.DataFrame, total_supply_units: float,
+                               extra_constraints=None, constraint_key=None) -> dict:
+    """
+    `optimise_allocation` through `cache`. Extra constraints are callables and
+    cannot be content-hashed, so they need a `constraint_key` naming the set.
+    """
+    from .optimisation import optimise_allocation
+
+    if extra_constraints and constraint_key is None:
+        raise ValueError("constraint_key is required when extra_constraints are given")
+    key = stable_hash("optimise_allocation", unit_table["code"].tolist(),
+                      unit_table["unit_profit"].to_numpy(dtype=float),
+                      unit_table["monthly_capacity_cargo"].to_numpy(dtype=float),
+                      float(total_supply_units), constraint_key)
+    return cache.get_or_compute(
+        key, lambda: optimise_allocation(unit_table, total_supply_units, extra_constraints))
@@ -0,0 +1,367 @@
+"""
+Headless batch runs of the model pipeline (no Streamlit import).
+
+    python -m model.cli grid config.json --out grid.parquet --workers 8
+    python -m model.cli allocate config.json --out alloc.jsonl [--detail]
+    python -m model.cli simulate config.json --paths 1000000 --workers 8 [--out pnl.parquet]
+    python -m model.cli stochastic config.json --paths 100 --workers 8 [--out values.jsonl]
+    python -m model.cli example > config.json
+
+`grid` solves the port LP for every scenario (one base unit table,
+re-solved per scenario via AllocationModel.apply_scenario). `allocate` runs the buyer allocation (greedy or
+network engine) for every scenario; a scenario's price_shocks are keyed by
+buyer country and "supply" is MMBtu per month. `simulate` draws price
+paths from base_inputs volatility / seasonality (model.simulation) and
+prints the optimal P&L distribution as JSON; `--out` also writes the
+per-path P&L. `stochastic` picks one lifting plan across every
+(scenario, price path) pair by Benders decomposition (model.stochastic)
+and prints it as JSON; `--out` also writes each pair's profit under the
+plan. Results are written one record at a time: JSON lines
+(".jsonl", or "-" for stdout) or Parquet (".parquet", flushed every
+`--batch` rows), so memory stays flat however many scenarios run.
+
+Config (JSON; relative paths are resolved against the config file):
+
+    ports         ports.csv path                    (default data/ports.csv)
+    base_inputs   base_inputs.json path             (default data/base_inputs.json)
+    buyers        list of LNGBuyer fields, each optionally with caps {month: MMBtu};
+                  inline or a path to a JSON file   (default: model.market.BUYERS)
+    caps          {month: {buyer: MMBtu}}; inline or a path to a JSON file
+                                                    (default: derived from market defaults)
+    scenarios     list of scenario dicts, or {"named": [...]} (model.scenarios.SCENARIOS),
+                  or {"grid": {price_shocks, capacity_multipliers, supply_levels}}
+    allocate      overrides for `allocate`: engine ("greedy" | "network"),
+                  scenarios (price shocks by country, supply in MMBtu/month),
+                  route ("Panama" | "Suez" | "Cape" | "Cheapest") and delay_days {canal route: days}
+    simulate      options for `simulate`: kind ("gbm" | "ou"), corr, mean_reversion,
+                  months (labels), supply (cargo units/month), elastic_capacity, seed
+    stochastic    options for `stochastic`: kind, corr, mean_reversion, seed, months,
+                  lots (cargo units/month, default supply_cargo_units), cancel_cost,
+                  distress_cost, max_cancel (lots over the horizon)
+"""
+from __future__ import annotations
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow ships with streamlit
+    pa = pq = None
+
+from models import BuyerBook, SELL_POSITION
+from .scenarios import SCENARIOS, scenario_grid
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+EXAMPLE_CONFIG = {
+    "ports": "data/ports.csv",
+    "base_inputs": "data/base_inputs.json",
+    "scenarios": {"grid": {
+        "price_shocks": {"JP": [0.0, 1.5, 3.0], "CN": [0.0, 1.5]},
+        "capacity_multipliers": {"SLNG": [1.0, 0.5]},
+        "supply_levels": [15, 20],
+    }},
+    "allocate": {
+        "engine": "greedy",
+        "scenarios": {"grid": {
+            "price_shocks": {"JP": [0.0, 1.0], "CN": [-1.0, 0.0, 1.0]},
+            "supply_levels": [3_000_000, 3_800_000],
+        }},
+    },
+    "simulate": {"kind": "gbm", "corr": 0.6, "seed": 0},
+    "stochastic": {"kind": "ou", "seed": 0, "cancel_cost": 1.5, "distress_cost": 5.0, "max_cancel": 24},
+}
+
+# ---- writers ----
+class JsonlWriter:
+    def __init__(self, path):
+        self._own = path != "-"
+        self._f = open(path, "w") if self._own else sys.stdout
+        self.rows = 0
+
+    def write(self, record: dict) -> None:
+        self._f.write(json.dumps(record, default=float) + "\n")
+        self.rows += 1
+
+    def close(self) -> None:
+        self._f.flush()
+        if self._own:
+            self._f.close()
+
+class ParquetWriter:
+    "Buffers `batch` records, then appends them as one row group; schema comes from the first batch."
+
+    def __init__(self, path, batch: int = 4096):
+        if pq is None:
+            raise RuntimeError("Parquet output needs pyarrow; write .jsonl instead")
+        self.path, self.batch = path, int(batch)
+        self._buf, self._writer, self.rows = [], None, 0
+
+    def write(self, record: dict) -> None:
+        self._buf.append(record)
+        if len(self._buf) >= self.batch:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._buf:
+            return
+        if self._writer is None:
+            table = pa.Table.from_pylist(self._buf)
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        else:
+            table = pa.Table.from_pylist(self._buf, schema=self._writer.schema)
+        self._writer.write_table(table)
+        self.rows += len(self._buf)
+        self._buf = []
+
+    def close(self) -> None:
+        self._flush()
+        if self._writer is not None:
+            self._writer.close()
+
+def open_writer(path: str, batch: int = 4096):
+    if path == "-" or path.endswith((".jsonl", ".ndjson")):
+        return JsonlWriter(path)
+    if path.endswith(".parquet"):
+        return ParquetWriter(path, batch)
+    raise ValueError(f"unknown output format for {path!r} (use .jsonl, .parquet or -)")
+
+# ---- config ----
+def load_config(path) -> dict:
+    path = Path(path)
+    cfg = json.loads(path.read_text())
+    cfg["_dir"] = path.resolve().parent
+    return cfg
+
+def _resolve(cfg: dict, key: str, default: Path) -> Path:
+    value = cfg.get(key)
+    if value is None:
+        return default
+    p = Path(value)
+    return p if p.is_absolute() else cfg.get("_dir", Path.cwd()) / p
+
+def _json_value(cfg: dict, key: str):
+    "A config value given inline, or as a path (string) to a JSON file."
+    value = cfg[key]
+    return json.loads(_resolve(cfg, key, DATA_DIR).read_text()) if isinstance(value, str) else value
+
+def iter_scenarios(cfg: dict):
+    spec = cfg.get("scenarios")
+    if spec is None:
+        yield from SCENARIOS.values()
+    elif isinstance(spec, list):
+        yield from spec
+    elif "named" in spec:
+        for name in spec["named"]:
+            yield SCENARIOS[name]
+    elif "grid" in spec:
+        yield from scenario_grid(**spec["grid"])
+    else:
+        raise ValueError("scenarios must be a list, {'named': [...]} or {'grid': {...}}")
+
+def load_buyers(cfg: dict, months: list) -> BuyerBook:
+    "The buyer book as a BuyerBook (rows may carry their own caps {month: MMBtu})."
+    if cfg.get("buyers") is None:
+        from .market import BUYERS
+        return BuyerBook.from_buyers(BUYERS, months)
+    return BuyerBook.from_records(_json_value(cfg, "buyers"), months)
+
+# ---- pipelines ----
+def run_grid_to(cfg: dict, writer, workers: int = 1, limit: int | None = None, progress=None) -> int:
+    from itertools import islice
+    from .grid import run_grid
+
+    ports_df = pd.read_csv(_resolve(cfg, "ports", DATA_DIR / "ports.csv"))
+    inputs = json.loads(_resolve(cfg, "base_inputs", DATA_DIR / "base_inputs.json").read_text())
+    scenarios = islice(iter_scenarios(cfg), limit)
+    n = 0
+    for res in run_grid(ports_df, inputs["prices_usd_per_unit"], inputs["assumptions"], scenarios,
+                        workers=workers, progress=progress):
+        record = {"index": res["index"], "name": res["name"], "supply": res["supply"],
+                  "objective": float(res["objective"] or 0.0)}
+        record.update({f"alloc_{code}": float(v) for code, v in res["allocation"].items()})
+        writer.write(record)
+        n += 1
+    return n
+
+def _allocation_inputs(cfg: dict) -> dict:
+    from .market import (HORIZON, MARKET_BY_MC, OPEN_PCT_DEFAULT, BUYER_OF_OPEN_PCT_DEFAULT,
+                         derive_open_and_buyer_totals, default_buyer_pct_per_month, caps_from_buyer_pct_monthly)
+    from .allocation import buyer_arrays
+    from .freight import final_costs_for_route
+    months = list(HORIZON.labels)
+    buyers = load_buyers(cfg, months)
+    final_costs = final_costs_for_route(HORIZON, cfg.get("route", "Panama"), cfg.get("delay_days"))
+    open_by_mc, buyer_total_by_mc = derive_open_and_buyer_totals(MARKET_BY_MC, OPEN_PCT_DEFAULT,
+                                                                 BUYER_OF_OPEN_PCT_DEFAULT)
+    if cfg.get("caps") is not None:
+        buyers.set_caps(_json_value(cfg, "caps"))
+    elif cfg.get("buyers") is None:
+        pct = default_buyer_pct_per_month(open_by_mc, buyer_total_by_mc)
+        buyers.set_caps(caps_from_buyer_pct_monthly(pct, open_by_mc, buyer_total_by_mc))
+    countries = list(buyer_total_by_mc[months[0]])
+    arr = buyer_arrays(buyers, months, final_costs)
+    return {
+        "buyers": buyers, "months": months, "countries": countries, "buyer_total_by_mc": buyer_total_by_mc,
+        "price": arr["price"], "cost": arr["cost"], "cap": arr["cap"], "pd": arr["pd"],
+        "country": np.asarray(arr["country"]),
+        "totals": np.array([[buyer_total_by_mc[m][c] for c in countries] for m in months], dtype=float),
+    }
+
+def run_allocate_to(cfg: dict, writer, limit: int | None = None, detail: bool = False, progress=None) -> int:
+    """
+    One summary record per scenario (totals and leftover per month), or with
+    `detail` one record per allocated (scenario, month, buyer) row.
+    """
+    from itertools import islice
+    from .allocation import greedy_allocate, profit_table
+    from .network import allocate_network
+
+    cfg = {**cfg, **cfg.get("allocate", {})}
+    inp = _allocation_inputs(cfg)
+    engine = cfg.get("engine", "greedy")
+    months, buyers = inp["months"], inp["buyers"]
+    country_idx = np.array([inp["countries"].index(c) for c in inp["country"]])
+    n = 0
+    for i, sc in enumerate(islice(iter_scenarios(cfg), limit)):
+        shocks = sc.get("price_shocks", {})
+        price = inp["price"] + np.array([shocks.get(c, 0.0) for c in inp["country"]])[None, :]
+        supply = sc.get("supply")
+        supply = SELL_POSITION if supply is None else float(supply)
+        if engine == "network":
+            res = allocate_network(price, inp["cost"], inp["cap"], inp["pd"], country_idx, inp["totals"], supply)
+        elif engine == "greedy":
+            res = greedy_allocate(price, inp["cost"], inp["cap"], inp["pd"], supply)
+        else:
+            raise ValueError(f"unknown engine {engine!r}")
+        cols = res["columns"]
+        if detail:
+            for row in profit_table(res, months, buyers).to_dict("records"):
+                writer.write({"index": i, "name": sc.get("name", ""), **row})
+        else:
+            record = {"index": i, "name": sc.get("name", ""), "supply": supply,
+                      "volume": float(cols["volume"].sum()), "profit": float(cols["profit"].sum()),
+                      "adjusted_profit": float(cols["adjusted_profit"].sum())}
+            record.update({f"leftover_{m}": float(v) for m, v in zip(months, res["leftover"])})
+            writer.write(record)
+        n += 1
+        if progress is not None:
+            progress(n, None)
+    return n
+
+def run_simulate_to(cfg: dict, writer, paths: int, workers: int = 1) -> dict:
+    "Summary of the simulated P&L distribution; per-path P&L goes to `writer` when given."
+    from .market import HORIZON
+    from .simulation import simulate_pnl
+
+    opts = dict(cfg.get("simulate", {}))
+    ports_df = pd.read_csv(_resolve(cfg, "ports", DATA_DIR / "ports.csv"))
+    inputs = json.loads(_resolve(cfg, "base_inputs", DATA_DIR / "base_inputs.json").read_text())
+    months = opts.pop("months", None) or list(HORIZON.labels)
+    res = simulate_pnl(ports_df, inputs, months, paths=paths, workers=workers, **opts)
+    if writer is not None:
+        for i, v in enumerate(res["pnl"].tolist()):
+            writer.write({"path": i, "pnl": v})
+    return {
+        "paths": res["paths"], "mean": res["mean"], "std": res["std"],
+        "quantiles": {str(q): v for q, v in res["quantiles"].items()},
+        "month_pnl_mean": dict(zip(res["months"], res["month_pnl_mean"].tolist())),
+        "allocation_mean": {m: dict(zip(res["codes"], row)) for m, row in
+                            zip(res["months"], res["allocation_mean"].tolist())},
+    }
+
+def run_stochastic_to(cfg: dict, writer, paths: int, workers: int = 1) -> dict:
+    "Two-stage lifting plan over the config's scenarios x `paths` price paths; per-pair profit to `writer`."
+    from .market import HORIZON
+    from .stochastic import scenario_arrays, solve_two_stage
+
+    opts = dict(cfg.get("stochastic", {}))
+    ports_df = pd.read_csv(_resolve(cfg, "ports", DATA_DIR / "ports.csv"))
+    inputs = json.loads(_resolve(cfg, "base_inputs", DATA_DIR / "base_inputs.json").read_text())
+    months = opts.pop("months", None) or list(HORIZON.labels)
+    lots = opts.pop("lots", None) or inputs["assumptions"]["supply_cargo_units"]
+    solve = {k: opts.pop(k) for k in ("cancel_cost", "distress_cost", "max_cancel") if k in opts}
+    data = scenario_arrays(ports_df, inputs, months, list(iter_scenarios(cfg)), paths=paths, **opts)
+    res = solve_two_stage(data["profit"], data["capacity"], lots, data["prob"], workers=workers,
+                          names=data["names"], months=months, codes=data["codes"], **solve)
+    if writer is not None:
+        for name, v in zip(res["names"], res["scenario_value"].tolist()):
+            writer.write({"scenario": name, "value": v})
+    return {
+        "scenarios": len(res["names"]), "objective": res["objective"], "upper_bound": res["upper_bound"],
+        "gap": res["gap"], "iterations": res["iterations"],
+        "lift": dict(zip(months, res["lift"].tolist())), "cancelled": dict(zip(months, res["cancelled"].tolist())),
+        "value_quantiles": dict(zip(("0.05", "0.5", "0.95"),
+                                    np.quantile(res["scenario_value"], (0.05, 0.5, 0.95)).tolist())),
+        "allocation_mean": {m: dict(zip(res["codes"], row)) for m, row in
+                            zip(months, res["allocation_mean"].tolist())},
+    }
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m model.cli", description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ("grid", "allocate"):
+        p = sub.add_parser(name)
+        p.add_argument("config")
+        p.add_argument("--out", default="-", help=".jsonl, .parquet or - (stdout)")
+        p.add_argument("--limit", type=int, default=None, help="stop after this many scenarios")
+        p.add_argument("--batch", type=int, default=4096, help="Parquet row-group size")
+        p.add_argument("--quiet", action="store_true")
+        if name == "grid":
+            p.add_argument("--workers", type=int, default=1)
+        else:
+            p.add_argument("--detail", action="store_true", help="one record per allocated buyer-month row")
+    for name, paths, out_help in (("simulate", 100_000, "per-path P&L"),
+                                  ("stochastic", 100, "per-scenario profit under the plan")):
+        p = sub.add_parser(name)
+        p.add_argument("config")
+        p.add_argument("--paths", type=int, default=paths)
+        p.add_argument("--workers", type=int, default=1)
+        p.add_argument("--out", default=None,
+                       help=f"also write {out_help} (.jsonl, .parquet or -; with - the summary goes to stderr)")
+        p.add_argument("--batch", type=int, default=65536, help="Parquet row-group size")
+    sub.add_parser("example", help="print an example config")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "example":
+        print(json.dumps(EXAMPLE_CONFIG, indent=2))
+        return 0
+    if args.cmd in ("simulate", "stochastic"):
+        run = run_simulate_to if args.cmd == "simulate" else run_stochastic_to
+        writer = open_writer(args.out, args.batch) if args.out else None
+        try:
+            summary = run(load_config(args.config), writer, args.paths, args.workers)
+        finally:
+            if writer is not None:
+                writer.close()
+        # keep stdout a clean JSONL stream when the records go there
+        print(json.dumps(summary, indent=2), file=sys.stderr if args.out == "-" else sys.stdout)
+        return 0
+
+    cfg = load_config(args.config)
+    progress = None
+    if not args.quiet:
+        def progress(done, total):
+            if done % 1000 == 0:
+                print(f"{done} scenarios", file=sys.stderr)
+    writer = open_writer(args.out, args.batch)
+    try:
+        if args.cmd == "grid":
+            n = run_grid_to(cfg, writer, workers=args.workers, limit=args.limit, progress=progress)
+        else:
+            n = run_allocate_to(cfg, writer, limit=args.limit, detail=args.detail, progress=progress)
+    finally:
+        writer.close()
+    if not args.quiet:
+        print(f"{n} scenarios -> {args.out} ({writer.rows} rows)", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
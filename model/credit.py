@@ -0,0 +1,227 @@
+"""
+Correlated credit-default Monte Carlo for an allocation.
+
+The app's "Adjusted Profit" charges each row its expected loss
+(profit * PD), which is blind to several buyers in one country defaulting
+together. Here buyer i defaults on a path when its latent
+
+    X_i = sqrt(rho_global) * Z + sqrt(rho_country) * Z_country(i) + sqrt(1 - rho_global - rho_country) * e_i
+
+falls below Phi^-1(PD_i) (one-factor Gaussian copula plus a country factor).
+A default loses every month's exposure of that buyer (times LGD), which
+keeps expected loss equal to the app's sum of profit * PD.
+
+Paths are drawn in fixed-size chunks, each from its own
+SeedSequence child, so results depend on (seed, paths, chunk_paths) and
+not on the number of worker processes. Working memory is one chunk of
+normals plus the worst (1 - min alpha) share of paths: each month's and
+the total's largest losses for VaR / CVaR and, for the CVaR
+contributions, the default bits of the worst total-loss paths.
+"""
+from __future__ import annotations
+import os
+from statistics import NormalDist
+
+import numpy as np
+
+from . import trace
+from .pool import worker_pool
+
+DEFAULT_ALPHAS = (0.95, 0.99)
+CHUNK_ELEMENTS = 4_000_000  # latent normals per chunk (paths x active buyers)
+
+# Per-process model, set once by `_init_worker` so jobs only carry (seed, paths).
+_BASE: dict = {}
+
+def _init_worker(exposure: np.ndarray, threshold: np.ndarray, country_idx: np.ndarray,
+                 n_countries: int, loadings: tuple) -> None:
+    _BASE.update(exposure=exposure, threshold=threshold, country_idx=country_idx,
+                 n_countries=n_countries, loadings=loadings)
+
+def _draw_defaults(seed, n: int) -> np.ndarray:
+    "(n x buyers) bool default indicators for one chunk."
+    a_g, a_c, a_e = _BASE["loadings"]
+    rng = np.random.default_rng(seed)
+    z = rng.standard_normal(n, dtype=np.float32)
+    zc = rng.standard_normal((n, _BASE["n_countries"]), dtype=np.float32)
+    x = rng.standard_normal((n, len(_BASE["threshold"])), dtype=np.float32)
+    x *= a_e
+    x += a_g * z[:, None]
+    x += a_c * zc[:, _BASE["country_idx"]]
+    return x < _BASE["threshold"]
+
+def _top(values: np.ndarray, k: int) -> np.ndarray:
+    "The k largest entries of each column (all of them when k >= rows)."
+    n = len(values)
+    return values if k >= n else np.partition(values, n - k, axis=0)[n - k:]
+
+def _loss_job(job):
+    """
+    One chunk: month and total loss sums, default counts per buyer, each
+    month's `keep` largest losses, and the `keep` worst paths' totals with
+    (when `bits`) their default rows bit-packed.
+    """
+    seed, n, keep, bits = job
+    d = _draw_defaults(seed, n)
+    loss = d.astype(np.float32) @ _BASE["exposure"]
+    total = loss.sum(axis=1, dtype=np.float64)
+    worst = np.argpartition(-total, keep - 1)[:keep] if keep < n else np.arange(n)
+    return (loss.sum(axis=0, dtype=np.float64), total.sum(), d.sum(axis=0), _top(loss, keep),
+            total[worst], np.packbits(d[worst], axis=1) if bits else None)
+
+def _prune(month_top: list, totals: list, bits: list, k: int) -> tuple:
+    "Merge candidate chunks, keeping each month's k largest losses and the k largest totals (with their bits)."
+    m = _top(np.concatenate(month_top), k)
+    t = np.concatenate(totals)
+    b = np.concatenate(bits) if bits else None
+    if len(t) > k:
+        keep = np.argpartition(-t, k - 1)[:k]
+        t = t[keep]
+        b = b[keep] if b is not None else None
+    return [m], [t], [] if b is None else [b]
+
+def _tail_size(n: int, alpha: float) -> int:
+    return max(1, int(np.ceil(round((1 - alpha) * n, 9))))
+
+def _tail(top: np.ndarray, n: int, alphas) -> tuple:
+    """
+    VaR and CVaR (mean of the worst ceil((1 - alpha) * n) of n paths) per
+    alpha, per column, from `top`: at least that many of the largest losses.
+    """
+    top = -np.sort(-top, axis=0)
+    var, cvar = [], []
+    for a in alphas:
+        worst = top[:_tail_size(n, a)]
+        var.append(worst[-1])
+        cvar.append(worst.mean(axis=0, dtype=np.float64))
+    return np.array(var, dtype=float), np.array(cvar)
+
+@trace.traced("credit.simulate")
+def simulate_credit_losses(exposure, pd_, country_idx, paths: int = 100_000, rho_global: float = 0.15,
+                           rho_country: float = 0.10, lgd: float = 1.0, alphas=DEFAULT_ALPHAS,
+                           seed: int = 0, workers: int | None = 1, chunk_paths: int | None = None,
+                           contributions: bool = True) -> dict:
+    """
+    exposure:    (months x buyers) USD lost if the buyer defaults (e.g. allocated profit;
+                 negative entries are clipped to 0 so losses on one row can't offset another's)
+    pd_:         (buyers,) default probabilities over the horizon
+    country_idx: (buyers,) int country codes (buyers sharing a code share a factor)
+
+    Returns {"month_el", "month_var", "month_cvar"} (alpha x months for the
+    tail measures), {"total_el", "total_var", "total_cvar"} (per alpha),
+    {"buyer_el", "buyer_default_rate"} and, with `contributions`,
+    "buyer_cvar" (alpha x buyers: each buyer's expected loss on the
+    worst total-loss paths; sums to total_cvar), plus "analytic_el",
+    "paths" and "alphas". Buyers with no exposure are skipped (zero rows).
+    """
+    exposure = np.clip(np.asarray(exposure, dtype=float), 0.0, None) * float(lgd)
+    pd_ = np.clip(np.asarray(pd_, dtype=float), 0.0, 1.0)
+    country_idx = np.asarray(country_idx)
+    n_m, n_b = exposure.shape
+    if not (0 <= rho_global and 0 <= rho_country and rho_global + rho_country < 1):
+        raise ValueError("need rho_global, rho_country >= 0 and rho_global + rho_country < 1")
+    alphas = np.asarray(alphas, dtype=float)
+    workers = (os.cpu_count() or 1) if workers is None else int(workers)
+
+    active = np.flatnonzero(exposure.any(axis=0) & (pd_ > 0))
+    _, cidx = np.unique(country_idx[active], return_inverse=True)
+    inv = NormalDist().inv_cdf
+    threshold = np.array([np.inf if p >= 1 else inv(p) for p in pd_[active]], dtype=np.float32)
+    loadings = tuple(np.float32(v) for v in
+                     (np.sqrt(rho_global), np.sqrt(rho_country), np.sqrt(1 - rho_global - rho_country)))
+    initargs = (np.ascontiguousarray(exposure[:, active].T, dtype=np.float32), threshold,
+                cidx.astype(np.intp), int(cidx.max()) + 1 if active.size else 0, loadings)
+
+    paths = int(paths)
+    chunk = int(chunk_paths or max(1, CHUNK_ELEMENTS // max(active.size, 1)))
+    sizes = [min(chunk, paths - s) for s in range(0, paths, chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    # the worst k paths overall (per month, and by total) are among each chunk's worst k,
+    # so only those losses, and for the contributions their default rows, are kept
+    k = np.array([_tail_size(paths, a) for a in alphas])
+    k_max = int(k.max())
+    month_sum, total_sum, defaults = np.zeros(n_m), 0.0, np.zeros(active.size)
+    cand_month, cand_total = [np.zeros((0, n_m), dtype=np.float32)], [np.zeros(0)]
+    cand_bits = [np.zeros((0, (active.size + 7) // 8), dtype=np.uint8)] if contributions else []
+    held = 0
+    jobs = ((s, n, min(n, k_max), contributions) for s, n in zip(seeds, sizes))
+    with trace.span("credit.paths", paths=paths, buyers=int(active.size), chunks=len(sizes)), \
+            worker_pool(workers, _init_worker, initargs) as run:
+        for m_sum, t_sum, d, m_top, worst_total, worst_bits in run(_loss_job, jobs):
+            month_sum += m_sum
+            total_sum += t_sum
+            defaults += d
+            cand_month.append(m_top)
+            cand_total.append(worst_total)
+            if contributions:
+                cand_bits.append(worst_bits)
+            held += len(worst_total)
+            if held > 2 * k_max:
+                cand_month, cand_total, cand_bits = _prune(cand_month, cand_total, cand_bits, k_max)
+                held = k_max
+    (cand_month,), (cand_total,), cand_bits = _prune(cand_month, cand_total, cand_bits, k_max)
+
+    m_var, m_cvar = _tail(cand_month, paths, alphas)
+    t_var, t_cvar = _tail(cand_total, paths, alphas)
+    buyer_el = np.zeros(n_b)
+    rate = np.zeros(n_b)
+    rate[active] = defaults / paths
+    buyer_el[active] = rate[active] * exposure[:, active].sum(axis=0)
+    out = {
+        "paths": paths, "alphas": alphas,
+        "month_el": month_sum / paths, "month_var": m_var, "month_cvar": m_cvar,
+        "total_el": total_sum / paths, "total_var": t_var, "total_cvar": t_cvar,
+        "buyer_el": buyer_el, "buyer_default_rate": rate,
+        "analytic_el": float((exposure.sum(axis=0) * pd_).sum()),
+    }
+    if contributions:
+        (cand_bits,) = cand_bits
+        order = np.argsort(-cand_total, kind="stable")
+        buyer_loss = exposure[:, active].sum(axis=0)
+        buyer_cvar = np.zeros((len(alphas), n_b))
+        for j, k_a in enumerate(k):
+            d = np.unpackbits(cand_bits[order[:k_a]], axis=1, count=active.size)
+            buyer_cvar[j, active] = d.sum(axis=0) * buyer_loss / k_a
+        out["buyer_cvar"] = buyer_cvar
+    return out
+
+def credit_risk_tables(table, paths: int = 100_000, exposure_col: str = "Profit (USD)", **kwargs) -> dict:
+    """
+    Run `simulate_credit_losses` on an app profit table (Month, Buyer, Country,
+    Probability of Default, `exposure_col`) and return DataFrames:
+    {"months": per month EL / VaR / CVaR, "buyers": per buyer PD, exposure, EL,
+    simulated default rate and CVaR contribution, "total": {...}}.
+    """
+    import pandas as pd
+
+    months = list(dict.fromkeys(table["Month"]))
+    buyers = table.drop_duplicates("Buyer")[["Buyer", "Country", "Probability of Default"]]
+    names = buyers["Buyer"].tolist()
+    # loss-making rows carry no credit exposure; clip per row so they can't offset a buyer's others
+    exposure = (table.assign(**{exposure_col: table[exposure_col].clip(lower=0.0)})
+                .pivot_table(index="Month", columns="Buyer", values=exposure_col, aggfunc="sum")
+                .reindex(index=months, columns=names).fillna(0.0).to_numpy())
+    countries, country_idx = np.unique(buyers["Country"].to_numpy(dtype=str), return_inverse=True)
+    res = simulate_credit_losses(exposure, buyers["Probability of Default"].to_numpy(dtype=float), country_idx,
+                                 paths=paths, **kwargs)
+    pct = [f"{a * 100:g}" for a in res["alphas"]]
+
+    by_month = pd.DataFrame({"Month": months, "Expected Loss (USD)": res["month_el"]})
+    for k, p in enumerate(pct):
+        by_month[f"VaR {p}% (USD)"] = res["month_var"][k]
+        by_month[f"CVaR {p}% (USD)"] = res["month_cvar"][k]
+    by_buyer = pd.DataFrame({
+        "Buyer": names, "Country": buyers["Country"].tolist(),
+        "Probability of Default": buyers["Probability of Default"].to_numpy(dtype=float),
+        "Exposure (USD)": exposure.sum(axis=0), "Expected Loss (USD)": res["buyer_el"],
+        "Simulated Default Rate": res["buyer_default_rate"],
+    })
+    for k, p in enumerate(pct):
+        if "buyer_cvar" in res:
+            by_buyer[f"CVaR {p}% Contribution (USD)"] = res["buyer_cvar"][k]
+    total = {"paths": res["paths"], "expected_loss": res["total_el"], "analytic_expected_loss": res["analytic_el"]}
+    for k, p in enumerate(pct):
+        total[f"var_{p}"] = float(res["total_var"][k])
+        total[f"cvar_{p}"] = float(res["total_cvar"][k])
+    return {"months": by_month, "buyers": by_buyer, "total": total}
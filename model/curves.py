@@ -0,0 +1,172 @@
+"""
+Forward/price curves backed by sorted datetime64 arrays.
+
+A ForwardCurve answers point lookups with a binary search and evaluates whole
+arrays of delivery dates in one vectorised call, with step ("previous"),
+linear or monotone (Fritsch-Carlson PCHIP) interpolation and flat
+extrapolation at both ends.
+"""
+from __future__ import annotations
+import re
+import numpy as np
+import pandas as pd
+
+HH_ADDER = 2.5       # $/MMBtu over the HH forward to the purchase cost, as in model.market.DEFAULT_CURVES
+MMBTU_PER_BBL = 5.8  # crude oil energy content
+
+_MONTH_LABEL = re.compile(r"^\s*([A-Za-z]{3})[A-Za-z]*[\s\-/]+(\d{2,4})\s*$")
+
+def parse_month(label) -> np.datetime64:
+    """
+    Month label -> datetime64[D] of the first day of that month.
+    Accepts "Jan-2026", "Jan 2026", "Jan/2026", "January 2026", "Jan-26",
+    ISO strings and date-like objects.
+    """
+    if isinstance(label, str):
+        m = _MONTH_LABEL.match(label)
+        if m:
+            year = int(m.group(2))
+            year += 2000 if year < 100 else 0
+            label = f"{m.group(1).title()} {year}"
+            return np.datetime64(pd.to_datetime(label, format="%b %Y").to_period("M").start_time.date(), "D")
+    return np.datetime64(pd.Timestamp(label).to_period("M").start_time.date(), "D")
+
+def _to_day(d) -> np.datetime64:
+    if isinstance(d, str) and _MONTH_LABEL.match(d):
+        return parse_month(d)
+    return np.datetime64(pd.Timestamp(str(d) if isinstance(d, str) else d).date(), "D")
+
+def to_dates(dates) -> np.ndarray:
+    "Coerce month labels, date strings, Timestamps or datetime64 to a datetime64[D] array."
+    arr = np.asarray(dates)
+    if np.issubdtype(arr.dtype, np.datetime64):
+        return arr.astype("datetime64[D]")
+    return np.array([_to_day(d) for d in arr.ravel()], dtype="datetime64[D]").reshape(arr.shape)
+
+def _pchip_slopes(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    "Fritsch-Carlson derivatives: zero at local extrema, weighted harmonic mean elsewhere."
+    h = np.diff(x)
+    delta = np.diff(y) / h
+    m = np.empty_like(y)
+    m[0], m[-1] = delta[0], delta[-1]
+    if len(y) > 2:
+        w1 = 2 * h[1:] + h[:-1]
+        w2 = h[1:] + 2 * h[:-1]
+        same_sign = delta[:-1] * delta[1:] > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            harmonic = (w1 + w2) / (w1 / delta[:-1] + w2 / delta[1:])
+        m[1:-1] = np.where(same_sign, harmonic, 0.0)
+    return m
+
+class ForwardCurve:
+    "One index (HH, JKM, ...) as sorted dates -> values."
+
+    METHODS = ("previous", "linear", "monotone")
+
+    def __init__(self, dates, values, name: str = "", method: str = "linear"):
+        dates = to_dates(dates)
+        values = np.asarray(values, dtype=float)
+        keep = ~np.isnat(dates) & ~np.isnan(values)
+        dates, values = dates[keep], values[keep]
+        if dates.size == 0:
+            raise ValueError(f"curve {name!r} has no points")
+        order = np.argsort(dates, kind="stable")
+        dates, values = dates[order], values[order]
+        # duplicate dates: keep the last quote
+        last = np.append(dates[1:] != dates[:-1], True)
+        self.dates, self.values = dates[last], values[last]
+        self.name = name
+        if method not in self.METHODS:
+            raise ValueError(f"method must be one of {self.METHODS}")
+        self.method = method
+        self._x = (self.dates - self.dates[0]).astype(float)  # days since first point
+        self._slopes = None
+
+    @classmethod
+    def from_points(cls, points: dict, name: str = "", method: str = "linear") -> "ForwardCurve":
+        "{month label or date: value} -> curve."
+        return cls(list(points), list(points.values()), name=name, method=method)
+
+    @classmethod
+    def from_table(cls, table, contract: str | None = None, name: str = "", method: str = "linear"):
+        "Curve from a `model.ingest.MarketTable`, optionally restricted to one contract."
+        mask = np.ones(len(table.price), dtype=bool)
+        if contract is not None:
+            mask = table.contract_codes == table.contracts.index(contract)
+        return cls(table.date[mask], table.price[mask], name=name or table.name, method=method)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __repr__(self) -> str:
+        return f"ForwardCurve({self.name!r}, {len(self)} points, {self.dates[0]}..{self.dates[-1]}, {self.method})"
+
+    def lookup(self, date) -> float:
+        "Value on the last curve date on or before `date` (O(log n)); flat before the first point."
+        d = to_dates([date])[0]
+        i = int(np.searchsorted(self.dates, d, side="right")) - 1
+        return float(self.values[max(i, 0)])
+
+    def __call__(self, dates, method: str | None = None) -> np.ndarray:
+        "Evaluate at arbitrary delivery dates (any shape)."
+        method = method or self.method
+        d = to_dates(dates)
+        x = (d - self.dates[0]).astype(float)
+        xs, ys = self._x, self.values
+        if method == "previous" or len(xs) == 1:
+            i = np.clip(np.searchsorted(xs, x, side="right") - 1, 0, len(xs) - 1)
+            return ys[i]
+        if method == "linear":
+            return np.interp(x, xs, ys)
+        if method != "monotone":
+            raise ValueError(f"method must be one of {self.METHODS}")
+
+        if self._slopes is None:
+            self._slopes = _pchip_slopes(xs, ys)
+        xc = np.clip(x, xs[0], xs[-1])
+        i = np.clip(np.searchsorted(xs, xc, side="right") - 1, 0, len(xs) - 2)
+        h = xs[i + 1] - xs[i]
+        t = (xc - xs[i]) / h
+        t2, t3 = t * t, t * t * t
+        return ((2 * t3 - 3 * t2 + 1) * ys[i] + (t3 - 2 * t2 + t) * h * self._slopes[i]
+                + (-2 * t3 + 3 * t2) * ys[i + 1] + (t3 - t2) * h * self._slopes[i + 1])
+
+class CurveSet(dict):
+    "{index name: ForwardCurve}; `evaluate` returns aligned arrays for a set of dates."
+
+    def evaluate(self, dates, method: str | None = None) -> dict:
+        return {k: c(dates, method) for k, c in self.items()}
+
+def month_starts(start, n_months: int) -> np.ndarray:
+    "First day of `n_months` consecutive months from `start`."
+    first = parse_month(start).astype("datetime64[M]")
+    return (first + np.arange(n_months)).astype("datetime64[D]")
+
+def curves_from_market_data(tables: dict, method: str = "linear", hh_adder: float = HH_ADDER,
+                            mmbtu_per_bbl: float = MMBTU_PER_BBL) -> CurveSet:
+    """
+    Build HH, JKM, TTF, WTI, BRENT, BRENT_MMBTU and BLNG3G curves from
+    `model.ingest.load_market_data()`. Forward files give the monthly strips;
+    Brent and Baltic freight use their histories.
+
+    HH is the purchase cost (forward + `hh_adder`) and BRENT_MMBTU is Brent
+    ($/bbl) / `mmbtu_per_bbl`, so the set feeds `model.market.build_horizon`.
+    """
+    specs = {
+        "HH": ("henry_hub_forward", None),
+        "JKM": ("jkm_forward", None),
+        "TTF": ("ttf_forward", None),
+        "WTI": ("wti_forward", None),
+        "BRENT": ("brent_historical", None),
+        "BLNG3G": ("baltic_freight", "BLNG3g"),
+    }
+    out = CurveSet()
+    for key, (dataset, contract) in specs.items():
+        if dataset in tables:
+            out[key] = ForwardCurve.from_table(tables[dataset], contract=contract, name=key, method=method)
+    if "HH" in out:
+        out["HH"] = ForwardCurve(out["HH"].dates, out["HH"].values + hh_adder, name="HH", method=method)
+    if "BRENT" in out:
+        out["BRENT_MMBTU"] = ForwardCurve(out["BRENT"].dates, out["BRENT"].values / mmbtu_per_bbl,
+                                          name="BRENT_MMBTU", method=method)
+    return out
@@ -1,6 +1,7 @@
 from __future__ import annotations
 import pandas as pd
 import numpy as np
+from . import trace
 
 def delivered_fraction(distance_nm: float, boiloff_rate_per_1000nm: float) -> float:
     "Simple linear boil-off approximation."
@@ -27,38 +28,113 @@ def unit_profit_for_destination(
     costs = variable_cost_per_unit + handling_fee_per_unit + freight + carbon_cost_per_unit
     return revenue - costs
 
+def delivered_fraction_array(distance_nm, boiloff_rate_per_1000nm) -> np.ndarray:
+    "Vectorised `delivered_fraction` (NaN/negative fractions clip to 0.0 like the scalar)."
+    loss = (np.asarray(distance_nm, dtype=float) / 1000.0) * boiloff_rate_per_1000nm
+    frac = 1.0 - loss
+    return np.where(frac > 0.0, frac, 0.0)
+
+def unit_profit_arrays(ports_df: pd.DataFrame, prices, assumptions: dict) -> dict:
+    """
+    Columnar unit economics for every port at once.
+    `prices` is any array whose last axis lines up with the rows of `ports_df`,
+    e.g. (ports,), (months, ports) or (scenarios, months, ports).
+    Per-port terms come back with shape (ports,), price-driven terms with prices.shape.
+    Arithmetic follows `unit_profit_for_destination` term by term so results match exactly.
+    """
+    distance = ports_df["distance_nm"].to_numpy(dtype=float)
+    handling = ports_df["handling_fee_per_unit"].to_numpy(dtype=float)
+    prices = np.asarray(prices, dtype=float)
+    if prices.shape[-1:] != distance.shape:
+        raise ValueError(f"prices last axis {prices.shape} does not match {len(distance)} ports")
+
+    frac = delivered_fraction_array(distance, float(assumptions["boiloff_rate_per_1000nm"]))
+    freight = float(assumptions["freight_cost_per_nm_per_unit"]) * distance
+    costs = (float(assumptions["variable_cost_per_unit"]) + handling + freight
+             + float(assumptions.get("carbon_cost_per_unit", 0.0)))
+    revenue = prices * frac
+    return {
+        "delivered_fraction": frac,
+        "freight": freight,
+        "costs": costs,
+        "revenue": revenue,
+        "unit_profit": revenue - costs,
+    }
+
+def _port_prices(ports_df: pd.DataFrame, price_map: dict) -> np.ndarray:
+    return np.array([price_map.get(code, np.nan) for code in ports_df["code"]], dtype=float)
+
+@trace.traced("financials.unit_profit_table")
 def build_unit_profit_table(ports_df: pd.DataFrame, price_map: dict, assumptions: dict) -> pd.DataFrame:
-    rows = []
-    for _, r in ports_df.iterrows():
-        code = r["code"]
-        price = price_map.get(code, np.nan)
-        up = unit_profit_for_destination(
-            price_per_unit=price,
-            distance_nm=float(r["distance_nm"]),
-            handling_fee_per_unit=float(r["handling_fee_per_unit"]),
-            boiloff_rate_per_1000nm=float(assumptions["boiloff_rate_per_1000nm"]),
-            freight_cost_per_nm_per_unit=float(assumptions["freight_cost_per_nm_per_unit"]),
-            variable_cost_per_unit=float(assumptions["variable_cost_per_unit"]),
-            carbon_cost_per_unit=float(assumptions.get("carbon_cost_per_unit", 0.0)),
-        )
-        rows.append({
-            "code": code,
-            "name": r["name"],
-            "distance_nm": r["distance_nm"],
-            "monthly_capacity_cargo": r["monthly_capacity_cargo"],
-            "price_per_unit": price,
-            "unit_profit": up,
-            "delivered_fraction": delivered_fraction(r["distance_nm"], assumptions["boiloff_rate_per_1000nm"]),
-        })
-    return pd.DataFrame(rows)
+    prices = _port_prices(ports_df, price_map)
+    econ = unit_profit_arrays(ports_df, prices, assumptions)
+    return pd.DataFrame({
+        "code": ports_df["code"].to_numpy(),
+        "name": ports_df["name"].to_numpy(),
+        "distance_nm": ports_df["distance_nm"].to_numpy(),
+        "monthly_capacity_cargo": ports_df["monthly_capacity_cargo"].to_numpy(),
+        "price_per_unit": prices,
+        "unit_profit": econ["unit_profit"],
+        "delivered_fraction": econ["delivered_fraction"],
+    })
+
+@trace.traced("financials.unit_profit_cube")
+def build_unit_profit_cube(ports_df: pd.DataFrame, prices, assumptions: dict,
+                           months=None, scenarios=None) -> pd.DataFrame:
+    """
+    Long-form unit profit table for a (scenarios, months, ports) price cube.
+    Same columns as `build_unit_profit_table`, prefixed with "scenario" and "month".
+    `months` / `scenarios` label the first two axes (default: 0..n-1).
+    """
+    prices = np.asarray(prices, dtype=float)
+    if prices.ndim != 3:
+        raise ValueError("prices must have shape (scenarios, months, ports)")
+    n_s, n_m, n_p = prices.shape
+    econ = unit_profit_arrays(ports_df, prices, assumptions)
+    months = np.arange(n_m) if months is None else np.asarray(months)
+    scenarios = np.arange(n_s) if scenarios is None else np.asarray(scenarios)
+
+    def per_port(col):
+        return np.tile(np.asarray(col), n_s * n_m)
+
+    return pd.DataFrame({
+        "scenario": np.repeat(scenarios, n_m * n_p),
+        "month": np.tile(np.repeat(months, n_p), n_s),
+        "code": per_port(ports_df["code"].to_numpy()),
+        "name": per_port(ports_df["name"].to_numpy()),
+        "distance_nm": per_port(ports_df["distance_nm"].to_numpy()),
+        "monthly_capacity_cargo": per_port(ports_df["monthly_capacity_cargo"].to_numpy()),
+        "price_per_unit": prices.reshape(-1),
+        "unit_profit": econ["unit_profit"].reshape(-1),
+        "delivered_fraction": per_port(econ["delivered_fraction"]),
+    })
+
+def pnl_from_allocations(unit_table: pd.DataFrame, allocations, codes=None) -> dict:
+    """
+    Batched P&L: score a (candidates, destinations) allocation matrix in one pass.
+    Columns follow `codes` (default: the order of unit_table["code"]).
+    Returns arrays of shape (candidates,) under the same keys as `pnl_from_allocation`.
+    """
+    allocations = np.atleast_2d(np.asarray(allocations, dtype=float))
+    table_codes = pd.Index(unit_table["code"])
+    if codes is None:
+        idx = np.arange(len(table_codes))
+    else:
+        idx = table_codes.get_indexer(list(codes))
+        if (idx < 0).any():
+            missing = [c for c, i in zip(codes, idx) if i < 0]
+            raise KeyError(f"unknown destination codes: {missing}")
+    if allocations.shape[1] != len(idx):
+        raise ValueError(f"allocations have {allocations.shape[1]} columns, expected {len(idx)}")
+
+    unit_profit = unit_table["unit_profit"].to_numpy(dtype=float)[idx]
+    deliv_frac = unit_table["delivered_fraction"].to_numpy(dtype=float)[idx]
+    return {
+        "expected_profit": allocations @ unit_profit,
+        "expected_delivered_units": allocations @ deliv_frac,
+    }
 
 def pnl_from_allocation(unit_table: pd.DataFrame, allocation_map: dict[str, float]) -> dict:
-    df = unit_table.set_index("code")
-    pnl = 0.0
-    delivered = 0.0
-    for code, x in allocation_map.items():
-        up = float(df.loc[code, "unit_profit"])
-        df_deliv_frac = float(df.loc[code, "delivered_fraction"])
-        pnl += up * x
-        delivered += df_deliv_frac * x
-    return {"expected_profit": pnl, "expected_delivered_units": delivered}
+    codes = list(allocation_map)
+    res = pnl_from_allocations(unit_table, [[allocation_map[c] for c in codes]], codes=codes)
+    return {k: float(v[0]) for k, v in res.items()}
@@ -0,0 +1,187 @@
+"""
+Freight by route: dense (route x destination x month) cost tensors.
+
+Freight for one cargo on route r to destination d in month t is
+
+    day_rate[t] * voyage_days[d] * ROUTE_FREIGHT_MULT[r] + delay_days[r] * day_rate[t] * demurrage_mult
+
+i.e. the BLNG3g day rate times the voyage, scaled by the route, plus
+demurrage (the vessel stays on hire) for days queued at a canal. Panama
+with no delay is exactly `model.market.make_month`'s freight. Delays may
+be arrays over scenarios, which become leading axes, so the cheapest
+route for every (scenario, destination, month) is one argmin over the
+route axis.
+
+FreightIndex integrates a daily day-rate curve (e.g. the Baltic BLNG3g
+history) over actual voyage windows: a prefix sum over the daily rates
+makes the charter cost of any (departure, voyage length) two lookups, so
+grids over every departure day x destination are a single gather.
+"""
+from __future__ import annotations
+from typing import Mapping, Sequence
+
+import numpy as np
+
+from models import ROUTE_FREIGHT_MULT, SHIPMENT_VOLUME, TOTAL_TERMINAL_COST
+from . import trace
+from .curves import ForwardCurve, to_dates
+
+ROUTES = tuple(ROUTE_FREIGHT_MULT)
+CANAL_ROUTES = ("Panama", "Suez")  # routes that can queue at a canal
+ROUTE_AXIS = -3
+
+def route_freight_cube(day_rate, voyage_days, routes: Sequence[str] = ROUTES,
+                       delay_days: Mapping[str, object] | None = None, demurrage_mult: float = 1.0,
+                       route_mult: Mapping[str, float] = ROUTE_FREIGHT_MULT, voyage_cost=None) -> np.ndarray:
+    """
+    USD freight per cargo, shape (*scenarios, routes, destinations, months).
+
+    day_rate:    (months,) USD/day (BLNG3g)
+    voyage_days: (destinations,)
+    delay_days:  {canal route: days}; a value may be an array over scenarios
+                 (all arrays broadcast together into the leading axes)
+    voyage_cost: optional (destinations x months) USD per voyage replacing
+                 voyage_days x day_rate (e.g. FreightIndex integrals)
+    """
+    day_rate = np.asarray(day_rate, dtype=float)
+    voyage_days = np.asarray(voyage_days, dtype=float)
+    mult = np.array([route_mult[r] for r in routes], dtype=float)
+    if voyage_cost is None:
+        base = mult[:, None, None] * voyage_days[None, :, None] * day_rate[None, None, :]
+    else:
+        base = mult[:, None, None] * np.asarray(voyage_cost, dtype=float)[None]
+    delay_days = delay_days or {}
+    off_canal = [r for r in delay_days if r not in CANAL_ROUTES]
+    if off_canal:
+        raise ValueError(f"delay_days only applies to canal routes {CANAL_ROUTES}, got {off_canal}")
+    delays = np.broadcast_arrays(*[np.asarray(delay_days.get(r, 0.0), dtype=float) for r in routes])
+    delay = np.stack(delays, axis=-1) if delays else np.zeros(len(routes))  # (*scenarios, routes)
+    demurrage = delay[..., :, None, None] * day_rate * float(demurrage_mult)
+    return base + demurrage
+
+def final_cost_cube(hh, freight) -> np.ndarray:
+    "$/MMBtu final cost for a freight cube (months on the last axis), as make_month computes it."
+    return np.asarray(hh, dtype=float) + ((TOTAL_TERMINAL_COST + freight) / SHIPMENT_VOLUME)
+
+def cheapest_route(cube, axis: int = ROUTE_AXIS) -> tuple:
+    "(route index, cost) minimising over the route axis; both drop that axis."
+    idx = np.argmin(cube, axis=axis)
+    return idx, np.take_along_axis(cube, np.expand_dims(idx, axis), axis=axis).squeeze(axis)
+
+@trace.traced("freight.horizon_cube")
+def horizon_freight(horizon, routes: Sequence[str] = ROUTES, delay_days: Mapping[str, object] | None = None,
+                    demurrage_mult: float = 1.0) -> dict:
+    """
+    Route cube for a `models.MarketHorizon`: {"routes", "dests", "months",
+    "freight" and "final_cost" (*scenarios, routes, dests, months)}.
+    """
+    freight = route_freight_cube(horizon.blng3g, horizon.voyage_days, routes, delay_days, demurrage_mult,
+                                 voyage_cost=horizon.freight.T)
+    return {
+        "routes": list(routes), "dests": list(horizon.dests), "months": list(horizon.labels),
+        "freight": freight, "final_cost": final_cost_cube(horizon.hh, freight),
+    }
+
+def final_costs_for_route(horizon, route: str = "Panama", delay_days: Mapping[str, float] | None = None) -> dict:
+    """
+    {month: {dest: $/MMBtu}} for one route, or route="Cheapest" for the
+    cheapest route per (destination, month). Panama with no delay equals
+    horizon.final_costs().
+    """
+    cube = horizon_freight(horizon, delay_days=delay_days)
+    if route == "Cheapest":
+        _, cost = cheapest_route(cube["final_cost"])
+    else:
+        cost = cube["final_cost"][cube["routes"].index(route)]
+    return {m: dict(zip(cube["dests"], col)) for m, col in zip(cube["months"], cost.T.tolist())}
+
+class FreightIndex:
+    """
+    Day rate for every calendar day from `start`, with prefix sums.
+
+    cum[k] is the hire for days [0, k); a voyage departing at day offset x
+    for L days costs F(x + L) - F(x), where F interpolates cum linearly
+    within a day (fractional voyage days pay part of that day's rate) and
+    extends flat at the first / last rate outside the curve.
+    """
+
+    __slots__ = ("start", "rate", "cum")
+
+    def __init__(self, start, daily_rates):
+        self.start = to_dates([start])[0]
+        self.rate = np.asarray(daily_rates, dtype=float)
+        if self.rate.ndim != 1 or not len(self.rate):
+            raise ValueError("daily_rates must be a non-empty 1-d array")
+        self.cum = np.concatenate([[0.0], np.cumsum(self.rate)])
+
+    @classmethod
+    def from_curve(cls, curve: ForwardCurve, start=None, end=None, method: str | None = None) -> "FreightIndex":
+        "Evaluate a (sparse) curve on every day in [start, end] (default: its own date range)."
+        start = curve.dates[0] if start is None else to_dates([start])[0]
+        end = curve.dates[-1] if end is None else to_dates([end])[0]
+        days = np.arange(start, end + np.timedelta64(1, "D"), dtype="datetime64[D]")
+        return cls(start, curve(days, method))
+
+    @classmethod
+    def from_market_data(cls, tables: dict | None = None, contract: str = "BLNG3g",
+                         method: str = "previous") -> "FreightIndex":
+        "Daily index from the Baltic LNG freight workbook; quotes carry forward until the next one."
+        if tables is None:
+            from .ingest import load_market_data
+            tables = load_market_data()
+        curve = ForwardCurve.from_table(tables["baltic_freight"], contract=contract, name=contract, method=method)
+        return cls.from_curve(curve)
+
+    def __len__(self) -> int:
+        return len(self.rate)
+
+    @property
+    def end(self) -> np.datetime64:
+        return self.start + np.timedelta64(len(self.rate) - 1, "D")
+
+    def offset(self, dates) -> np.ndarray:
+        "Days since `start` (float) for dates or datetime64 arrays."
+        return (to_dates(dates) - self.start).astype(float)
+
+    def cumulative(self, x) -> np.ndarray:
+        "F(x): total hire from `start` to day offset x (any shape)."
+        x = np.asarray(x, dtype=float)
+        n = len(self.rate)
+        i = np.clip(np.floor(x), 0, n).astype(np.intp)
+        rate = self.rate[np.minimum(i, n - 1)]
+        out = self.cum[i] + (x - i) * rate
+        return np.where(x < 0, x * self.rate[0], out)
+
+    def hire(self, depart, days) -> np.ndarray:
+        "Charter cost of voyages departing `depart` (dates or day offsets) for `days`; broadcasts."
+        x = depart if np.issubdtype(np.asarray(depart).dtype, np.number) else self.offset(depart)
+        x = np.asarray(x, dtype=float)
+        return self.cumulative(x + np.asarray(days, dtype=float)) - self.cumulative(x)
+
+    def mean_rate(self, depart, days) -> np.ndarray:
+        "Average day rate over each voyage window."
+        return self.hire(depart, days) / np.asarray(days, dtype=float)
+
+    def departure_grid(self, start, end, voyage_days, route_mult: float = 1.0) -> dict:
+        """
+        Freight for every departure day in [start, end] x destination:
+        {"dates": (days,), "freight": (days x destinations)} USD per cargo.
+        """
+        dates = np.arange(to_dates([start])[0], to_dates([end])[0] + np.timedelta64(1, "D"), dtype="datetime64[D]")
+        x = self.offset(dates)[:, None]
+        return {"dates": dates, "freight": self.hire(x, np.asarray(voyage_days, dtype=float)[None, :]) * route_mult}
+
+    def monthly_freight(self, months, voyage_days, route_mult: float = 1.0) -> np.ndarray:
+        """
+        (months x destinations) freight averaged over every departure day of
+        each month - the daily-curve counterpart of BLNG3g x voyage_days.
+        """
+        firsts = to_dates(list(months)).astype("datetime64[M]")
+        days = np.arange(firsts.min().astype("datetime64[D]"), (firsts.max() + 1).astype("datetime64[D]"))
+        grid = self.hire(self.offset(days)[:, None], np.asarray(voyage_days, dtype=float)[None, :]) * route_mult
+        # per-month sums as differences of a running sum over departure days
+        running = np.concatenate([np.zeros((1, grid.shape[1])), np.cumsum(grid, axis=0)])
+        month_of_day = days.astype("datetime64[M]")
+        starts = np.searchsorted(month_of_day, firsts)
+        ends = np.searchsorted(month_of_day, firsts, side="right")
+        return (running[ends] - running[starts]) / (ends - starts)[:, None]
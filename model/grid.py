@@ -0,0 +1,64 @@
+from __future__ import annotations
+import os
+from itertools import islice
+import pandas as pd
+
+from .financials import build_unit_profit_table
+from .optimisation import AllocationModel
+from .pool import worker_pool
+
+# Per-process model, built once by `_init_worker` so jobs only carry the scenario.
+_BASE: dict = {}
+
+def _init_worker(ports_df: pd.DataFrame, price_map: dict, assumptions: dict) -> None:
+    table = build_unit_profit_table(ports_df, price_map, assumptions)
+    _BASE.update(model=AllocationModel(table, assumptions["supply_cargo_units"]),
+                 supply=assumptions["supply_cargo_units"])
+
+def _run_job(job):
+    index, scenario = job
+    model = _BASE["model"]
+    model.apply_scenario(scenario)
+    supply = scenario.get("supply")
+    if supply is None:
+        supply = _BASE["supply"]
+    model.set_supply(supply)
+    res = model.solve()
+    return {
+        "name": scenario.get("name", ""),
+        "supply": float(supply),
+        "objective": res["objective"],
+        "allocation": res["allocation"],
+        "index": index,
+    }
+
+def _run_chunk(jobs: list) -> list:
+    return [_run_job(job) for job in jobs]
+
+def run_grid(ports_df: pd.DataFrame, price_map: dict, assumptions: dict, scenarios,
+             workers: int | None = None, progress=None, chunksize: int = 64):
+    """
+    Solve every scenario and yield result dicts {index, name, supply,
+    objective, allocation} in input order. Each process builds the base
+    unit table once; scenarios are applied with AllocationModel.apply_scenario
+    and re-solved.
+
+    Jobs fan out over a process pool of `workers` processes (default: all cores;
+    1 runs in-process) in chunks of `chunksize`. At most 2 * workers chunks are
+    in flight; the next is submitted as the oldest one is yielded, so neither
+    memory nor time to the first result grows with the grid. `progress(done, total)` is called after each result;
+    total is None when `scenarios` is a generator of unknown length.
+    """
+    total = len(scenarios) if hasattr(scenarios, "__len__") else None
+    jobs = enumerate(scenarios)
+    workers = (os.cpu_count() or 1) if workers is None else int(workers)
+    size = chunksize if workers > 1 else 1  # in-process, results stream one by one
+    chunks = iter(lambda: list(islice(jobs, size)), [])
+    done = 0
+    with worker_pool(workers, _init_worker, (ports_df, price_map, assumptions)) as run:
+        for batch in run(_run_chunk, chunks):
+            for res in batch:
+                done += 1
+                if progress is not None:
+                    progress(done, total)
+                yield res
@@ -0,0 +1,226 @@
+"""
+Dependency-tracked incremental recompute for the app's allocation pipeline.
+
+DependencyGraph is a small pull-based graph: inputs are set by key, derived
+nodes are recomputed lazily on `get` only when something upstream changed.
+IncrementalAllocator wires the app pipeline onto it at (month, country)
+granularity:
+
+    market, open%            -> open(m, c)
+    open(m, c), buyer%ofOpen -> buyer_total(m, c)
+    open, buyer_total, per-buyer % for buyers in c -> caps(m, c)
+    caps(m, *), active flags, prices, final costs, supply -> month(m)
+
+so editing one buyer's March % re-derives caps(Mar, that country) and the
+March allocation, and nothing else.
+"""
+from __future__ import annotations
+from collections import Counter, defaultdict
+import numpy as np
+import pandas as pd
+
+from . import trace
+from .allocation import PROFIT_TABLE_COLUMNS, greedy_allocate, profit_table
+from .cache import stable_hash
+
+def _same(a, b) -> bool:
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        return a is b
+
+class DependencyGraph:
+    "Keyed inputs + derived nodes with transitive invalidation and lazy recompute."
+
+    def __init__(self):
+        self._values = {}
+        self._rules = {}                      # key -> (fn, deps)
+        self._dependents = defaultdict(set)   # key -> keys that read it
+        self._stale = set()
+        self.recomputed = Counter()           # node kind (key[0]) -> recomputes
+
+    def set_input(self, key, value) -> bool:
+        "Set an input; returns True (and invalidates dependents) only if the value changed."
+        if key in self._values and _same(self._values[key], value):
+            return False
+        self._values[key] = value
+        stack = list(self._dependents[key])
+        while stack:
+            k = stack.pop()
+            if k not in self._stale:
+                self._stale.add(k)
+                stack.extend(self._dependents[k])
+        return True
+
+    def add_node(self, key, fn, deps) -> None:
+        "Derived node: value = fn(*[get(d) for d in deps])."
+        self._rules[key] = (fn, tuple(deps))
+        for d in deps:
+            self._dependents[d].add(key)
+        self._stale.add(key)
+
+    def is_stale(self, key) -> bool:
+        return key in self._stale
+
+    def get(self, key):
+        if key in self._stale:
+            fn, deps = self._rules[key]
+            args = [self.get(d) for d in deps]
+            with trace.span("incremental." + key[0]):
+                self._values[key] = fn(*args)
+            self._stale.discard(key)
+            self.recomputed[key[0]] += 1
+        return self._values[key]
+
+class IncrementalAllocator:
+    """
+    The app's Open -> Buyer Total -> caps -> greedy allocation pipeline on a DependencyGraph.
+    Call `update(...)` with the current inputs (unchanged values are no-ops),
+    then read `open_demand()`, `buyer_total()`, `caps()` and `result()`.
+    An optional ResultCache memoizes month allocations across sessions.
+    """
+
+    def __init__(self, months: list, buyers: list, market_by_mc: dict, countries=("SG", "JP", "CN"), cache=None):
+        self.months = list(months)
+        self.buyers = list(buyers)
+        self.countries = list(countries)
+        self.cache = cache
+        self.g = g = DependencyGraph()
+        names_by_country = {c: [b.name for b in self.buyers if b.country == c] for c in self.countries}
+
+        for m in self.months:
+            for c in self.countries:
+                g.set_input(("market", m, c), float(market_by_mc[m][c]))
+                g.add_node(("open", m, c), lambda md, pct: md * float(pct),
+                           [("market", m, c), ("open_pct", m, c)])
+                g.add_node(("buyer_total", m, c), lambda open_, pct: open_ * float(pct),
+                           [("open", m, c), ("buyer_of_open_pct", m, c)])
+                names = names_by_country[c]
+                g.add_node(("caps", m, c), self._caps_fn(names),
+                           [("open", m, c), ("buyer_total", m, c)] + [("buyer_pct", n, m) for n in names])
+
+            deps = [("supply", m)] + [("caps", m, c) for c in self.countries]
+            deps += [("final_cost", m, c) for c in self.countries]
+            deps += [("active", b.name) for b in self.buyers] + [("price", b.name, m) for b in self.buyers]
+            g.add_node(("month", m), self._month_fn(m), deps)
+
+    @staticmethod
+    def _caps_fn(names):
+        def caps(open_, limit, *pcts):
+            # raw caps from % of Open, scaled down to the country's Buyer Total
+            out = {n: open_ * max(0.0, float(p) / 100.0) for n, p in zip(names, pcts)}
+            total = sum(out[n] for n in names)
+            if total > 0 and total > limit:
+                scale = limit / total
+                out = {n: v * scale for n, v in out.items()}
+            return out
+        return caps
+
+    def _month_fn(self, m):
+        n_c, n_b = len(self.countries), len(self.buyers)
+
+        def month(supply, *vals):
+            caps_c, costs = vals[:n_c], vals[n_c:2 * n_c]
+            active, prices = vals[2 * n_c:2 * n_c + n_b], vals[2 * n_c + n_b:]
+            caps = {}
+            for per_country in caps_c:
+                caps.update(per_country)
+            cost_by_country = dict(zip(self.countries, costs))
+            buyers = [b for b, on in zip(self.buyers, active) if on]
+            row_prices = [p for p, on in zip(prices, active) if on]
+            key = None
+            if self.cache is not None:
+                key = stable_hash("month_alloc", m, supply, cost_by_country,
+                                  [(b.name, b.country, b.profile, b.credit_rating, b.probability_of_default, p,
+                                    caps.get(b.name, 0.0))
+                                   for b, p in zip(buyers, row_prices)])
+                hit = self.cache.get(key)
+                if hit is not None:
+                    return hit
+            out = self._allocate_month(m, supply, caps, cost_by_country, buyers, row_prices)
+            if key is not None:
+                self.cache.put(key, out)
+            return out
+        return month
+
+    @staticmethod
+    def _allocate_month(m, supply, caps, cost_by_country, buyers, prices) -> dict:
+        price = np.array([[np.nan if p is None else p for p in prices]], dtype=float).reshape(1, len(buyers))
+        cost = np.array([[cost_by_country[b.country] for b in buyers]], dtype=float).reshape(1, len(buyers))
+        cap = np.array([[caps.get(b.name, 0.0) for b in buyers]], dtype=float).reshape(1, len(buyers))
+        pd_ = np.array([getattr(b, "probability_of_default", 0.0) for b in buyers], dtype=float)
+        res = greedy_allocate(price, cost, cap, pd_, supply, sensitivity=True)
+        cols = res["columns"]
+        drawn = {buyers[j].name: cap[0, j] - take for j, take in zip(cols["buyer_idx"], cols["volume"])}
+        sens = res["sensitivity"]
+        k = int(sens["marginal"][0])
+        # an unfilled buyer gets volume once its margin beats the upper end of its range
+        entry = {b.name: float(cost[0, j] + sens["profit_range"][0, j, 1])
+                 for j, b in enumerate(buyers)
+                 if res["allocation"][0, j] <= 0 and cap[0, j] > 0 and np.isfinite(sens["profit_range"][0, j, 1])}
+        return {"table": profit_table(res, [m], buyers), "leftover": float(res["leftover"][0]),
+                "caps_drawn": drawn,
+                "sensitivity": {"supply_dual": float(sens["supply_dual"][0]),
+                                "marginal": buyers[k].name if k >= 0 else None,
+                                "cap_dual": {b.name: float(v) for b, v in zip(buyers, sens["cap_dual"][0])},
+                                "price_to_enter": entry}}
+
+    # ---- inputs ----
+    def update(self, open_pct=None, buyer_of_open_pct=None, buyer_pct=None, active=None,
+               prices=None, final_costs=None, supply=None) -> int:
+        """
+        Push current inputs; any argument left as None is unchanged.
+        open_pct / buyer_of_open_pct: {month: {country: 0..1}}
+        buyer_pct:   {buyer: {month: 0..100}}     active: set of buyer names
+        prices:      {buyer: {month: $/MMBtu}}    final_costs: {month: {country: $/MMBtu}}
+        supply:      scalar or {month: MMBtu}
+        Returns the number of inputs that actually changed.
+        """
+        g, changed = self.g, 0
+        for m in self.months:
+            for c in self.countries:
+                if open_pct is not None:
+                    changed += g.set_input(("open_pct", m, c), float(open_pct[m][c]))
+                if buyer_of_open_pct is not None:
+                    changed += g.set_input(("buyer_of_open_pct", m, c), float(buyer_of_open_pct[m][c]))
+                if final_costs is not None:
+                    changed += g.set_input(("final_cost", m, c), float(final_costs[m][c]))
+            if supply is not None:
+                s = supply[m] if isinstance(supply, dict) else supply
+                changed += g.set_input(("supply", m), float(s))
+            for b in self.buyers:
+                if buyer_pct is not None:
+                    changed += g.set_input(("buyer_pct", b.name, m), float(buyer_pct.get(b.name, {}).get(m, 0.0)))
+                if prices is not None:
+                    changed += g.set_input(("price", b.name, m), prices.get(b.name, {}).get(m))
+        if active is not None:
+            for b in self.buyers:
+                changed += g.set_input(("active", b.name), b.name in active)
+        return changed
+
+    # ---- outputs ----
+    def open_demand(self) -> dict:
+        return {m: {c: self.g.get(("open", m, c)) for c in self.countries} for m in self.months}
+
+    def buyer_total(self) -> dict:
+        return {m: {c: self.g.get(("buyer_total", m, c)) for c in self.countries} for m in self.months}
+
+    def caps(self) -> dict:
+        out = {}
+        for m in self.months:
+            out[m] = {}
+            for c in self.countries:
+                out[m].update(self.g.get(("caps", m, c)))
+        return out
+
+    def result(self) -> dict:
+        "{'table': DataFrame over all months, 'leftover': {month: MMBtu}, 'caps_drawn': {month: {...}}, 'sensitivity': {month: {...}}}"
+        per_month = [self.g.get(("month", m)) for m in self.months]
+        tables = [r["table"] for r in per_month if len(r["table"])]
+        table = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=PROFIT_TABLE_COLUMNS)
+        return {
+            "table": table,
+            "leftover": {m: r["leftover"] for m, r in zip(self.months, per_month)},
+            "caps_drawn": {m: dict(r["caps_drawn"]) for m, r in zip(self.months, per_month)},
+            "sensitivity": {m: r["sensitivity"] for m, r in zip(self.months, per_month)},
+        }
@@ -0,0 +1,287 @@
+"""
+One-off ingestion of the data/*.xlsx market workbooks into a columnar cache.
+
+Each workbook is parsed once (openpyxl is slow) into a normalised long table
+(date, contract, price) and written next to data/ as an Arrow IPC file, or
+.npz when pyarrow is not installed. Later loads memory-map the cache and hand
+back NumPy columns without copying. Entries are invalidated when a workbook's
+mtime/size changes and its SHA-256 no longer matches.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - pyarrow ships with streamlit
+    pa = None
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+CACHE_VERSION = 2
+
+_MONTH_CODES = "FGHJKMNQUVXZ"  # futures month letters, Jan..Dec
+FORWARD_YEARS = 15  # furthest contract year past extraction a forward sheet may list
+_MONTH_ABBR = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+
+@dataclass
+class MarketTable:
+    "Normalised (date, contract, price) columns; contracts are dictionary-encoded."
+    name: str
+    date: np.ndarray            # datetime64[ns], NaT for non-monthly contracts
+    contract_codes: np.ndarray  # int32 index into `contracts`
+    contracts: list
+    price: np.ndarray           # float64
+
+    @property
+    def contract(self) -> np.ndarray:
+        return np.asarray(self.contracts, dtype=object)[self.contract_codes]
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            "date": self.date,
+            "contract": pd.Categorical.from_codes(self.contract_codes, self.contracts),
+            "price": self.price,
+        })
+
+# ---- Parsers: raw sheet (header=None) -> DataFrame[date, contract, price] ----
+def _frame(date, contract, price) -> pd.DataFrame:
+    "Build the normalised frame; `contract` may be one RIC for the whole sheet."
+    price = pd.to_numeric(pd.Series(np.asarray(price, dtype=object)), errors="coerce")
+    if isinstance(contract, str):
+        contract = [contract] * len(price)
+    out = pd.DataFrame({
+        "date": pd.to_datetime(pd.Series(np.asarray(date, dtype=object)), errors="coerce"),
+        "contract": pd.Series(np.asarray(contract, dtype=object)).astype(str),
+        "price": price,
+    }).dropna(subset=["price"])
+    return out.sort_values(["contract", "date"], kind="stable").reset_index(drop=True)
+
+def _close_or_last(df: pd.DataFrame) -> pd.Series:
+    close = pd.to_numeric(df["Close"], errors="coerce")
+    return close.fillna(pd.to_numeric(df["Last"], errors="coerce"))
+
+def _with_header(raw: pd.DataFrame, row: int) -> pd.DataFrame:
+    body = raw.iloc[row + 1:].copy()
+    body.columns = [str(c).strip() for c in raw.iloc[row]]
+    return body
+
+def _parse_refinitiv_history(raw: pd.DataFrame, price_col: str = "Close") -> pd.DataFrame:
+    "Refinitiv history export: RIC in the title block, table under an 'Exchange Date' header."
+    first = raw[0].astype(str).str.strip()
+    ric = first.iloc[3]
+    header = int(first[first == "Exchange Date"].index[0])
+    body = _with_header(raw, header)
+    return _frame(body["Exchange Date"], ric, body[price_col])
+
+def _parse_fx_history(raw: pd.DataFrame) -> pd.DataFrame:
+    return _parse_refinitiv_history(raw, price_col="Bid")
+
+def _month_from_code(code: str):
+    "'/JKMF26' or 'TRNLTTFMF6' style futures codes -> first day of the delivery month."
+    m = re.search(r"([FGHJKMNQUVXZ])(\d{1,2})$", code)
+    if not m:
+        return pd.NaT
+    year = int(m.group(2))
+    year += 2020 if year < 10 else 2000
+    return pd.Timestamp(year=year, month=_MONTH_CODES.index(m.group(1)) + 1, day=1)
+
+def _parse_jkm_forward(raw: pd.DataFrame) -> pd.DataFrame:
+    body = _with_header(raw, 0)
+    codes = body["Index"].astype(str).str.strip()
+    return _frame([_month_from_code(c) for c in codes], codes, _close_or_last(body))
+
+def _parse_hh_forward(raw: pd.DataFrame) -> pd.DataFrame:
+    body = _with_header(raw, 0)
+    names = body["Name"].astype(str).str.upper()
+    tags = names.str.extract(r"([A-Z]{3})(\d{2})")
+    dates = [pd.Timestamp(year=2000 + int(y), month=_MONTH_ABBR.index(mo) + 1, day=1)
+             if isinstance(mo, str) and mo in _MONTH_ABBR else pd.NaT
+             for mo, y in zip(tags[0], tags[1])]
+    return _frame(dates, body["Index"].astype(str).str.strip(), _close_or_last(body))
+
+def _parse_ttf_forward(raw: pd.DataFrame) -> pd.DataFrame:
+    body = _with_header(raw, 0)
+    rics = body["RIC"].astype(str).str.strip()
+    # only the monthly strip (TRNLTTFM<code><y>) maps to a delivery month
+    dates = [_month_from_code(r) if r.startswith("TRNLTTFM") else pd.NaT for r in rics]
+    return _frame(dates, rics, _close_or_last(body))
+
+def _unwrap_strip(dates) -> list:
+    """
+    Consecutive contract months whose labels kept only the last digit of the
+    year (Excel read 'Nov25' as Nov-2005, 'Jan30' as Jan-2000): place the first
+    in the 2020s, as `_month_from_code` does, and step each later one forward a
+    decade at a time until the strip is increasing again.
+    """
+    out, prev = [], pd.Timestamp(2020, 1, 1)
+    for d in pd.to_datetime(pd.Series(np.asarray(dates, dtype=object)), errors="coerce"):
+        if pd.isna(d):
+            out.append(pd.NaT)
+            continue
+        d = pd.Timestamp(year=prev.year - prev.year % 10 + d.year % 10, month=d.month, day=1)
+        while d < prev:
+            d = d.replace(year=d.year + 10)
+        out.append(d)
+        prev = d
+    return out
+
+def _parse_wti_forward(raw: pd.DataFrame) -> pd.DataFrame:
+    body = _with_header(raw, 0)
+    return _frame(_unwrap_strip(body["Month"]), "CL", _close_or_last(body))
+
+def _parse_brent(raw: pd.DataFrame) -> pd.DataFrame:
+    body = _with_header(raw, 0)
+    return _frame(body["Date"], "BRENT", body.iloc[:, 1])
+
+def _parse_baltic(raw: pd.DataFrame) -> pd.DataFrame:
+    # row 0: Date, .BLNG1g (TRDPRC_1), ...; row 1: Close; data from row 2
+    parts = []
+    for j in range(1, raw.shape[1]):
+        ric = str(raw.iloc[0, j]).split()[0].lstrip(".")
+        parts.append(_frame(raw.iloc[2:, 0], ric, raw.iloc[2:, j]))
+    return pd.concat(parts, ignore_index=True)
+
+MARKET_FILES = {
+    "jkm_forward": ("JKM Spot LNG Forward (Extracted 23Sep25).xlsx", _parse_jkm_forward),
+    "jkm_historical": ("JKM Spot LNG Historical (Extracted 23Sep25).xlsx", _parse_refinitiv_history),
+    "henry_hub_forward": ("Henry Hub Forward (Extracted 23Sep25).xlsx", _parse_hh_forward),
+    "henry_hub_historical": ("Henry Hub Historical (Extracted 23Sep25).xlsx", _parse_refinitiv_history),
+    "ttf_forward": ("TTF Forward (Extracted 23Sep25).xlsx", _parse_ttf_forward),
+    "ttf_historical": ("TTF Historical (Extracted 23Sep25).xlsx", _parse_refinitiv_history),
+    "wti_forward": ("WTI Forward (Extracted 23Sep25).xlsx", _parse_wti_forward),
+    "wti_historical": ("WTI Historical (Extracted 23Sep25).xlsx", _parse_refinitiv_history),
+    "brent_historical": ("Brent Oil Historical Prices (Extracted 01Oct25).xlsx", _parse_brent),
+    "baltic_freight": ("Baltic LNG Freight Curves Historical .xlsx", _parse_baltic),
+    "usdsgd_historical": ("USDSGD FX Spot Rate Historical (Extracted 23Sep25).xlsx", _parse_fx_history),
+}
+
+def _extracted_year(fname: str) -> int | None:
+    "'... (Extracted 23Sep25).xlsx' -> 2025."
+    m = re.search(r"Extracted \d{1,2}[A-Za-z]{3}(\d{2})", fname)
+    return 2000 + int(m.group(1)) if m else None
+
+def _check_dates(name: str, fname: str, df: pd.DataFrame) -> None:
+    """
+    Reject a parse whose dates fall far outside the workbook's extraction year:
+    forward strips must start within a year of it and end within FORWARD_YEARS,
+    history must not run past it.
+    """
+    year = _extracted_year(fname)
+    dates = df["date"].dropna()
+    if year is None or dates.empty:
+        return
+    lo, hi = (year - 1, year + FORWARD_YEARS) if name.endswith("_forward") else (None, year + 1)
+    first, last = dates.min().year, dates.max().year
+    if (lo is not None and first < lo) or last > hi:
+        raise ValueError(f"{fname}: parsed dates {dates.min():%Y-%m} to {dates.max():%Y-%m} are outside "
+                         f"{lo or 'any'}..{hi} for a sheet extracted in {year}")
+
+# ---- Cache ----
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _to_table(name: str, df: pd.DataFrame) -> MarketTable:
+    cat = pd.Categorical(df["contract"])
+    return MarketTable(
+        name=name,
+        date=df["date"].to_numpy(dtype="datetime64[ns]"),
+        contract_codes=cat.codes.astype(np.int32),
+        contracts=[str(c) for c in cat.categories],
+        price=df["price"].to_numpy(dtype=float),
+    )
+
+def _write(path: Path, t: MarketTable) -> None:
+    if pa is not None:
+        table = pa.table({
+            "date": pa.array(t.date, type=pa.timestamp("ns")),
+            "contract": pa.DictionaryArray.from_arrays(pa.array(t.contract_codes, type=pa.int32()),
+                                                       pa.array(t.contracts, type=pa.string())),
+            "price": pa.array(t.price, type=pa.float64()),
+        })
+        with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        np.savez(path, date=t.date, contract_codes=t.contract_codes,
+                 contracts=np.asarray(t.contracts, dtype=str), price=t.price)
+
+def _read(path: Path, name: str) -> MarketTable:
+    if pa is not None:
+        table = pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all().combine_chunks()
+        contract = table.column("contract").chunk(0) if table.num_rows else None
+        return MarketTable(
+            name=name,
+            date=table.column("date").to_numpy(),
+            contract_codes=(contract.indices.to_numpy(zero_copy_only=False) if contract is not None
+                            else np.empty(0, dtype=np.int32)),
+            contracts=contract.dictionary.to_pylist() if contract is not None else [],
+            price=table.column("price").to_numpy(),
+        )
+    with np.load(path) as z:
+        return MarketTable(name, z["date"], z["contract_codes"], z["contracts"].tolist(), z["price"])
+
+def load_market_data(data_dir: str | Path | None = None, cache_dir: str | Path | None = None,
+                     datasets=None, refresh: bool = False) -> dict[str, MarketTable]:
+    """
+    Return {dataset: MarketTable} for the workbooks in MARKET_FILES.
+
+    Workbooks are parsed only when their cache entry is missing or stale
+    (mtime/size changed and content hash differs) or `refresh` is set.
+    The cache lives in `<data_dir>/.cache` unless `cache_dir` is given.
+    Missing workbooks are skipped.
+    """
+    data_dir = Path(data_dir) if data_dir is not None else DATA_DIR
+    cache_dir = Path(cache_dir) if cache_dir is not None else data_dir / ".cache"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = cache_dir / "manifest.json"
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    if manifest.get("version") != CACHE_VERSION:
+        manifest = {"version": CACHE_VERSION, "entries": {}}
+    entries = manifest["entries"]
+    suffix = ".arrow" if pa is not None else ".npz"
+
+    out = {}
+    dirty = False
+    for name in (datasets or MARKET_FILES):
+        fname, parser = MARKET_FILES[name]
+        src = data_dir / fname
+        if not src.exists():
+            continue
+        cached = cache_dir / f"{name}{suffix}"
+        st = src.stat()
+        entry = entries.get(name)
+        fresh = (not refresh and entry is not None and cached.exists()
+                 and entry.get("format") == suffix)
+        if fresh and (entry["mtime_ns"], entry["size"]) != (st.st_mtime_ns, st.st_size):
+            # touched: only re-parse if the bytes actually changed
+            digest = _sha256(src)
+            fresh = digest == entry["sha256"]
+            if fresh:
+                entry.update(mtime_ns=st.st_mtime_ns, size=st.st_size)
+                dirty = True
+
+        if fresh:
+            out[name] = _read(cached, name)
+            continue
+
+        raw = pd.read_excel(src, header=None, sheet_name=0)
+        parsed = parser(raw)
+        _check_dates(name, fname, parsed)
+        table = _to_table(name, parsed)
+        _write(cached, table)
+        entries[name] = {"source": fname, "mtime_ns": st.st_mtime_ns, "size": st.st_size,
+                         "sha256": _sha256(src), "format": suffix}
+        dirty = True
+        out[name] = table
+
+    if dirty:
+        manifest_path.write_text(json.dumps(manifest, indent=2))
+    return out
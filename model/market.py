@@ -0,0 +1,370 @@
+"""
+Market model, buyer book and cap derivation behind the Streamlit app.
+
+Everything here is plain Python (no Streamlit import) so batch jobs and
+notebooks can use it. Module-level tables are built once per process on
+import; the app memoizes the input-dependent derivations on top.
+"""
+from __future__ import annotations
+from models import LNGMonth, LNGDestination, LNGBuyer, MarketHorizon, SHIPMENT_VOLUME, TOTAL_TERMINAL_COST
+from . import trace
+from .curves import CurveSet, ForwardCurve, to_dates
+
+COUNTRIES = ["SG", "JP", "CN"]
+
+DAYS_IN_MONTH = {"Jan-2026":31,"Feb-2026":28,"Mar-2026":31,"Apr-2026":30,"May-2026":31,"Jun-2026":30}
+
+def make_month(month_name, hh, brent_mmbtu, jkm, blng3g, dests):
+    freight_cost = {k: blng3g * d.voyage_days for k, d in dests.items()}
+    final_cost = {
+        k: hh + ((TOTAL_TERMINAL_COST + v) / SHIPMENT_VOLUME)
+        for k, v in freight_cost.items()
+    }
+    return LNGMonth(
+        month=month_name,
+        cost_usd_hh_mmbtu=hh,
+        price_usd_brent_mmbtu=brent_mmbtu,
+        price_usd_jkm_mmbtu=jkm,
+        BLNG3g=blng3g,
+        freight_cost=freight_cost,
+        final_cost_usd_mmbtu=final_cost,
+    )
+
+DESTS = {
+    "SG": LNGDestination(name="SG", voyage_days=48.91125),
+    "JP": LNGDestination(name="JP", voyage_days=42.42083333),
+    "South CN": LNGDestination(name="South CN", voyage_days=51.79375),
+    "CN": LNGDestination(name="CN", voyage_days=53.08375),
+}
+
+# Month-level inputs as curves (HH purchase cost incl. adder, Brent in $/MMBtu,
+# JKM forward, BLNG3g day rate). Extending the horizon = adding curve points and
+# month labels, or passing model.curves.curves_from_market_data(load_market_data())
+# to build_horizon (same keys; Brent there is the monthly history, held flat ahead).
+DEFAULT_CURVES = CurveSet(
+    HH=ForwardCurve.from_points({
+        "Jan-2026": 6.665, "Feb-2026": 6.464, "Mar-2026": 6.107,
+        "Apr-2026": 5.973, "May-2026": 6.006, "Jun-2026": 6.169}, name="HH"),
+    BRENT_MMBTU=ForwardCurve.from_points({
+        "Jan-2026": 21.86775512, "Feb-2026": 20.81119523, "Mar-2026": 20.06360325,
+        "Apr-2026": 18.79462793, "May-2026": 17.77944768, "Jun-2026": 19.70773843}, name="BRENT_MMBTU"),
+    JKM=ForwardCurve.from_points({
+        "Jan-2026": 11.64, "Feb-2026": 11.61, "Mar-2026": 11.345,
+        "Apr-2026": 10.91, "May-2026": 10.835, "Jun-2026": 10.93}, name="JKM"),
+    BLNG3G=ForwardCurve.from_points({
+        "Jan-2026": 52691.62, "Feb-2026": 56445.97, "Mar-2026": 60200.31,
+        "Apr-2026": 64081.92, "May-2026": 67963.53, "Jun-2026": 71845.14}, name="BLNG3G"),
+)
+
+def build_horizon(periods, curves: CurveSet = DEFAULT_CURVES, dests: dict = DESTS, labels=None,
+                  freight_index=None, freight_window: str = "month") -> MarketHorizon:
+    """
+    MarketHorizon for `periods` (month labels, or any dates - e.g.
+    curves.month_starts(...) or a daily np.arange of datetime64[D]): curves,
+    freight, final costs and sell bands in one vectorised pass.
+
+    With a `model.freight.FreightIndex`, freight is the day rate integrated
+    over each voyage instead of BLNG3g x voyage days: averaged over every
+    departure day of the period's month (freight_window="month") or for a
+    departure on the period date ("day").
+    """
+    periods = list(periods) if not hasattr(periods, "dtype") else periods
+    dates = to_dates(periods)
+    vals = curves.evaluate(dates)
+    if labels is None:
+        labels = [str(p) for p in (periods if not hasattr(periods, "dtype") else dates)]
+    voyage_days = {k: d.voyage_days for k, d in dests.items()}
+    freight = None
+    if freight_index is not None:
+        vd = list(voyage_days.values())
+        if freight_window == "month":
+            freight = freight_index.monthly_freight(dates, vd)
+        elif freight_window == "day":
+            freight = freight_index.hire(dates[:, None], [vd])
+        else:
+            raise ValueError("freight_window must be 'month' or 'day'")
+    return MarketHorizon(labels, vals["HH"], vals["BRENT_MMBTU"], vals["JKM"], vals["BLNG3G"],
+                         voyage_days, dates=dates, freight=freight)
+
+def build_months(month_labels, curves: CurveSet = DEFAULT_CURVES, dests: dict = DESTS) -> list:
+    "LNGMonth-compatible views per label (see build_horizon)."
+    return list(build_horizon(month_labels, curves, dests))
+
+HORIZON = build_horizon(list(DAYS_IN_MONTH))
+MONTHS = list(HORIZON)
+
+MONTH_BY_NAME = {mo.month: mo for mo in MONTHS}
+
+# --- MARKET DEMAND (MMBtu) per country-month (your "Assumed Country Demand") ---
+MARKET_DEMAND = {
+    "SG": {"Jan-2026": 35_700_000, "Feb-2026": 35_700_000, "Mar-2026": 35_700_000,
+           "Apr-2026": 35_700_000, "May-2026": 35_700_000, "Jun-2026": 35_700_000},
+    "CN": {"Jan-2026": 297_200_000, "Feb-2026": 245_000_000, "Mar-2026": 234_600_000,
+           "Apr-2026": 263_800_000, "May-2026": 252_400_000, "Jun-2026": 276_900_000},
+    "JP": {"Jan-2026": 318_600_000, "Feb-2026": 314_500_000, "Mar-2026": 289_800_000,
+           "Apr-2026": 275_800_000, "May-2026": 242_900_000, "Jun-2026": 231_000_000},
+}
+
+# Turn {country:{month:val}} into {month:{country:val}}
+def by_month_country(d_country_month: dict) -> dict:
+    return {mo.month: {c: float(d_country_month[c][mo.month]) for c in COUNTRIES} for mo in MONTHS}
+
+MARKET_BY_MC = by_month_country(MARKET_DEMAND)
+
+@trace.traced("market.open_and_buyer_totals")
+def derive_open_and_buyer_totals(market_by_mc: dict, open_pct_mc: dict, buyer_of_open_pct_mc: dict):
+    """Return (open_by_mc, buyer_total_by_mc) both as {month:{country:value}}."""
+    open_by_mc = {m: {} for m in market_by_mc}
+    buyer_total_by_mc = {m: {} for m in market_by_mc}
+    for m in market_by_mc:
+        for c in COUNTRIES:
+            md = float(market_by_mc[m][c])
+            open_ = md * float(open_pct_mc[m][c])
+            buyer_total = open_ * float(buyer_of_open_pct_mc[m][c])
+            open_by_mc[m][c] = open_
+            buyer_total_by_mc[m][c] = buyer_total
+    return open_by_mc, buyer_total_by_mc
+
+def buyer_total_from_pct(open_by_mc: dict, buyer_pct_of_open_mc: dict) -> dict:
+    # {month:{country: buyer_total_mmbtu}}
+    out = {}
+    for m in open_by_mc:
+        out[m] = {}
+        for c in COUNTRIES:
+            out[m][c] = float(open_by_mc[m][c]) * float(buyer_pct_of_open_mc[m][c])
+    return out
+
+def price_from_jkm(nf: float) -> dict[str, float]:
+    return dict(zip(HORIZON.labels, (HORIZON.jkm + nf).tolist()))
+
+def ironman_price(nf: float) -> dict[str, float]:
+    return dict(zip(HORIZON.labels, (HORIZON.sell_band("SG")[1] + nf).tolist()))
+
+buyer_Ironman = LNGBuyer(
+    name="Iron Man Pte Ltd", 
+    country="SG",
+    profile="Bunker Supplier", 
+    credit_rating="A", 
+    negotiation_factor= 4.0, 
+    price=ironman_price(4.0))
+
+buyer_Thor = LNGBuyer(
+    name="Thor Pte Ltd", 
+    country="SG",
+    profile="Power Utility Company", 
+    credit_rating="AA", 
+    negotiation_factor= -7.5, 
+    price=price_from_jkm(-7.5))
+
+buyer_Vision = LNGBuyer(
+    name="Vision Pte Ltd", 
+    country="SG",
+    profile="Trader", 
+    credit_rating="BB", 
+    negotiation_factor= -1.5, 
+    price=price_from_jkm(-1.5))
+
+buyer_Loki = LNGBuyer(
+    name="Loki Pte Ltd", 
+    country="SG",
+    profile="Trader", 
+    credit_rating="CCC", 
+    negotiation_factor= -1.5, 
+    price=price_from_jkm(-1.5))
+
+buyer_Hawkeye = LNGBuyer(
+    name="Hawk Eye Pte Ltd", 
+    country="JP",
+    profile="Trader", 
+    credit_rating="AA", 
+    negotiation_factor= -7.5, 
+    price=price_from_jkm(-7.5))
+
+buyer_Ultron = LNGBuyer(
+    name="Ultron Pte Ltd", 
+    country="JP",
+    profile="Trader", 
+    credit_rating="B", 
+    negotiation_factor= 0.0, 
+    price=price_from_jkm(0.0))
+
+buyer_Quicksilver = LNGBuyer(
+    name="Quicksilver Pte Ltd", 
+    country="JP",
+    profile="Trader", 
+    credit_rating="A", 
+    negotiation_factor= -7.5, 
+    price=price_from_jkm(-7.5))
+
+buyer_Hulk = LNGBuyer(
+    name="Hulk Pte Ltd", 
+    country="CN",
+    profile="Trader", 
+    credit_rating="BB", 
+    negotiation_factor= -1.5, 
+    price=price_from_jkm(-1.5))
+
+BUYERS = [buyer_Ironman, buyer_Thor, buyer_Vision, buyer_Loki, buyer_Hawkeye, buyer_Ultron, buyer_Quicksilver, buyer_Hulk]
+
+# ===== Derived default percentages (0..1) =====
+# Open% = Open Demand / Assumed Demand
+OPEN_PCT_DEFAULT = {
+    "Jan-2026": {"SG": 0.10, "CN": 0.10, "JP": 0.05},
+    "Feb-2026": {"SG": 0.25, "CN": 0.25, "JP": 0.25},
+    "Mar-2026": {"SG": 0.50, "CN": 0.25, "JP": 0.25},
+    "Apr-2026": {"SG": 0.50, "CN": 0.50, "JP": 0.70},
+    "May-2026": {"SG": 0.65, "CN": 0.60, "JP": 0.70},
+    "Jun-2026": {"SG": 0.65, "CN": 0.60, "JP": 0.70},
+}
+
+# Buyer% of Open = Buyer Total / Open Demand
+BUYER_OF_OPEN_PCT_DEFAULT = {
+    "Jan-2026": {"SG": 1.00, "CN": 1.00, "JP": 0.05},
+    "Feb-2026": {"SG": 0.50, "CN": 0.25, "JP": 0.25},
+    "Mar-2026": {"SG": 0.50, "CN": 0.25, "JP": 0.25},
+    "Apr-2026": {"SG": 0.50, "CN": 0.50, "JP": 0.70},
+    "May-2026": {"SG": 0.50, "CN": 0.60, "JP": 0.70},
+    "Jun-2026": {"SG": 0.50, "CN": 0.60, "JP": 0.70},
+}
+
+# --- DEFAULT Buyer Open Demand (MMBtu) per buyer per month ---
+# Directly hardcoded from provided table.
+BUYER_OPEN_DEMAND_DEFAULT = {
+    "Iron Man Pte Ltd": {
+        "Jan-2026": 3_570_000, "Feb-2026": 4_462_500, "Mar-2026": 8_925_000,
+        "Apr-2026": 8_925_000, "May-2026": 11_602_500, "Jun-2026": 11_602_500,
+    },
+    "Thor Pte Ltd": {
+        "Jan-2026": 3_570_000, "Feb-2026": 4_462_500, "Mar-2026": 8_925_000,
+        "Apr-2026": 8_925_000, "May-2026": 11_602_500, "Jun-2026": 11_602_500,
+    },
+    "Vision Pte Ltd": {
+        "Jan-2026": 3_570_000, "Feb-2026": 4_462_500, "Mar-2026": 8_925_000,
+        "Apr-2026": 8_925_000, "May-2026": 11_602_500, "Jun-2026": 11_602_500,
+    },
+    "Loki Pte Ltd": {
+        "Jan-2026": 3_570_000, "Feb-2026": 4_462_500, "Mar-2026": 8_925_000,
+        "Apr-2026": 8_925_000, "May-2026": 11_602_500, "Jun-2026": 11_602_500,
+    },
+    "Hawk Eye Pte Ltd": {
+        "Jan-2026": 796_500, "Feb-2026": 19_656_250, "Mar-2026": 18_112_500,
+        "Apr-2026": 135_142_000, "May-2026": 119_021_000, "Jun-2026": 113_190_000,
+    },
+    "Ultron Pte Ltd": {
+        "Jan-2026": 796_500, "Feb-2026": 19_656_250, "Mar-2026": 18_112_500,
+        "Apr-2026": 135_142_000, "May-2026": 119_021_000, "Jun-2026": 113_190_000,
+    },
+    "Quicksilver Pte Ltd": {
+        "Jan-2026": 796_500, "Feb-2026": 19_656_250, "Mar-2026": 18_112_500,
+        "Apr-2026": 135_142_000, "May-2026": 119_021_000, "Jun-2026": 113_190_000,
+    },
+    "Hulk Pte Ltd": {
+        "Jan-2026": 29_720_000, "Feb-2026": 15_312_500, "Mar-2026": 14_662_500,
+        "Apr-2026": 65_950_000, "May-2026": 90_864_000, "Jun-2026": 99_684_000,
+    },
+}
+
+def buyers_by_country(buyers=None) -> dict:
+    "{country: [buyer_name, ...]} in book order."
+    buyers = BUYERS if buyers is None else buyers
+    return {c: [b.name for b in buyers if b.country == c] for c in COUNTRIES}
+
+def default_buyer_pct_per_month(open_by_mc: dict, buyer_total_by_mc: dict) -> dict:
+    """
+    Create defaults: {buyer_name:{month: % of Open (0..100)}}.
+    Equal split of Buyer Total among buyers in the same country, then converted to % of Open.
+    """
+    months = [m.month for m in MONTHS]
+    pct_map = {b.name: {m: 0.0 for m in months} for b in BUYERS}
+
+    for m in months:
+        for c, names in buyers_by_country().items():
+            n = max(1, len(names))
+            open_c = float(open_by_mc[m][c])
+            buyer_total_c = float(buyer_total_by_mc[m][c])
+            per_buyer_mmbtu = buyer_total_c / n
+            pct_of_open = (per_buyer_mmbtu / open_c * 100.0) if open_c > 0 else 0.0
+            for name in names:
+                pct_map[name][m] = pct_of_open
+    return pct_map
+
+# --- Helpers to build/validate caps from your per-buyer defaults ---
+
+def buyer_caps_from_per_buyer_defaults(per_buyer: dict) -> dict:
+    """
+    Convert {buyer:{month:value}} -> {month:{buyer:value}} for use as caps.
+    Only includes buyers that exist in BUYERS. Missing months default to 0.0.
+    """
+    months = [m.month for m in MONTHS]
+    caps = {m: {} for m in months}
+
+    for b in BUYERS:
+        per_month = per_buyer.get(b.name, {})
+        for m in months:
+            caps[m][b.name] = float(per_month.get(m, 0.0))
+    return caps
+
+@trace.traced("market.validate_caps")
+def validate_caps_against_country_totals(caps_by_month: dict, buyer_total_by_mc: dict) -> dict:
+    """
+    Ensure that for each (month, country), the sum of caps of buyers in that country
+    does not exceed that country’s Buyer Total (Open × Buyer% of Open).
+    If it does, scale down the buyers in that country proportionally.
+    """
+    months = [m.month for m in MONTHS]
+
+    # copy so we don't mutate the original
+    out = {m: dict(caps_by_month.get(m, {})) for m in months}
+
+    for m in months:
+        for c, names in buyers_by_country().items():
+            country_cap_sum = sum(out[m].get(n, 0.0) for n in names)
+            limit = float(buyer_total_by_mc[m][c])
+            if country_cap_sum > 0 and country_cap_sum > limit:
+                scale = limit / country_cap_sum
+                for n in names:
+                    out[m][n] = out[m].get(n, 0.0) * scale
+    return out
+
+# Turn buyer %s (0..100 of Open) into per-buyer caps (MMBtu), then validate vs Buyer Totals
+@trace.traced("market.caps_from_pct")
+def caps_from_buyer_pct_monthly(pct_map_by_buyer: dict, open_by_mc: dict, buyer_total_by_mc: dict) -> dict:
+    months = [m.month for m in MONTHS]
+    caps = {m: {} for m in months}
+    # build caps from % of Open
+    country_by_buyer = {b.name: b.country for b in BUYERS}
+    for bname, per_month in pct_map_by_buyer.items():
+        c = country_by_buyer[bname]
+        for m in months:
+            pct = float(per_month.get(m, 0.0)) / 100.0
+            caps[m][bname] = float(open_by_mc[m][c]) * max(0.0, pct)
+
+    # validate: do not exceed Buyer Total per (month,country)
+    return validate_caps_against_country_totals(caps, buyer_total_by_mc)
+
+def buyer_caps_by_month(buyers, buyer_weights_by_country, buyer_total_by_mc):
+    """
+    Returns caps: {month: {buyer_name: cap_mmbtu}}
+    Splits each country-month BuyerTotal across *active* buyers by their per-month weight.
+    """
+    caps = {m.month: {} for m in MONTHS}
+    for mo in MONTHS:
+        m = mo.month
+        for c in COUNTRIES:
+            total_c = float(buyer_total_by_mc[m][c])
+            # sum weights for active buyers of this country in this month
+            denom = 0.0
+            w_this = {}
+            for b in buyers:
+                if b.country != c: 
+                    continue
+                w = float(buyer_weights_by_country.get(c, {}).get(b.name, {}).get(m, 0.0))
+                if w > 0:
+                    w_this[b.name] = w
+                    denom += w
+            if total_c <= 0 or denom <= 0:
+                continue
+            # per-buyer caps from weights
+            for name, w in w_this.items():
+                caps[m][name] = caps[m].get(name, 0.0) + total_c * (w / denom)
+    return caps
@@ -0,0 +1,326 @@
+"""
+Min-cost-flow allocation of supply to buyers across months and countries.
+
+Network (max-profit flow = min-cost flow with cost = -margin):
+
+    source -> terminal t            cap: terminal supply over the horizon
+    terminal t -> month m           cap: terminal supply in month m, cost: terminal cost
+    month m -> month m+1            cap: inf, cost: storage cost   (optional carry-over)
+    month m -> sales m              cap: monthly sell position (SELL_POSITION)
+    sales m -> country (m, c)       cap: country Buyer Total for the month
+    country (m, c) -> sink          one arc per buyer, cap: buyer cap, cost: -margin
+
+Flow is only pushed while it is profitable, so supply can stay unsold.
+With a single terminal and no storage the network is a tree: every buyer
+arc has a unique path to the source, and filling buyer arcs in descending
+margin order, each up to the smallest residual on its path, is exact
+(greedy is optimal on laminar capacities). That fast path runs in
+O(L log L) for L buyer-month arcs. Anything else goes through successive
+shortest paths with Dijkstra on reduced costs. There the laminar subtree
+under each month is first collapsed into one concave "ladder" arc, so the
+graph has T + M + 2 nodes whatever the book and country count.
+"""
+from __future__ import annotations
+import heapq
+import numpy as np
+from . import trace
+
+_INF = float("inf")
+
+class FlowNetwork:
+    "Adjacency-list residual graph for successive-shortest-path min-cost flow."
+
+    def __init__(self, n_nodes: int):
+        self.n = n_nodes
+        self.head, self.cap, self.cost, self.adj = [], [], [], [[] for _ in range(n_nodes)]
+        self.ladders = {}  # arc id -> [caps, costs, step, flows]
+
+    def add_arc(self, u: int, v: int, cap: float, cost: float = 0.0) -> int:
+        "Add u->v (and its residual twin); returns the forward arc id."
+        e = len(self.head)
+        self.head += [v, u]
+        self.cap += [float(cap), 0.0]
+        self.cost += [float(cost), -float(cost)]
+        self.adj[u].append(e)
+        self.adj[v].append(e + 1)
+        return e
+
+    def add_ladder(self, u: int, sink: int, caps, costs) -> int:
+        """
+        Parallel u->sink arcs with non-decreasing costs, kept as one arc that
+        steps to the next (cap, cost) when saturated. SSP never sends flow
+        back out of the sink, so the cheapest live step is the only one that
+        can be on a shortest path; this keeps Dijkstra at O(#ladders) arcs
+        instead of O(#steps). Returns the arc id; see `ladder_flows`.
+        """
+        e = self.add_arc(u, sink, caps[0], costs[0])
+        self.ladders[e] = [[float(c) for c in caps], [float(c) for c in costs], 0, [0.0] * len(caps)]
+        return e
+
+    def _advance_ladder(self, e: int, tol: float) -> None:
+        caps, costs, step, flows = self.ladders[e]
+        while self.cap[e] <= tol and step < len(caps):
+            flows[step] = caps[step]
+            step += 1
+            if step < len(caps):
+                self.cap[e], self.cost[e], self.cost[e ^ 1] = caps[step], costs[step], -costs[step]
+        self.cap[e ^ 1] = 0.0
+        self.ladders[e][2] = step
+
+    def ladder_flows(self, e: int) -> list:
+        caps, _, step, flows = self.ladders[e]
+        if step < len(caps):
+            flows = flows[:step] + [caps[step] - self.cap[e]] + flows[step + 1:]
+        return flows
+
+    def flow(self, e: int) -> float:
+        return self.cap[e ^ 1]
+
+    def _initial_potentials(self, s: int) -> list:
+        "Bellman-Ford (queue-based) over arcs with residual capacity; costs may be negative."
+        pot = [_INF] * self.n
+        pot[s] = 0.0
+        queue, inq = [s], [False] * self.n
+        inq[s] = True
+        while queue:
+            u = queue.pop()
+            inq[u] = False
+            for e in self.adj[u]:
+                if self.cap[e] > 0:
+                    v, nd = self.head[e], pot[u] + self.cost[e]
+                    if nd < pot[v] - 1e-12:
+                        pot[v] = nd
+                        if not inq[v]:
+                            inq[v] = True
+                            queue.append(v)
+        return [0.0 if p == _INF else p for p in pot]
+
+    def min_cost_flow(self, s: int, t: int, max_flow: float = _INF, tol: float = 1e-9) -> tuple:
+        """
+        Push flow s->t along cheapest paths while the path cost is negative
+        (i.e. the marginal unit is profitable). Returns (flow, cost).
+        """
+        pot = self._initial_potentials(s)
+        total_flow = total_cost = 0.0
+        while total_flow < max_flow - tol:
+            dist = [_INF] * self.n
+            prev = [-1] * self.n
+            dist[s] = 0.0
+            heap = [(0.0, s)]
+            while heap:
+                d, u = heapq.heappop(heap)
+                if d > dist[u]:
+                    continue
+                if u == t:
+                    break
+                for e in self.adj[u]:
+                    if self.cap[e] > tol:
+                        v = self.head[e]
+                        nd = d + self.cost[e] + pot[u] - pot[v]
+                        if nd < dist[v] - 1e-12:
+                            dist[v] = nd
+                            prev[v] = e
+                            heapq.heappush(heap, (nd, v))
+            if dist[t] == _INF:
+                break
+            # early exit: unsettled nodes move by dist[t], keeping reduced costs >= 0
+            for v in range(self.n):
+                pot[v] += min(dist[v], dist[t])
+            path_cost = pot[t] - pot[s]
+            if path_cost >= -tol:
+                break
+            push, v = max_flow - total_flow, t
+            while v != s:
+                e = prev[v]
+                push = min(push, self.cap[e])
+                v = self.head[e ^ 1]
+            v = t
+            while v != s:
+                e = prev[v]
+                self.cap[e] -= push
+                self.cap[e ^ 1] += push
+                if e in self.ladders:
+                    self._advance_ladder(e, tol)
+                v = self.head[e ^ 1]
+            total_flow += push
+            total_cost += push * path_cost
+        return total_flow, total_cost
+
+def _tree_fill(margin, cap, country_idx, country_totals, month_supply, total_supply):
+    "Exact greedy for the single-terminal, no-storage (tree) network."
+    n_m, n_b = margin.shape
+    x = np.zeros((n_m, n_b))
+    month_left = np.array(month_supply, dtype=float)
+    country_left = np.array(country_totals, dtype=float)
+    horizon_left = float(total_supply)
+
+    live = (cap > 0) & (margin > 0)
+    mi, bi = np.nonzero(live)
+    order = np.argsort(-margin[mi, bi], kind="stable")
+    for i, j in zip(mi[order].tolist(), bi[order].tolist()):
+        if horizon_left <= 0:
+            break
+        c = country_idx[j]
+        take = min(cap[i, j], country_left[i, c], month_left[i], horizon_left)
+        if take <= 0:
+            continue
+        x[i, j] = take
+        country_left[i, c] -= take
+        month_left[i] -= take
+        horizon_left -= take
+    return x, np.zeros(max(n_m - 1, 0)), float(np.sum(margin[live] * x[live]))
+
+def _ssp_fill(margin, cap, country_idx, country_totals, month_supply, total_supply,
+              terminal_supply, terminal_cost, storage_cost):
+    n_m, n_b = margin.shape
+    n_t = terminal_supply.shape[0]
+    # Below a month node everything is laminar (one arc into each country,
+    # one into sales), so that subtree's value is concave in its inflow:
+    # the tree fill with unlimited horizon lists its steps in margin order.
+    # Each month becomes one ladder, and SSP runs on T + M + 2 nodes.
+    steps, _, _ = _tree_fill(margin, cap, country_idx, country_totals, month_supply, _INF)
+
+    # node ids: source, sink, terminals, months
+    src, snk = 0, 1
+    term = 2 + np.arange(n_t)
+    month = 2 + n_t + np.arange(n_m)
+    net = FlowNetwork(2 + n_t + n_m)
+    for t in range(n_t):
+        net.add_arc(src, int(term[t]), float(terminal_supply[t].sum()))
+        for m in range(n_m):
+            if terminal_supply[t, m] > 0:
+                net.add_arc(int(term[t]), int(month[m]), float(terminal_supply[t, m]), float(terminal_cost[t]))
+    storage_arcs = []
+    if storage_cost is not None:
+        for m in range(n_m - 1):
+            storage_arcs.append(net.add_arc(int(month[m]), int(month[m + 1]), _INF, float(storage_cost)))
+    ladders = []
+    for m in range(n_m):
+        members = np.nonzero(steps[m] > 0)[0]
+        if members.size:
+            members = members[np.argsort(-margin[m, members], kind="stable")]
+            ladders.append((m, members, net.add_ladder(int(month[m]), snk, steps[m, members], -margin[m, members])))
+
+    _, flow_cost = net.min_cost_flow(src, snk, max_flow=float(total_supply))
+    x = np.zeros((n_m, n_b))
+    for m, members, e in ladders:
+        x[m, members] = net.ladder_flows(e)
+    return x, np.array([net.flow(e) for e in storage_arcs]), -flow_cost
+
+@trace.traced("network.allocate")
+def allocate_network(price, cost, cap, pd_, country_idx, country_totals, month_supply,
+                     total_supply=None, terminal_supply=None, terminal_cost=None,
+                     storage_cost=None, risk_adjusted: bool = False) -> dict:
+    """
+    Joint allocation over months x buyers with shared supply.
+
+    price, cost, cap : (M, B) arrays (NaN price = no bid)
+    pd_              : (B,) or (M, B) probability of default
+    country_idx      : (B,) integer country code per buyer
+    country_totals   : (M, C) Buyer Total per month/country
+                       (the limit `validate_caps_against_country_totals` enforces)
+    month_supply     : scalar or (M,) monthly sell position
+    total_supply     : optional horizon supply shared across months
+    terminal_supply  : optional (T, M) supply by terminal and month, with
+    terminal_cost    : (T,) $/MMBtu added for that terminal
+    storage_cost     : optional $/MMBtu/month to carry unsold supply forward
+    risk_adjusted    : rank on margin * (1 - PD) instead of raw margin
+
+    Only profitable arcs carry flow (unlike `greedy_allocate`, which also fills
+    negative-margin buyers). Returns the same shape as `greedy_allocate`
+    (allocation, leftover, margin, columns) plus country_flow (M, C),
+    storage (M-1,), objective (ranked margin less terminal and storage costs)
+    and method ("tree" or "ssp").
+    """
+    price = np.asarray(price, dtype=float)
+    cost = np.asarray(cost, dtype=float)
+    cap = np.where(np.isnan(price), 0.0, np.asarray(cap, dtype=float))
+    n_m, n_b = price.shape
+    pd_ = np.broadcast_to(np.asarray(pd_, dtype=float), (n_m, n_b))
+    country_idx = np.asarray(country_idx, dtype=int)
+    country_totals = np.asarray(country_totals, dtype=float)
+    month_supply = np.broadcast_to(np.asarray(month_supply, dtype=float), (n_m,))
+    margin = price - cost
+    rank_margin = np.nan_to_num(margin * (1 - pd_) if risk_adjusted else margin, nan=-np.inf)
+    total = float(month_supply.sum()) if total_supply is None else float(total_supply)
+
+    if terminal_supply is None and storage_cost is None:
+        method = "tree"
+        x, storage, objective = _tree_fill(rank_margin, cap, country_idx, country_totals, month_supply, total)
+        arrivals = month_supply
+    else:
+        method = "ssp"
+        if terminal_supply is None:
+            terminal_supply = month_supply[None, :]
+        terminal_supply = np.asarray(terminal_supply, dtype=float)
+        terminal_cost = np.zeros(terminal_supply.shape[0]) if terminal_cost is None else np.asarray(terminal_cost, float)
+        x, storage, objective = _ssp_fill(rank_margin, cap, country_idx, country_totals, month_supply, total,
+                               terminal_supply, terminal_cost, storage_cost)
+        arrivals = terminal_supply.sum(axis=0)
+
+    carried_in = np.concatenate([[0.0], storage])
+    carried_out = np.concatenate([storage, [0.0]])
+    leftover = np.maximum(arrivals + carried_in - carried_out - x.sum(axis=1), 0.0)
+    n_c = country_totals.shape[1]
+    country_flow = np.zeros((n_m, n_c))
+    np.add.at(country_flow, (slice(None), country_idx), x)
+
+    month_idx, buyer_idx = np.nonzero(x > 0)
+    order = np.lexsort((-margin[month_idx, buyer_idx], month_idx))
+    month_idx, buyer_idx = month_idx[order], buyer_idx[order]
+    volume = x[month_idx, buyer_idx]
+    row_margin = margin[month_idx, buyer_idx]
+    row_pd = pd_[month_idx, buyer_idx]
+    profit = row_margin * volume
+    return {
+        "allocation": x,
+        "leftover": leftover,
+        "margin": margin,
+        "country_flow": country_flow,
+        "storage": storage,
+        "objective": objective,
+        "method": method,
+        "columns": {
+            "month_idx": month_idx,
+            "buyer_idx": buyer_idx,
+            "volume": volume,
+            "price": price[month_idx, buyer_idx],
+            "final_cost": cost[month_idx, buyer_idx],
+            "margin": row_margin,
+            "profit": profit,
+            "pd": row_pd,
+            "adjusted_profit": profit * (1 - row_pd),
+        },
+    }
+
+def network_profit_table(buyers, months: list, final_costs: dict, buyer_caps_by_month: dict | None,
+                         buyer_total_by_mc: dict, monthly_supply_mmbtu, **kwargs) -> dict:
+    """
+    `greedy_profit_table` counterpart that also enforces country Buyer Totals.
+
+    buyer_total_by_mc: {month: {country: MMBtu}}; kwargs go to `allocate_network`.
+    Returns {"table", "leftover", "caps_drawn", "result"}.
+    """
+    from .allocation import buyer_arrays, profit_table
+
+    countries = list(dict.fromkeys(c for m in months for c in buyer_total_by_mc.get(m, {})))
+    country_pos = {c: k for k, c in enumerate(countries)}
+    arr = buyer_arrays(buyers, months, final_costs, buyer_caps_by_month)
+    price, cost, cap, pd_, names = arr["price"], arr["cost"], arr["cap"], arr["pd"], arr["names"]
+    country_idx = np.array([country_pos.get(c, -1) for c in arr["country"]], dtype=int)
+    if (country_idx < 0).any():
+        missing = sorted({c for c, k in zip(arr["country"], country_idx) if k < 0})
+        raise KeyError(f"no Buyer Total for countries {missing}")
+    totals = np.array([[buyer_total_by_mc.get(m, {}).get(c, 0.0) for c in countries] for m in months], dtype=float)
+
+    res = allocate_network(price, cost, cap, pd_, country_idx, totals, monthly_supply_mmbtu, **kwargs)
+    cols = res["columns"]
+    caps_drawn = {m: {} for m in months}
+    for i, j, take in zip(cols["month_idx"], cols["buyer_idx"], cols["volume"]):
+        caps_drawn[months[i]][names[j]] = cap[i, j] - take
+    return {
+        "table": profit_table(res, months, buyers),
+        "leftover": {m: float(left) for m, left in zip(months, res["leftover"])},
+        "caps_drawn": caps_drawn,
+        "result": res,
+    }
@@ -1,29 +1,356 @@
 from __future__ import annotations
+import time
+
+import numpy as np
 import pulp
 import pandas as pd
+from models import SHIPMENT_VOLUME
+from . import trace
+from .sensitivity import fill_sensitivity, filled_before
+
+def _has_closed_form(profit: np.ndarray, capacity: np.ndarray, supply: float) -> bool:
+    "Sort-and-fill is exact when data are finite/non-negative and the LP is bounded."
+    if not (np.isfinite(profit).all() and np.isfinite(supply) and supply >= 0):
+        return False
+    return bool((capacity >= 0).all() and not np.isnan(capacity).any())
+
+def sort_and_fill(profit: np.ndarray, capacity: np.ndarray, supply: float) -> np.ndarray:
+    """
+    Exact solution of max profit.x s.t. sum(x) <= supply, 0 <= x <= capacity:
+    fill destinations in descending unit profit until supply runs out,
+    skipping any destination that does not make money.
+    """
+    order = np.argsort(-profit, kind="stable")
+    cap = np.where(profit[order] > 0, capacity[order], 0.0)
+    x = np.empty_like(cap)
+    x[order] = np.clip(supply - filled_before(cap), 0.0, cap)
+    return x
+
+def sort_and_fill_batch(profit, capacity, supply) -> np.ndarray:
+    """
+    `sort_and_fill` for many independent problems at once: destinations on
+    the last axis, any leading axes (e.g. paths x months). `capacity` and
+    `supply` broadcast against profit and profit.shape[:-1] respectively.
+    """
+    profit = np.asarray(profit, dtype=float)
+    capacity = np.broadcast_to(np.asarray(capacity, dtype=float), profit.shape)
+    supply = np.asarray(supply, dtype=float)[..., None]
+    order = np.argsort(-profit, axis=-1, kind="stable")
+    sorted_profit = np.take_along_axis(profit, order, axis=-1)
+    cap = np.where(sorted_profit > 0, np.take_along_axis(capacity, order, axis=-1), 0.0)
+    x = np.empty_like(cap)
+    np.put_along_axis(x, order, np.clip(supply - filled_before(cap), 0.0, cap), axis=-1)
+    return x
+
+class AllocationModel:
+    """
+    Allocation LP built once from a unit table and re-solved in place.
+
+    Scenarios only move prices (-> objective coefficients) and capacities
+    (-> Cap_ right-hand sides), so sweeps update those and call `solve()`
+    instead of rebuilding the PuLP problem. Re-solves without extra
+    constraints go through `sort_and_fill`; otherwise the cached LP is
+    updated and handed to CBC with a warm start from the previous solution.
+    """
+
+    def __init__(self, unit_table: pd.DataFrame, total_supply_units: float, extra_constraints=None):
+        self.codes = unit_table["code"].tolist()
+        self.base_profit = unit_table["unit_profit"].to_numpy(dtype=float)
+        self.base_capacity = unit_table["monthly_capacity_cargo"].to_numpy(dtype=float)
+        self.delivered_fraction = unit_table["delivered_fraction"].to_numpy(dtype=float) \
+            if "delivered_fraction" in unit_table else np.ones(len(self.codes))
+        self.profit = self.base_profit.copy()
+        self.capacity = self.base_capacity.copy()
+        self.total_supply_units = float(total_supply_units)
+        self.extra_constraints = list(extra_constraints or [])
+        self._pos = {c: i for i, c in enumerate(self.codes)}
+        self._lp = None
+        self._x = None
+
+    def _vector(self, values, current: np.ndarray) -> np.ndarray:
+        "Accept a full array or a partial {code: value} mapping."
+        if isinstance(values, dict):
+            out = current.copy()
+            for c, v in values.items():
+                out[self._pos[c]] = float(v)
+            return out
+        out = np.asarray(values, dtype=float)
+        if out.shape != current.shape:
+            raise ValueError(f"expected {current.shape[0]} values, got {out.shape}")
+        return out.copy()
+
+    def set_unit_profits(self, unit_profit) -> None:
+        self.profit = self._vector(unit_profit, self.profit)
+
+    def set_capacities(self, capacity) -> None:
+        self.capacity = self._vector(capacity, self.capacity)
+
+    def set_supply(self, total_supply_units: float) -> None:
+        self.total_supply_units = float(total_supply_units)
+
+    def apply_scenario(self, scenario: dict) -> None:
+        """
+        Reset to the base unit table, then apply a `model.scenarios` dict.
+        A price shock moves unit profit by shock * delivered_fraction
+        (unit profit is linear in price); capacity multipliers scale caps.
+        """
+        shock = np.array([scenario.get("price_shocks", {}).get(c, 0.0) for c in self.codes], dtype=float)
+        mult = np.array([scenario.get("capacity_multipliers", {}).get(c, 1.0) for c in self.codes], dtype=float)
+        self.profit = self.base_profit + shock * self.delivered_fraction
+        self.capacity = self.base_capacity * mult
+
+    def _build_lp(self) -> None:
+        codes = self.codes
+        m = pulp.LpProblem("lng_allocation", pulp.LpMaximize)
+        x = pulp.LpVariable.dicts("alloc", codes, lowBound=0)
+
+        # Objective
+        m += pulp.lpSum([float(p)*x[c] for c, p in zip(codes, self.profit)])
 
-def optimise_allocation(unit_table: pd.DataFrame, total_supply_units: float) -> dict:
+        # Constraints
+        m += pulp.lpSum([x[c] for c in codes]) <= self.total_supply_units, "SupplyLimit"
+        for c, cap in zip(codes, self.capacity):
+            m += x[c] <= float(cap), f"Cap_{c}"
+        for add_constraint in self.extra_constraints:
+            add_constraint(m, x)
+        self._lp, self._x = m, x
+
+    def _update_lp(self) -> None:
+        m, x = self._lp, self._x
+        for c, p in zip(self.codes, self.profit):
+            m.objective[x[c]] = float(p)
+        # pulp stores `lhs <= rhs` as lhs - rhs <= 0
+        m.constraints["SupplyLimit"].constant = -self.total_supply_units
+        for c, cap in zip(self.codes, self.capacity):
+            m.constraints[f"Cap_{c}"].constant = -float(cap)
+
+    def _sensitivity(self, x: np.ndarray) -> dict:
+        "Duals and basis ranges read off a sort-and-fill solution (no re-solve)."
+        s = fill_sensitivity(self.profit[None, :], self.capacity[None, :], self.total_supply_units, x[None, :])
+        codes, lam = self.codes, float(s["supply_dual"][0])
+        # unit profit moves by delivered_fraction per $/MMBtu of price
+        entry = np.where((x <= 0) & (self.profit < lam),
+                         (np.maximum(lam, 0.0) - self.profit) / np.where(self.delivered_fraction > 0,
+                                                                         self.delivered_fraction, np.nan), 0.0)
+        k = int(s["marginal"][0])
+        return {
+            "supply_dual": lam,
+            "supply_range": tuple(s["supply_range"][0].tolist()),
+            "marginal": codes[k] if k >= 0 else None,
+            "cap_dual": dict(zip(codes, s["cap_dual"][0].tolist())),
+            "cap_range": {c: tuple(r) for c, r in zip(codes, s["cap_range"][0].tolist())},
+            "reduced_cost": dict(zip(codes, s["reduced_cost"][0].tolist())),
+            "profit_range": {c: tuple(r) for c, r in zip(codes, s["profit_range"][0].tolist())},
+            "price_to_enter": dict(zip(codes, entry.tolist())),
+        }
+
+    def _lp_sensitivity(self) -> dict:
+        "Duals and reduced costs reported by CBC; CBC does not rank, so ranges are NaN."
+        m, x, nan = self._lp, self._x, (float("nan"), float("nan"))
+        return {
+            "supply_dual": float(m.constraints["SupplyLimit"].pi or 0.0),
+            "supply_range": nan,
+            "marginal": None,
+            "cap_dual": {c: float(m.constraints[f"Cap_{c}"].pi or 0.0) for c in self.codes},
+            "cap_range": {c: nan for c in self.codes},
+            "reduced_cost": {c: float(x[c].dj or 0.0) for c in self.codes},
+            "profit_range": {c: nan for c in self.codes},
+            "price_to_enter": {c: float("nan") for c in self.codes},
+        }
+
+    def solve(self, sensitivity: bool = False) -> dict:
+        """
+        Returns {"allocation": {code: units}, "objective": float}; with
+        `sensitivity=True` also "sensitivity": supply_dual (value of one more
+        unit of supply), cap_dual and reduced_cost per code, the ranges over
+        which the basis stays optimal (supply_range, cap_range, profit_range)
+        and price_to_enter, the $/MMBtu price rise at which an unused
+        destination starts taking volume.
+        """
+        if not self.extra_constraints and _has_closed_form(self.profit, self.capacity, self.total_supply_units):
+            with trace.span("optimisation.sort_and_fill", n=len(self.codes)):
+                x = sort_and_fill(self.profit, self.capacity, self.total_supply_units)
+            out = {
+                "allocation": dict(zip(self.codes, x.tolist())),
+                "objective": float(self.profit @ x),
+            }
+            if sensitivity:
+                out["sensitivity"] = self._sensitivity(x)
+            return out
+
+        warm = self._lp is not None
+        with trace.span("optimisation.build_lp", warm=warm):
+            if warm:
+                self._update_lp()
+            else:
+                self._build_lp()
+        with trace.span("optimisation.cbc", n=len(self.codes)):
+            self._lp.solve(pulp.PULP_CBC_CMD(msg=False, warmStart=warm))
+
+        alloc = {c: float(self._x[c].value() or 0.0) for c in self.codes}
+        obj = pulp.value(self._lp.objective)
+        out = {"allocation": alloc, "objective": obj}
+        if sensitivity:
+            out["sensitivity"] = self._lp_sensitivity()
+        return out
+
+def optimise_allocation(unit_table: pd.DataFrame, total_supply_units: float,
+                        extra_constraints=None, sensitivity: bool = False) -> dict:
     """
     Linear program: maximise sum(unit_profit[d] * x[d]) subject to
     0 <= x[d] <= capacity[d] and sum_d x[d] <= total_supply_units
+
+    With only the supply row and box bounds the LP is solved in-process by
+    `sort_and_fill`. `extra_constraints` is an optional list of callables
+    `fn(model, x)` that add PuLP constraints; any present forces a CBC solve.
+    For repeated re-solves of one unit table use `AllocationModel` directly.
+    `sensitivity=True` adds duals, reduced costs and ranges (see `AllocationModel.solve`).
+    """
+    return AllocationModel(unit_table, total_supply_units, extra_constraints).solve(sensitivity)
+
+def _lot_window(up, cap, lots, cancel, busy, carry, fleet, lo: int, hi: int, relax: bool) -> tuple:
     """
-    codes = unit_table["code"].tolist()
-    profit = {row["code"]: float(row["unit_profit"]) for _, row in unit_table.iterrows()}
-    capacity = {row["code"]: float(row["monthly_capacity_cargo"]) for _, row in unit_table.iterrows()}
+    Cargo-lot problem for months [lo, hi) per MMBtu of lot (the caller
+    scales by lot volume): integer lots per (month, destination), one integer
+    lift count per month (lots are interchangeable, so which ones lift is
+    not modelled) and, with a fleet, vessel occupancy through
+    min(hi + busy - 1, T). `relax` makes every variable continuous.
+    """
+    T, D = up.shape
+    m = pulp.LpProblem("cargo_lots", pulp.LpMaximize)
+    # lots to a destination paying less than the cancellation fee are never optimal
+    n = {(t, d): pulp.LpVariable(f"lots_{t}_{d}", 0, int(cap[t, d]), "Continuous" if relax else "Integer")
+         for t in range(lo, hi) for d in range(D) if cap[t, d] >= 1 and up[t, d] > -cancel[t]}
+    by_month = {t: [] for t in range(lo, hi)}
+    for (t, d), v in n.items():
+        by_month[t].append((v, d))
+
+    objective = [(v, float(up[t, d])) for (t, d), v in n.items()]
+    constant = 0.0
+    for t in range(lo, hi):
+        # no more lots can lift than the month's destinations (or vessels) take; the rest are cancelled
+        liftable = min(int(lots[t]), int(sum(cap[t, d] for _, d in by_month[t])))
+        if fleet is not None:
+            liftable = min(liftable, max(0, int(fleet - carry[t])))
+        constant -= float(cancel[t]) * int(lots[t])
+        lifts = [pulp.LpVariable(f"lift_{t}", 0, liftable, "Continuous" if relax else "Integer")] if liftable else []
+        objective += [(y, float(cancel[t])) for y in lifts]
+        m += (pulp.LpAffineExpression([(v, 1.0) for v, _ in by_month[t]] + [(y, -1.0) for y in lifts]) == 0,
+              f"Lift_{t}")
+    m += pulp.LpAffineExpression(objective, constant)
+
+    if fleet is not None:
+        at_sea = {t: [] for t in range(lo, min(hi + int(busy.max()) - 1, T))}
+        for (s, d), v in n.items():
+            for t in range(s, min(s + busy[d], T)):
+                at_sea[t].append((v, 1.0))
+        for t, terms in at_sea.items():
+            if terms:
+                m += pulp.LpAffineExpression(terms) <= fleet - carry[t], f"Fleet_{t}"
+    return m, n
+
+def _solve_window(up, cap, lots, cancel, busy, carry, fleet, lo, hi, time_limit, gap_rel, bound: bool) -> tuple:
+    """
+    (lots array for [lo, hi), window record) from the MIP. The LP relaxation
+    is solved only for the `bound` (and gap) or when CBC finds no incumbent.
+    """
+    m, n = _lot_window(up, cap, lots, cancel, busy, carry, fleet, lo, hi, relax=False)
+    t0 = time.perf_counter()
+    m.solve(pulp.PULP_CBC_CMD(msg=False, timeLimit=time_limit, gapRel=gap_rel))
+    seconds = time.perf_counter() - t0
+    x = np.zeros((hi - lo, up.shape[1]))
+    found = m.sol_status in (pulp.LpSolutionOptimal, pulp.LpSolutionIntegerFeasible)
+    relaxed = None
+    if bound or not found:
+        relaxed, _ = _lot_window(up, cap, lots, cancel, busy, carry, fleet, lo, hi, relax=True)
+        relaxed.solve(pulp.PULP_CBC_CMD(msg=False))
+    if found:
+        for (t, d), v in n.items():
+            x[t - lo, d] = round(v.value() or 0.0)
+    else:  # no incumbent in time: rounding the relaxation down keeps every <= row feasible
+        rel = {v.name: v.value() or 0.0 for v in relaxed.variables()}
+        for (t, d) in n:
+            x[t - lo, d] = np.floor(rel.get(f"lots_{t}_{d}", 0.0) + 1e-9)
+    obj = float((up[lo:hi] * x).sum() - (cancel[lo:hi] * (lots[lo:hi] - x.sum(axis=1))).sum())
+    lp = float(pulp.value(relaxed.objective) or 0.0) if bound else float("nan")
+    return x, {
+        "start": lo, "end": hi, "status": pulp.LpStatus[m.status] if found else "Rounded relaxation",
+        "objective": obj, "bound": lp, "gap": _gap(lp, obj) if bound else float("nan"), "seconds": seconds,
+    }
+
+def _gap(bound: float, objective: float) -> float:
+    return max(0.0, bound - objective) / max(abs(bound), 1e-9)
 
-    m = pulp.LpProblem("lng_allocation", pulp.LpMaximize)
-    x = pulp.LpVariable.dicts("alloc", codes, lowBound=0)
+@trace.traced("optimisation.cargo_lots")
+def optimise_cargo_lots(unit_profit, capacity, lots, cancel_cost=0.0, voyage_months=None,
+                        fleet: int | None = None, window: int = 12, overlap: int = 6,
+                        time_limit: float | None = 10.0, gap_rel: float = 1e-4,
+                        lot_volume: float = SHIPMENT_VOLUME, months=None, codes=None,
+                        bound: bool = True, window_bounds: bool = False) -> dict:
+    """
+    Whole-cargo allocation over a long horizon by rolling-horizon MIP.
 
-    # Objective
-    m += pulp.lpSum([profit[c]*x[c] for c in codes])
+    unit_profit:   (months x destinations) USD/MMBtu for a lot sent there
+    capacity:      (months x destinations) lots a destination takes per month
+    lots:          (months,) contract lots on offer per month; each one not
+                   lifted pays cancel_cost (USD/MMBtu, scalar or per month)
+    voyage_months: (destinations,) months a vessel is tied up per lot
+                   (default 1); with `fleet`, lots at sea never exceed it
 
-    # Constraints
-    m += pulp.lpSum([x[c] for c in codes]) <= float(total_supply_units), "SupplyLimit"
-    for c in codes:
-        m += x[c] <= capacity[c], f"Cap_{c}"
+    Windows of `window` months are solved by CBC (`time_limit` seconds,
+    relative gap `gap_rel`), the first `window - overlap` months are fixed
+    and the next window starts there; the last window fixes the rest. Each
+    window is reported with its status and, with `window_bounds`, its
+    LP-relaxation bound and gap (NaN otherwise). `bound=True` solves the
+    whole-horizon relaxation for an overall gap (rolling horizon is a
+    heuristic). A window where CBC finds no incumbent in time falls back to
+    its relaxation rounded down.
+
+    Returns {"lots" (months x destinations), "lifted", "cancelled"
+    (months,), "objective" (USD), "bound", "gap", "windows", "months", "codes"}.
+    """
+    up = np.asarray(unit_profit, dtype=float)
+    T, D = up.shape
+    cap = np.floor(np.broadcast_to(np.asarray(capacity, dtype=float), up.shape) + 1e-9)
+    lots = np.floor(np.broadcast_to(np.asarray(lots, dtype=float), (T,)) + 1e-9)
+    cancel = np.broadcast_to(np.asarray(cancel_cost, dtype=float), (T,))
+    busy = np.ones(D, dtype=int) if voyage_months is None else np.maximum(1, np.asarray(voyage_months, dtype=int))
+    if not 0 <= overlap < window:
+        raise ValueError("need 0 <= overlap < window")
 
-    m.solve(pulp.PULP_CBC_CMD(msg=False))
+    x = np.zeros((T, D))
+    carry = np.zeros(T + int(busy.max()))
+    windows = []
+    lo = 0
+    while lo < T:
+        hi = min(lo + window, T)
+        commit = T if hi == T else lo + window - overlap
+        with trace.span("optimisation.cargo_lots.window", start=lo, end=hi):
+            xw, rec = _solve_window(up, cap, lots, cancel, busy, carry, fleet, lo, hi, time_limit, gap_rel,
+                                    window_bounds)
+        x[lo:commit] = xw[:commit - lo]
+        for t in range(lo, commit):
+            for d in np.flatnonzero(x[t]):
+                carry[t:t + busy[d]] += x[t, d]
+        rec["committed"] = commit
+        windows.append(rec)
+        lo = commit
 
-    alloc = {c: float(x[c].value() or 0.0) for c in codes}
-    obj = pulp.value(m.objective)
-    return {"allocation": alloc, "objective": obj}
+    lifted = x.sum(axis=1)
+    objective = lot_volume * float((up * x).sum() - (cancel * (lots - lifted)).sum())
+    for rec in windows:
+        rec["objective"] *= lot_volume
+        rec["bound"] *= lot_volume
+    out = {
+        "lots": x, "lifted": lifted, "cancelled": lots - lifted, "objective": objective,
+        "bound": float("nan"), "gap": float("nan"), "windows": windows,
+        "months": list(range(T)) if months is None else list(months),
+        "codes": list(range(D)) if codes is None else list(codes),
+    }
+    if bound:
+        with trace.span("optimisation.cargo_lots.bound", months=T):
+            full, _ = _lot_window(up, cap, lots, cancel, busy, np.zeros_like(carry), fleet, 0, T, relax=True)
+            full.solve(pulp.PULP_CBC_CMD(msg=False))
+        out["bound"] = lot_volume * float(pulp.value(full.objective) or 0.0)
+        out["gap"] = _gap(out["bound"], objective)
+    return out
@@ -0,0 +1,44 @@
+"""
+Process-pool fan-out shared by the grid, Monte Carlo and Benders engines.
+
+Each engine keeps its large inputs in a module-level `_BASE` dict filled
+by an `_init_worker(*initargs)`, so jobs only carry small keys (seeds,
+slices, scenarios). `worker_pool` runs that initializer once per process
+and hands back a `map(fn, jobs)` that yields results in job order. With
+more than one worker at most `2 * workers` jobs are in flight; the next
+is submitted as the oldest is yielded, so neither the job iterator nor
+the finished results pile up ahead of the consumer.
+"""
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from typing import Callable, Iterable, Iterator
+
+def bounded_map(pool: Executor, fn: Callable, jobs: Iterable, in_flight: int) -> Iterator:
+    "`pool.map(fn, jobs)` in order, with at most `in_flight` jobs submitted ahead of the consumer."
+    jobs = iter(jobs)
+    pending = deque(pool.submit(fn, job) for job in islice(jobs, max(1, in_flight)))
+    try:
+        while pending:
+            res = pending.popleft().result()
+            for job in islice(jobs, 1):  # refill before yielding so workers stay busy
+                pending.append(pool.submit(fn, job))
+            yield res
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+@contextmanager
+def worker_pool(workers: int, initializer: Callable, initargs: tuple = ()):
+    """
+    A `map(fn, jobs)` for the duration of the block: in-process for
+    workers <= 1, else one process pool serves every call.
+    """
+    if workers <= 1:
+        initializer(*initargs)
+        yield map
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        yield lambda fn, jobs: bounded_map(pool, fn, jobs, 2 * workers)
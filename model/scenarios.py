@@ -1,4 +1,5 @@
 from __future__ import annotations
+import itertools
 
 def base_scenario():
     return {"name": "Base", "price_shocks": {}, "capacity_multipliers": {}}
@@ -16,3 +17,31 @@ SCENARIOS = {
     "Cold snap NE Asia": cold_snap_ne_asia(),
     "SLNG outage": slng_outage(),
 }
+
+def scenario_grid(price_shocks=None, capacity_multipliers=None, supply_levels=None):
+    """
+    Lazily expand a Cartesian product of scenario levels, e.g.
+    scenario_grid({"JP": [0, 3]}, {"SLNG": [1.0, 0.5]}, [15, 20]) -> 8 scenarios.
+    Each scenario has the same keys as `base_scenario()` plus "supply"
+    (None = keep the base supply). Order is deterministic: supply varies slowest,
+    then price shocks, then capacity multipliers, each in dict insertion order.
+    """
+    price_shocks = price_shocks or {}
+    capacity_multipliers = capacity_multipliers or {}
+    supply_levels = list(supply_levels) if supply_levels is not None else [None]
+
+    shock_codes = list(price_shocks)
+    cap_codes = list(capacity_multipliers)
+    for supply in supply_levels:
+        for shocks in itertools.product(*(price_shocks[c] for c in shock_codes)):
+            for mults in itertools.product(*(capacity_multipliers[c] for c in cap_codes)):
+                parts = [f"{c}{s:+g}" for c, s in zip(shock_codes, shocks) if s]
+                parts += [f"{c}x{m:g}" for c, m in zip(cap_codes, mults) if m != 1.0]
+                if supply is not None:
+                    parts.append(f"supply={supply:g}")
+                yield {
+                    "name": " ".join(parts) or "Base",
+                    "price_shocks": {c: float(s) for c, s in zip(shock_codes, shocks) if s},
+                    "capacity_multipliers": {c: float(m) for c, m in zip(cap_codes, mults) if m != 1.0},
+                    "supply": supply,
+                }
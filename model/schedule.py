@@ -0,0 +1,223 @@
+"""
+Daily SLNG send-out and berth schedule for monthly Singapore allocations.
+
+Each month's SG volume arrives as SHIPMENT_VOLUME cargoes spread evenly
+over the month. A cargo takes the first free berth slot on or after its
+target day, then regasifies first-fit into the remaining daily send-out
+capacity (slng_daily_cap x (1 - outage)) from its berthing day on.
+Remaining capacity and free berths live in segment trees (range add,
+range max/sum, first day above a threshold), so each cargo costs
+O(days_used x log days) and a year's schedule or an outage what-if is a
+few milliseconds.
+"""
+from __future__ import annotations
+import math
+
+import numpy as np
+
+from models import SHIPMENT_VOLUME
+from . import trace
+from .curves import to_dates
+
+SLNG_DAILY_CAP = 1_400_000  # MMBtu/day, the app's default slng_daily_cap
+EPS = 1e-6  # MMBtu treated as zero
+
+class SegmentTree:
+    """
+    Values over [0, n) with lazy range add; answers range sum / max and
+    the first index >= lo whose value exceeds a threshold.
+    """
+
+    __slots__ = ("n", "size", "mx", "sm", "lazy", "width")
+
+    def __init__(self, values):
+        values = [float(v) for v in values]
+        self.n = len(values)
+        size = 1
+        while size < max(self.n, 1):
+            size *= 2
+        self.size = size
+        self.mx = [-math.inf] * (2 * size)
+        self.sm = [0.0] * (2 * size)
+        self.lazy = [0.0] * (2 * size)
+        self.width = [0] * (2 * size)
+        for i, v in enumerate(values):
+            self.mx[size + i], self.sm[size + i], self.width[size + i] = v, v, 1
+        for k in range(size - 1, 0, -1):
+            self._pull(k)
+
+    def _pull(self, k: int) -> None:
+        a, b = 2 * k, 2 * k + 1
+        self.width[k] = self.width[a] + self.width[b]
+        self.mx[k] = max(self.mx[a], self.mx[b]) + self.lazy[k]
+        self.sm[k] = self.sm[a] + self.sm[b] + self.lazy[k] * self.width[k]
+
+    def add(self, lo: int, hi: int, v: float, k: int = 1, l: int = 0, r: int | None = None) -> None:
+        "Add v to every value in [lo, hi)."
+        r = self.size if r is None else r
+        if hi <= l or r <= lo:
+            return
+        if lo <= l and r <= hi:
+            self.lazy[k] += v
+            self.mx[k] += v
+            self.sm[k] += v * self.width[k]
+            return
+        mid = (l + r) // 2
+        self.add(lo, hi, v, 2 * k, l, mid)
+        self.add(lo, hi, v, 2 * k + 1, mid, r)
+        self._pull(k)
+
+    def sum(self, lo: int, hi: int, k: int = 1, l: int = 0, r: int | None = None, acc: float = 0.0) -> float:
+        "Sum over [lo, hi)."
+        r = self.size if r is None else r
+        if hi <= l or r <= lo:
+            return 0.0
+        if lo <= l and r <= hi:
+            return self.sm[k] + acc * self.width[k]
+        mid = (l + r) // 2
+        acc += self.lazy[k]
+        return self.sum(lo, hi, 2 * k, l, mid, acc) + self.sum(lo, hi, 2 * k + 1, mid, r, acc)
+
+    def max(self, lo: int, hi: int, k: int = 1, l: int = 0, r: int | None = None, acc: float = 0.0) -> float:
+        "Max over [lo, hi)."
+        r = self.size if r is None else r
+        if hi <= l or r <= lo:
+            return -math.inf
+        if lo <= l and r <= hi:
+            return self.mx[k] + acc
+        mid = (l + r) // 2
+        acc += self.lazy[k]
+        return max(self.max(lo, hi, 2 * k, l, mid, acc), self.max(lo, hi, 2 * k + 1, mid, r, acc))
+
+    def first_above(self, lo: int, threshold: float, k: int = 1, l: int = 0, r: int | None = None,
+                    acc: float = 0.0) -> int:
+        "Smallest index i >= lo with value > threshold, or -1."
+        r = self.size if r is None else r
+        if r <= lo or self.mx[k] + acc <= threshold:
+            return -1
+        if r - l == 1:
+            return l if l < self.n else -1
+        mid = (l + r) // 2
+        acc += self.lazy[k]
+        i = self.first_above(lo, threshold, 2 * k, l, mid, acc)
+        return i if i >= 0 else self.first_above(lo, threshold, 2 * k + 1, mid, r, acc)
+
+    def get(self, i: int) -> float:
+        return self.sum(i, i + 1)
+
+    def values(self) -> np.ndarray:
+        return np.array([self.get(i) for i in range(self.n)])
+
+def _days_for(months) -> tuple:
+    "(days datetime64[D], first-day offset per month, days per month) covering `months`."
+    firsts = to_dates(list(months)).astype("datetime64[M]")
+    start = firsts.min().astype("datetime64[D]")
+    days = np.arange(start, (firsts.max() + 1).astype("datetime64[D]"))
+    lo = (firsts.astype("datetime64[D]") - start).astype(int)
+    hi = ((firsts + 1).astype("datetime64[D]") - start).astype(int)
+    return days, lo, hi - lo
+
+def daily_capacity(days, daily_cap: float = SLNG_DAILY_CAP, outage_pct: float = 0.0, outages=()) -> np.ndarray:
+    """
+    Send-out capacity per day: daily_cap x (1 - outage_pct), further cut by
+    `outages` [(start, end, pct)] (dates inclusive, pct of daily_cap, summed and capped at 100%).
+    """
+    days = to_dates(days)
+    cut = np.full(len(days), float(outage_pct))
+    for start, end, pct in outages:
+        s, e = to_dates([start, end])
+        cut[(days >= s) & (days <= e)] += float(pct)
+    return float(daily_cap) * (1.0 - np.clip(cut, 0.0, 1.0))
+
+@trace.traced("schedule.slng")
+def schedule_sendout(monthly_volume: dict, daily_cap: float = SLNG_DAILY_CAP, outage_pct: float = 0.0,
+                     outages=(), cargo_size: float = SHIPMENT_VOLUME, berths: int = 1,
+                     berth_days: int = 1, capacity=None) -> dict:
+    """
+    monthly_volume: {month label: MMBtu} sent out at SLNG (e.g. SG allocations)
+    capacity:       optional per-day send-out capacity overriding daily_cap / outages
+
+    Returns {"days", "capacity", "sendout" (MMBtu per day), "berths_used",
+    "cargoes" [{month, cargo, volume, target, berth, first_day, last_day,
+    late, unserved}], "unserved" {month: MMBtu}, "feasible"}. A cargo is
+    late when its send-out runs past its month; volume that cannot be sent
+    out before the horizon ends is unserved.
+    """
+    months = list(monthly_volume)
+    days, lo, n_days = _days_for(months)
+    n = len(days)
+    cap = daily_capacity(days, daily_cap, outage_pct, outages) if capacity is None else np.asarray(capacity, float)
+    remaining = SegmentTree(cap)
+    free_berths = SegmentTree(np.full(n, float(berths)))
+    cargoes, unserved = [], dict.fromkeys(months, 0.0)
+
+    for j, m in enumerate(months):
+        volume = float(monthly_volume[m])
+        count = math.ceil(volume / cargo_size - EPS) if volume > EPS else 0
+        for c in range(count):
+            size = min(cargo_size, volume - c * cargo_size)
+            target = int(lo[j] + (c * n_days[j]) // count)
+            slot = free_berths.first_above(target, 0.5)
+            rec = {"month": m, "cargo": c + 1, "volume": size, "target": days[target], "berth": None,
+                   "first_day": None, "last_day": None, "late": False, "unserved": 0.0}
+            cargoes.append(rec)
+            if slot < 0:
+                rec["unserved"] = size
+                unserved[m] += size
+                continue
+            free_berths.add(slot, min(slot + berth_days, n), -1.0)
+            rec["berth"] = days[slot]
+            left, day = size, slot
+            while left > EPS:
+                day = remaining.first_above(day, EPS)
+                if day < 0:
+                    break
+                take = min(left, remaining.get(day))
+                remaining.add(day, day + 1, -take)
+                left -= take
+                if rec["first_day"] is None:
+                    rec["first_day"] = days[day]
+                rec["last_day"] = days[day]
+            if left > EPS:
+                rec["unserved"] = left
+                unserved[m] += left
+            rec["late"] = rec["last_day"] is not None and rec["last_day"] >= days[lo[j] + n_days[j] - 1] + 1
+
+    left_cap = remaining.values()
+    return {
+        "days": days, "capacity": cap, "sendout": cap - left_cap,
+        "berths_used": berths - free_berths.values(),
+        "cargoes": cargoes, "unserved": unserved,
+        "feasible": not any(v > EPS for v in unserved.values()) and not any(c["late"] for c in cargoes),
+    }
+
+def monthly_headroom(monthly_volume: dict, capacity) -> dict:
+    "{month: send-out capacity in the month - volume}; negative means the month cannot clear on its own."
+    months = list(monthly_volume)
+    days, lo, n_days = _days_for(months)
+    tree = SegmentTree(capacity)
+    return {m: tree.sum(int(lo[j]), int(lo[j] + n_days[j])) - float(monthly_volume[m]) for j, m in enumerate(months)}
+
+def sendout_schedule_tables(table, country: str = "SG", volume_col: str = "Allocated Volume (MMBtu)",
+                            months=None, **kwargs) -> dict:
+    """
+    Run `schedule_sendout` on an app profit table's `country` volumes per
+    Month (`months` fixes the order and keeps empty months) and return
+    {"days": Date / Capacity / Send-out / Berths Used DataFrame, "cargoes":
+    one row per cargo, "unserved": {month: MMBtu}, "feasible": bool}.
+    """
+    import pandas as pd
+
+    sg = table[table["Country"] == country].groupby("Month", observed=True)[volume_col].sum()
+    months = list(dict.fromkeys(table["Month"])) if months is None else list(months)
+    res = schedule_sendout({m: float(sg.get(m, 0.0)) for m in months}, **kwargs)
+    days = pd.DataFrame({
+        "Date": res["days"], "Capacity (MMBtu)": res["capacity"], "Send-out (MMBtu)": res["sendout"],
+        "Berths Used": res["berths_used"],
+    })
+    cargoes = pd.DataFrame([{
+        "Month": c["month"], "Cargo": c["cargo"], "Volume (MMBtu)": c["volume"], "Target Day": c["target"],
+        "Berth Day": c["berth"], "Send-out Start": c["first_day"], "Send-out End": c["last_day"],
+        "Late": c["late"], "Unserved (MMBtu)": c["unserved"],
+    } for c in res["cargoes"]])
+    return {"days": days, "cargoes": cargoes, "unserved": res["unserved"], "feasible": res["feasible"]}
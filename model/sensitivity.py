@@ -0,0 +1,115 @@
+"""
+Duals and ranging for sort-and-fill allocations, read off the solution.
+
+Each row is the LP  max p.x  s.t.  sum(x) <= S,  0 <= x <= u.
+Fill is in descending p, so the dual picture follows from the first
+eligible column with room left (the "marginal" column k):
+
+  supply dual   lam   = p[k] if supply binds and k exists, else 0
+  cap dual      mu[d] = p[d] - lam  for columns at cap with p[d] >= lam
+  reduced cost  r[d]  = p[d] - lam - mu[d]   (<= 0 for columns left at zero)
+
+Ranges are those over which the basis (which columns are full, which one
+is marginal) is unchanged, so lam and mu stay valid inside them:
+
+  supply   [filled before k, filled before k + u[k]]
+  cap[d]   [u[d] - room[k], u[d] + x[k]]       (at-cap columns)
+  p[d]     at cap: [lam, inf)   marginal: [next p with room, lowest p at cap]
+           at zero: (-inf, lam]  -> lam is the profit at which d enters
+
+`positive_only=True` is the LP (columns with p <= 0 are never filled);
+`False` is the app's greedy rule, which fills any priced buyer with cap.
+"""
+from __future__ import annotations
+import numpy as np
+
+def filled_before(cap, axis: int = -1) -> np.ndarray:
+    "Exclusive cumulative sum along `axis` (cap filled ahead of each column); stays finite next to an inf cap."
+    cap = np.asarray(cap, dtype=float)
+    total = np.cumsum(cap, axis=axis)
+    zero = np.zeros_like(np.take(cap, [0], axis=axis))
+    return np.concatenate([zero, np.delete(total, -1, axis=axis)], axis=axis)
+
+def fill_sensitivity(profit, capacity, supply, allocation, positive_only: bool = True,
+                     tol: float = 1e-9) -> dict:
+    """
+    Batched over rows. profit, capacity, allocation: (R, N); supply: scalar or (R,).
+    NaN profit marks a column that cannot be filled (no price).
+
+    Returns arrays: supply_dual (R,), supply_range (R, 2), marginal (R,)
+    column index or -1, cap_dual (R, N), cap_range (R, N, 2),
+    reduced_cost (R, N), profit_range (R, N, 2).
+    """
+    p = np.atleast_2d(np.asarray(profit, dtype=float))
+    u = np.atleast_2d(np.asarray(capacity, dtype=float))
+    x = np.atleast_2d(np.asarray(allocation, dtype=float))
+    n_r, n = p.shape
+    S = np.broadcast_to(np.asarray(supply, dtype=float), (n_r,))
+    rows = np.arange(n_r)
+
+    finite = np.isfinite(p)
+    eligible = finite & (u > 0)
+    if positive_only:
+        eligible &= p > 0
+    order = np.argsort(-np.where(eligible, p, -np.inf), axis=1, kind="stable")
+    p_s = np.take_along_axis(p, order, axis=1)
+    cap_s = np.take_along_axis(np.where(eligible, u, 0.0), order, axis=1)
+    x_s = np.take_along_axis(x, order, axis=1)
+    room_s = np.take_along_axis(eligible, order, axis=1) & (cap_s - x_s > tol)
+
+    used = x.sum(axis=1)
+    binding = used >= S - tol
+    has_k = room_s.any(axis=1)
+    marginal_row = binding & has_k
+    k_s = np.argmax(room_s, axis=1)
+    k = np.where(marginal_row, order[rows, k_s], -1)
+    lam = np.where(marginal_row, p_s[rows, k_s], 0.0)
+
+    filled_before_k = filled_before(cap_s, axis=1)[rows, k_s]
+    cap_k = cap_s[rows, k_s]
+    x_k = x_s[rows, k_s]
+    supply_range = np.where(marginal_row[:, None],
+                            np.stack([filled_before_k, filled_before_k + cap_k], axis=1),
+                            np.stack([used, np.full(n_r, np.inf)], axis=1))
+
+    # full columns (ties with lam included, their dual is just 0); with supply
+    # to spare every filled column is full and mu is its own profit
+    at_cap = finite & (x >= u - tol) & ((p >= lam[:, None]) | ~marginal_row[:, None])
+    if positive_only:
+        at_cap &= p > 0
+    cap_dual = np.where(at_cap, p - lam[:, None], 0.0)
+    reduced_cost = np.where(finite, p - lam[:, None] - cap_dual, np.nan)
+
+    # an inf cap is never at cap (its lower bound is unused); keep inf - inf out of it
+    lo_cap = np.where(marginal_row[:, None],
+                      np.maximum(np.where(np.isfinite(u), u, 0.0) - (cap_k - x_k)[:, None], 0.0), 0.0)
+    hi_cap = np.where(marginal_row[:, None], u + x_k[:, None], u + np.maximum(S - used, 0.0)[:, None])
+    cap_range = np.where(at_cap[..., None], np.stack([lo_cap, hi_cap], axis=-1),
+                         np.stack([x, np.full_like(x, np.inf)], axis=-1))
+
+    # next column with room after k bounds the marginal column's profit from below
+    room_after = room_s.copy()
+    room_after[rows, k_s] = False
+    has_next = room_after.any(axis=1)
+    p_next = np.where(has_next, p_s[rows, np.argmax(room_after, axis=1)], -np.inf)
+    if positive_only:
+        p_next = np.maximum(p_next, 0.0)
+    p_low_cap = np.where(at_cap & eligible, p, np.inf).min(axis=1)
+
+    profit_range = np.stack([np.full_like(p, -np.inf), np.broadcast_to(lam[:, None], p.shape)], axis=-1)
+    profit_range = np.where(at_cap[..., None],
+                            np.stack([np.broadcast_to(lam[:, None], p.shape), np.full_like(p, np.inf)], axis=-1),
+                            profit_range)
+    mr = np.nonzero(marginal_row)[0]
+    profit_range[mr, k[mr]] = np.stack([p_next[mr], p_low_cap[mr]], axis=1)
+    profit_range[~finite] = np.nan
+
+    return {
+        "supply_dual": lam,
+        "supply_range": supply_range,
+        "marginal": k,
+        "cap_dual": cap_dual,
+        "cap_range": cap_range,
+        "reduced_cost": reduced_cost,
+        "profit_range": profit_range,
+    }
@@ -0,0 +1,156 @@
+"""
+Seeded price-path simulation -> distribution of optimal P&L.
+
+Destination prices per month are drawn around a seasonal forward
+(base price x seasonal factor from base_inputs.json) with the
+`market_volatility` of each destination, correlated across destinations:
+
+    gbm:  log-price random walk, sigma * sqrt(dt) per month
+    ou:   mean-reverting log deviation (rate `mean_reversion` per year)
+
+Both are martingale-corrected so E[price] is the seasonal forward. Each
+path is priced through `unit_profit_arrays` and every (path, month) is
+solved with the batched sort-and-fill, giving an optimal P&L per path.
+With `elastic_capacity`, a destination's monthly capacity scales with
+(price / forward) ** demand_elasticity.
+
+Paths run in fixed-size chunks, each from its own SeedSequence child, so
+results depend on (seed, paths, chunk_paths) and not on the number of
+workers. Only the per-path P&L (8 bytes per path) is kept besides running
+sums.
+"""
+from __future__ import annotations
+import os
+
+import numpy as np
+import pandas as pd
+
+from . import trace
+from .curves import parse_month
+from .financials import unit_profit_arrays
+from .optimisation import sort_and_fill_batch
+from .pool import worker_pool
+
+KINDS = ("gbm", "ou")
+CHUNK_ELEMENTS = 1_000_000  # path x month x destination prices per chunk
+# calendar months each seasonal_factors key applies to; other months use 1.0
+SEASON_MONTHS = {"winter": (12, 1, 2), "summer": (6, 7, 8)}
+DEFAULT_QUANTILES = (0.01, 0.05, 0.5, 0.95, 0.99)
+
+def price_model(ports_df: pd.DataFrame, inputs: dict, months, kind: str = "gbm", corr=0.6,
+                mean_reversion: float = 2.0, price_map: dict | None = None) -> dict:
+    """
+    Simulation inputs from base_inputs.json-shaped `inputs` for the ports
+    in `ports_df` (codes) and `months` (labels with a calendar month).
+    `corr` is one cross-destination correlation or a (ports x ports) matrix.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {KINDS}")
+    codes = ports_df["code"].tolist()
+    price_map = inputs["prices_usd_per_unit"] if price_map is None else price_map
+    base = np.array([price_map.get(c, np.nan) for c in codes], dtype=float)
+    vol = np.array([inputs.get("market_volatility", {}).get(c, 0.0) for c in codes], dtype=float)
+    elasticity = np.array([inputs.get("demand_elasticity", {}).get(c, 0.0) for c in codes], dtype=float)
+    cal = [int(str(parse_month(m).astype("datetime64[M]"))[5:7]) for m in months]
+    seasonal = np.ones((len(months), len(codes)))
+    for season, factors in inputs.get("seasonal_factors", {}).items():
+        rows = [i for i, mo in enumerate(cal) if mo in SEASON_MONTHS.get(season, ())]
+        seasonal[rows] = [factors.get(c, 1.0) for c in codes]
+    c = np.full((len(codes), len(codes)), float(corr)) if np.ndim(corr) == 0 else np.asarray(corr, dtype=float)
+    np.fill_diagonal(c, 1.0)
+    return {
+        "codes": codes, "months": list(months), "kind": kind, "mean_reversion": float(mean_reversion),
+        "forward": base * seasonal, "vol": vol, "elasticity": elasticity,
+        "chol": np.linalg.cholesky(c), "dt": 1.0 / 12.0,
+    }
+
+def simulate_prices(model: dict, n: int, seed=None) -> np.ndarray:
+    "(n x months x destinations) price tensor for one block of paths."
+    rng = np.random.default_rng(seed)
+    n_m, n_p = model["forward"].shape
+    eps = rng.standard_normal((n, n_m, n_p)) @ model["chol"].T
+    dt, vol = model["dt"], model["vol"]
+    if model["kind"] == "gbm":
+        x = np.cumsum(eps * (vol * np.sqrt(dt)), axis=1)
+        var = vol ** 2 * dt * np.arange(1, n_m + 1)[:, None]
+    else:
+        k = model["mean_reversion"]
+        phi = np.exp(-k * dt)
+        step = vol * np.sqrt((1 - phi ** 2) / (2 * k)) if k > 0 else vol * np.sqrt(dt)
+        x = np.empty_like(eps)
+        x[:, 0] = step * eps[:, 0]
+        for m in range(1, n_m):
+            x[:, m] = phi * x[:, m - 1] + step * eps[:, m]
+        powers = phi ** (2 * np.arange(1, n_m + 1))[:, None]
+        var = step ** 2 * ((1 - powers) / (1 - phi ** 2) if k > 0 else np.arange(1, n_m + 1)[:, None])
+    x -= 0.5 * var
+    return model["forward"] * np.exp(x)
+
+# Per-process inputs, set once by `_init_worker` so jobs only carry (seed, paths).
+_BASE: dict = {}
+
+def _init_worker(ports_df: pd.DataFrame, assumptions: dict, model: dict, supply: float,
+                 elastic_capacity: bool) -> None:
+    _BASE.update(ports_df=ports_df, assumptions=assumptions, model=model, supply=supply,
+                 capacity=ports_df["monthly_capacity_cargo"].to_numpy(dtype=float),
+                 elastic_capacity=elastic_capacity)
+
+def _pnl_job(job):
+    "One chunk: per-path P&L plus sums for the mean allocation / price / P&L per month."
+    seed, n = job
+    model = _BASE["model"]
+    prices = simulate_prices(model, n, seed)
+    profit = unit_profit_arrays(_BASE["ports_df"], prices, _BASE["assumptions"])["unit_profit"]
+    cap = _BASE["capacity"]
+    if _BASE["elastic_capacity"]:
+        cap = cap * (prices / model["forward"]) ** model["elasticity"]
+    x = sort_and_fill_batch(profit, cap, _BASE["supply"])
+    month_pnl = (x * profit).sum(axis=-1)
+    return month_pnl.sum(axis=1), month_pnl.sum(axis=0), x.sum(axis=0), prices.sum(axis=0)
+
+@trace.traced("simulation.pnl")
+def simulate_pnl(ports_df: pd.DataFrame, inputs: dict, months, paths: int = 100_000, seed: int = 0,
+                 kind: str = "gbm", corr=0.6, mean_reversion: float = 2.0, supply: float | None = None,
+                 elastic_capacity: bool = False, quantiles=DEFAULT_QUANTILES, workers: int | None = 1,
+                 chunk_paths: int | None = None, price_map: dict | None = None) -> dict:
+    """
+    Optimal P&L distribution over simulated price paths. Each month is an
+    independent allocation of `supply` cargo units (default:
+    assumptions["supply_cargo_units"]) over the ports' monthly capacities.
+
+    Returns {"pnl": (paths,) total P&L per path, "mean", "std",
+    "quantiles" {q: value}, "month_pnl_mean" (months,),
+    "allocation_mean" and "price_mean" (months x destinations), "codes",
+    "months", "paths"}.
+    """
+    assumptions = inputs["assumptions"]
+    model = price_model(ports_df, inputs, months, kind, corr, mean_reversion, price_map)
+    supply = float(assumptions["supply_cargo_units"] if supply is None else supply)
+    workers = (os.cpu_count() or 1) if workers is None else int(workers)
+    n_m, n_p = model["forward"].shape
+
+    paths = int(paths)
+    chunk = int(chunk_paths or max(1, CHUNK_ELEMENTS // max(n_m * n_p, 1)))
+    sizes = [min(chunk, paths - s) for s in range(0, paths, chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    pnl = np.empty(paths)
+    month_sum, alloc_sum, price_sum = np.zeros(n_m), np.zeros((n_m, n_p)), np.zeros((n_m, n_p))
+    start = 0
+    initargs = (ports_df, assumptions, model, supply, elastic_capacity)
+    with trace.span("simulation.paths", paths=paths, chunks=len(sizes), kind=kind), \
+            worker_pool(workers, _init_worker, initargs) as run:
+        for n, (total, m_sum, a_sum, p_sum) in zip(sizes, run(_pnl_job, zip(seeds, sizes))):
+            pnl[start:start + n] = total
+            month_sum += m_sum
+            alloc_sum += a_sum
+            price_sum += p_sum
+            start += n
+    return {
+        "paths": paths, "codes": model["codes"], "months": model["months"],
+        "pnl": pnl, "mean": float(pnl.mean()), "std": float(pnl.std()),
+        "quantiles": dict(zip(quantiles, np.quantile(pnl, quantiles).tolist())),
+        "month_pnl_mean": month_sum / paths,
+        "allocation_mean": alloc_sum / paths,
+        "price_mean": price_sum / paths,
+    }
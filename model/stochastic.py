@@ -0,0 +1,159 @@
+"""
+Two-stage stochastic lifting plan, solved by Benders decomposition.
+
+First stage: lots lifted per month L_t (integer, 0..lots_t). Each lot not
+lifted pays `cancel_cost`, and at most `max_cancel` lots may be cancelled
+over the horizon (the contract's downward flexibility), which couples the
+months. Second stage, per scenario s and month t: place the L_t lifted
+lots over destinations at that scenario's unit profits and capacities;
+lots no destination takes are sold distressed at -`distress_cost` each.
+
+The recourse Q_st(L) is sort-and-fill on (profit + distress_cost) minus
+distress_cost * L: concave and piecewise linear in L, with the fill's
+supply dual as a supergradient. Each iteration evaluates every scenario
+at the master's plan and adds one expected-value cut per month,
+
+    theta_t <= E[Q_t(L^)] + E[g_t] * (L_t - L^_t),
+
+then re-solves the master (a small CBC MIP over L and theta). The master
+value bounds the optimum from above, the best evaluated plan from below.
+Scenarios are evaluated in fixed-size chunks on a process pool that lives
+for the whole solve, so the scenario arrays are shipped to each worker
+once and results do not depend on the number of workers.
+"""
+from __future__ import annotations
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pulp
+
+from . import trace
+from .financials import unit_profit_arrays
+from .optimisation import sort_and_fill_batch
+from .pool import worker_pool
+from .scenarios import SCENARIOS
+from .sensitivity import fill_sensitivity
+from .simulation import price_model, simulate_prices
+
+CHUNK_ELEMENTS = 1_000_000  # scenario x month x destination values per job
+
+def scenario_arrays(ports_df: pd.DataFrame, inputs: dict, months, scenarios=None, paths: int = 0,
+                    seed: int = 0, probabilities=None, **sim) -> dict:
+    """
+    Second-stage data for every (scenario, price path) pair: the seasonal
+    forward (or `paths` simulated price paths, `sim` passed to
+    `model.simulation.price_model`) with each `model.scenarios` dict's price
+    shocks and capacity multipliers applied. Equal weights unless
+    `probabilities` (one per scenario) is given.
+
+    Returns {"names", "profit" and "capacity" (scenarios x months x destinations),
+    "prob" (scenarios,), "codes", "months"}.
+    """
+    scenarios = list(SCENARIOS.values() if scenarios is None else scenarios)
+    model = price_model(ports_df, inputs, months, **sim)
+    codes = model["codes"]
+    prices = model["forward"][None] if not paths else simulate_prices(model, int(paths), seed)
+    shock = np.array([[sc.get("price_shocks", {}).get(c, 0.0) for c in codes] for sc in scenarios], dtype=float)
+    mult = np.array([[sc.get("capacity_multipliers", {}).get(c, 1.0) for c in codes] for sc in scenarios],
+                    dtype=float)
+    n_sc, n_p = len(scenarios), len(prices)
+    shocked = (prices[None] + shock[:, None, None, :]).reshape(n_sc * n_p, *prices.shape[1:])
+    profit = unit_profit_arrays(ports_df, shocked, inputs["assumptions"])["unit_profit"]
+    capacity = ports_df["monthly_capacity_cargo"].to_numpy(dtype=float) * mult  # (scenarios, destinations)
+    capacity = np.broadcast_to(np.repeat(capacity, n_p, axis=0)[:, None, :], profit.shape)
+    w = np.full(n_sc, 1.0 / n_sc) if probabilities is None else np.asarray(probabilities, dtype=float)
+    names = [sc.get("name", str(i)) for i, sc in enumerate(scenarios)]
+    return {
+        "names": names if not paths else [f"{n} / path {p}" for n in names for p in range(n_p)],
+        "profit": profit, "capacity": capacity, "prob": np.repeat(w / w.sum() / n_p, n_p),
+        "codes": codes, "months": list(months),
+    }
+
+# Per-process scenario data, set once by `_init_worker` so jobs only carry (lo, hi, lift).
+_BASE: dict = {}
+
+def _init_worker(profit: np.ndarray, capacity: np.ndarray, prob: np.ndarray, distress: float) -> None:
+    # profit + distress: filling a destination beats a distressed sale only while this is > 0
+    _BASE.update(profit=np.where(np.isfinite(profit), profit + distress, 0.0), capacity=capacity,
+                 prob=prob, distress=distress)
+
+def _recourse_job(job):
+    "Scenarios [lo, hi) at plan `lift`: recourse value and supergradient (n x months), weighted allocation."
+    lo, hi, lift = job
+    p, cap = _BASE["profit"][lo:hi], _BASE["capacity"][lo:hi]
+    n, n_m, n_d = p.shape
+    supply = np.broadcast_to(lift, (n, n_m))
+    x = sort_and_fill_batch(p, cap, supply)
+    dual = fill_sensitivity(p.reshape(-1, n_d), cap.reshape(-1, n_d), supply.ravel(),
+                            x.reshape(-1, n_d))["supply_dual"].reshape(n, n_m)
+    d = _BASE["distress"]
+    return (p * x).sum(axis=-1) - d * supply, dual - d, np.tensordot(_BASE["prob"][lo:hi], x, axes=1)
+
+@trace.traced("stochastic.benders")
+def solve_two_stage(profit, capacity, lots, prob=None, cancel_cost: float = 0.0, distress_cost: float = 5.0,
+                    max_cancel: float | None = None, workers: int | None = 1, chunk_scenarios: int | None = None,
+                    tol: float = 1e-6, max_iter: int = 100, names=None, months=None, codes=None) -> dict:
+    """
+    profit, capacity: (scenarios x months x destinations) unit profit / lots
+    lots:             (months,) lots on offer per month (scalar broadcasts)
+    prob:             (scenarios,) weights (default equal)
+
+    Returns {"lift", "cancelled" (months,), "objective" (expected profit of
+    the plan), "upper_bound", "gap", "iterations", "history" [{iteration,
+    lower, upper, seconds}], "scenario_value" (scenarios,) and
+    "allocation_mean" (months x destinations) at the plan, plus the labels}.
+    """
+    profit = np.asarray(profit, dtype=float)
+    capacity = np.broadcast_to(np.asarray(capacity, dtype=float), profit.shape)
+    n_s, n_m, n_d = profit.shape
+    lots = np.floor(np.broadcast_to(np.asarray(lots, dtype=float), (n_m,)) + 1e-9)
+    prob = np.full(n_s, 1.0 / n_s) if prob is None else np.asarray(prob, dtype=float) / np.sum(prob)
+    workers = (os.cpu_count() or 1) if workers is None else int(workers)
+    chunk = int(chunk_scenarios or max(1, CHUNK_ELEMENTS // max(n_m * n_d, 1)))
+    bounds = [(s, min(s + chunk, n_s)) for s in range(0, n_s, chunk)]
+
+    m = pulp.LpProblem("two_stage_master", pulp.LpMaximize)
+    lift = [pulp.LpVariable(f"lift_{t}", 0, int(lots[t]), "Integer") for t in range(n_m)]
+    theta = [pulp.LpVariable(f"theta_{t}") for t in range(n_m)]
+    m += pulp.lpSum(theta) - cancel_cost * pulp.lpSum(int(lots[t]) - lift[t] for t in range(n_m))
+    if max_cancel is not None:
+        m += pulp.lpSum(int(lots[t]) - lift[t] for t in range(n_m)) <= float(max_cancel), "MaxCancel"
+
+    plan = lots.copy()  # lift everything first; any plan gives valid cuts
+    best, history, upper = None, [], np.inf
+    with worker_pool(workers, _init_worker, (profit, capacity, prob, float(distress_cost))) as run:
+        for it in range(1, max_iter + 1):
+            t0 = time.perf_counter()
+            with trace.span("stochastic.recourse", scenarios=n_s, chunks=len(bounds)):
+                parts = list(run(_recourse_job, [(lo, hi, plan) for lo, hi in bounds]))
+            q = np.concatenate([v for v, _, _ in parts])
+            g = np.concatenate([s for _, s, _ in parts])
+            value = float(prob @ q.sum(axis=1) - cancel_cost * (lots - plan).sum())
+            if best is None or value > best["objective"]:
+                alloc = sum(x for _, _, x in parts)
+                best = {"lift": plan.copy(), "objective": value, "scenario_value": q.sum(axis=1)
+                        - cancel_cost * (lots - plan).sum(), "allocation_mean": alloc}
+
+            eq, eg = prob @ q, prob @ g
+            for t in range(n_m):
+                m += theta[t] <= float(eq[t]) + float(eg[t]) * (lift[t] - float(plan[t])), f"Cut_{it}_{t}"
+            with trace.span("stochastic.master", iteration=it):
+                m.solve(pulp.PULP_CBC_CMD(msg=False))
+            upper = min(upper, float(pulp.value(m.objective)))
+            history.append({"iteration": it, "lower": best["objective"], "upper": upper,
+                            "seconds": time.perf_counter() - t0})
+            plan = np.array([round(v.value() or 0.0) for v in lift], dtype=float)
+            if upper - best["objective"] <= tol * max(abs(upper), 1.0):
+                break
+
+    return {
+        "lift": best["lift"], "cancelled": lots - best["lift"], "objective": best["objective"],
+        "upper_bound": upper, "gap": max(0.0, upper - best["objective"]) / max(abs(upper), 1e-9),
+        "iterations": len(history), "history": history,
+        "scenario_value": best["scenario_value"], "allocation_mean": best["allocation_mean"],
+        "names": list(range(n_s)) if names is None else list(names),
+        "months": list(range(n_m)) if months is None else list(months),
+        "codes": list(range(n_d)) if codes is None else list(codes),
+    }
@@ -0,0 +1,205 @@
+"""
+Opt-in timing spans for the hot paths.
+
+    from model import trace
+    trace.enable()
+    with trace.span("allocation.greedy", months=6):
+        ...
+    @trace.traced("market.caps")
+    def caps_from_buyer_pct_monthly(...): ...
+
+Off by default (or set BAZINGA_TRACE=1). When off, `span()` hands back a
+shared no-op context manager and `traced` functions cost one flag check.
+When on, every span adds to per-name count/total/min/max, both for the
+process lifetime (`snapshot()`, `prometheus_text()`) and for the current
+run (since `start_run()`; `snapshot(run=True)`), and appends an event
+(name, parent, run, start, duration, attrs) to a bounded buffer (`export_jsonl`).
+
+A run lives in a context variable, so each thread (e.g. each Streamlit
+session's script run) that calls `start_run()` gets its own on/off flag and
+breakdown; outside a run `enable()` sets the process-wide default.
+"""
+from __future__ import annotations
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+_enabled = os.environ.get("BAZINGA_TRACE", "") not in ("", "0")
+_lock = threading.Lock()
+_local = threading.local()
+_totals: dict = {}
+_events: deque = deque(maxlen=10_000)
+_run_id = 0
+
+class _Run:
+    "One run's on/off flag and per-name stats."
+    __slots__ = ("id", "enabled", "stats")
+
+    def __init__(self, run_id: int, on: bool):
+        self.id, self.enabled, self.stats = run_id, on, {}
+
+_current: ContextVar = ContextVar("bazinga_trace_run", default=None)
+
+def enable(on: bool = True) -> None:
+    "Switch tracing for the current run, or the process-wide default outside one."
+    global _enabled
+    run = _current.get()
+    if run is None:
+        _enabled = bool(on)
+    else:
+        run.enabled = bool(on)
+
+def enabled() -> bool:
+    run = _current.get()
+    return _enabled if run is None else run.enabled
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+_NULL = _NullSpan()
+
+def _add(table: dict, name: str, dt: float) -> None:
+    s = table.get(name)
+    if s is None:
+        table[name] = [1, dt, dt, dt]
+    else:
+        s[0] += 1
+        s[1] += dt
+        if dt < s[2]:
+            s[2] = dt
+        if dt > s[3]:
+            s[3] = dt
+
+class _Span:
+    __slots__ = ("name", "attrs", "t0", "parent")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name, self.attrs = name, attrs
+
+    def set(self, **attrs) -> None:
+        "Attach attributes after the fact (e.g. sizes known only inside the span)."
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent = stack[-1] if stack else None
+        stack.append(self.name)
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        dt = time.perf_counter() - self.t0
+        _local.stack.pop()
+        run = _current.get()
+        event = {"name": self.name, "parent": self.parent, "run": None if run is None else run.id,
+                 "start": time.time() - dt, "duration_s": dt}
+        if self.attrs:
+            event["attrs"] = self.attrs
+        if exc_type is not None:
+            event["error"] = exc_type.__name__
+        with _lock:
+            _add(_totals, self.name, dt)
+            if run is not None:
+                _add(run.stats, self.name, dt)
+            _events.append(event)
+        return False
+
+def span(name: str, **attrs):
+    "Context manager timing one stage; a no-op while tracing is off."
+    if not enabled():
+        return _NULL
+    return _Span(name, attrs)
+
+def traced(name: str | None = None):
+    "Decorator form of `span`; defaults to module.qualname."
+    def wrap(fn):
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not enabled():
+                return fn(*args, **kwargs)
+            with _Span(label, {}):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+def start_run(on: bool | None = None) -> int:
+    """
+    Start a fresh breakdown for the current context (the app calls this at the
+    top of each script run); `on` defaults to the process-wide setting.
+    Returns the run id its events are tagged with.
+    """
+    global _run_id
+    with _lock:
+        _run_id += 1
+        run_id = _run_id
+    _current.set(_Run(run_id, _enabled if on is None else bool(on)))
+    return run_id
+
+def current_run() -> int | None:
+    "Id of the current context's run, or None outside one."
+    run = _current.get()
+    return None if run is None else run.id
+
+def reset() -> None:
+    "Drop all totals, the current run's stats and buffered events."
+    run = _current.get()
+    with _lock:
+        _totals.clear()
+        _events.clear()
+        if run is not None:
+            run.stats.clear()
+
+def snapshot(run: bool = False) -> list:
+    "Rows {span, count, total_s, mean_s, min_s, max_s}, slowest total first; `run` = current run only."
+    current = _current.get()
+    table = _totals if not run else {} if current is None else current.stats
+    with _lock:
+        items = [(k, list(v)) for k, v in table.items()]
+    rows = [{"span": k, "count": c, "total_s": t, "mean_s": t / c, "min_s": lo, "max_s": hi}
+            for k, (c, t, lo, hi) in items]
+    return sorted(rows, key=lambda r: -r["total_s"])
+
+def events(run: int | None = None) -> list:
+    with _lock:
+        return [e for e in _events if run is None or e["run"] == run]
+
+def export_jsonl(dest, run: int | None = None) -> int:
+    "Write buffered span events as JSON lines to a path or text file; returns the count."
+    rows = events(run)
+    if isinstance(dest, (str, os.PathLike)):
+        with open(dest, "a") as f:
+            return export_jsonl(f, run)
+    for e in rows:
+        dest.write(json.dumps(e, default=str) + "\n")
+    return len(rows)
+
+def prometheus_text(prefix: str = "bazinga_span") -> str:
+    "Process-lifetime totals in Prometheus text exposition format."
+    rows = snapshot()
+    out = [f"# HELP {prefix}_seconds Time spent in instrumented stages.",
+           f"# TYPE {prefix}_seconds summary"]
+    for r in rows:
+        out.append(f'{prefix}_seconds_sum{{span="{r["span"]}"}} {r["total_s"]:.9f}')
+        out.append(f'{prefix}_seconds_count{{span="{r["span"]}"}} {r["count"]}')
+    out += [f"# HELP {prefix}_max_seconds Slowest single call per stage.",
+            f"# TYPE {prefix}_max_seconds gauge"]
+    for r in rows:
+        out.append(f'{prefix}_max_seconds{{span="{r["span"]}"}} {r["max_s"]:.9f}')
+    return "\n".join(out) + "\n"
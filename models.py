@@ -1,5 +1,8 @@
+import operator
 from dataclasses import dataclass
-from typing import Dict, Optional, Tuple
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
 
 # =========================
 # GLOBAL CONSTANTS
@@ -36,6 +39,18 @@ def reservation_total(volume: float = SHIPMENT_VOLUME) -> float:
 # Total terminal cost per cargo (fixed + variable components)
 TOTAL_TERMINAL_COST: float = TERMINAL_TARIFF_USD + utility_total() + reservation_total()
 
+# Probability of default by credit rating; unrated / unknown -> DEFAULT_PD
+PD_TABLE: Dict[str, float] = {
+    "AAA": 0.0001,
+    "AA": 0.0002,
+    "A": 0.0005,
+    "BBB": 0.002,
+    "BB": 0.008,
+    "B": 0.02,
+    "CCC": 0.10,
+}
+DEFAULT_PD: float = 0.05
+
 # =========================
 # DATACLASSES
 # =========================
@@ -46,6 +61,19 @@ class LNGDestination:
     tariff_usd: float = 0.0
     distance_nm: Optional[float] = None
 
+SELL_MARKETS: Tuple[str, ...] = ("SG", "JP", "CN")
+
+def target_sell_band(market: str, brent_mmbtu, jkm_mmbtu):
+    "Target sell (lo, hi) $/MMBtu for one market; scalars or aligned arrays."
+    if market == "SG":
+        # Example: Brent index + tariff (adjust to your spec)
+        return (brent_mmbtu * 0.13 + 3.0) + 0.029, (brent_mmbtu * 0.13 + 7.5) + 0.029
+    if market == "JP":
+        return jkm_mmbtu + 0.5 + BERTHING_COST, jkm_mmbtu + 1.2 + BERTHING_COST
+    if market == "CN":
+        return jkm_mmbtu + 2.0 + BERTHING_COST, jkm_mmbtu + 3.5 + BERTHING_COST
+    raise KeyError(market)
+
 @dataclass
 class LNGMonth:
     """
@@ -77,22 +105,15 @@ class LNGMonth:
 
     @property
     def target_sell_price_mmbtu_sg(self) -> Tuple[float, float]:
-        # Example: Brent index + tariff (adjust to your spec)
-        lo = (self.price_usd_brent_mmbtu * 0.13 + 3.0) + 0.029
-        hi = (self.price_usd_brent_mmbtu * 0.13 + 7.5) + 0.029
-        return lo, hi
+        return target_sell_band("SG", self.price_usd_brent_mmbtu, self.price_usd_jkm_mmbtu)
 
     @property
     def target_sell_price_mmbtu_jp(self) -> Tuple[float, float]:
-        lo = self.price_usd_jkm_mmbtu + 0.5 + BERTHING_COST
-        hi = self.price_usd_jkm_mmbtu + 1.2 + BERTHING_COST
-        return lo, hi
+        return target_sell_band("JP", self.price_usd_brent_mmbtu, self.price_usd_jkm_mmbtu)
 
     @property
     def target_sell_price_mmbtu_cn(self) -> Tuple[float, float]:
-        lo = self.price_usd_jkm_mmbtu + 2.0 + BERTHING_COST
-        hi = self.price_usd_jkm_mmbtu + 3.5 + BERTHING_COST
-        return lo, hi
+        return target_sell_band("CN", self.price_usd_brent_mmbtu, self.price_usd_jkm_mmbtu)
 
 @dataclass
 class LNGBuyer:
@@ -106,14 +127,334 @@ class LNGBuyer:
 
     def __post_init__(self):
         # default PD mapping if not provided
-        PD_TABLE = {
-            "AAA": 0.0001,
-            "AA": 0.0002,
-            "A": 0.0005,
-            "BBB": 0.002,
-            "BB": 0.008,
-            "B": 0.02,
-            "CCC": 0.10,
-        }
         if self.probability_of_default is None:
-            self.probability_of_default = PD_TABLE.get(self.credit_rating.upper(), 0.05)
+            self.probability_of_default = PD_TABLE.get(self.credit_rating.upper(), DEFAULT_PD)
+
+# =========================
+# STRUCT-OF-ARRAYS BUYER BOOK
+# =========================
+def _codes(values: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+    "Categorical encode: (labels in first-seen order, int32 codes)."
+    labels = list(dict.fromkeys(values))
+    index = {v: i for i, v in enumerate(labels)}
+    return labels, np.fromiter(map(index.__getitem__, values), dtype=np.int32, count=len(values))
+
+def _rows(dicts: Sequence[Mapping], keys: Sequence[str], missing) -> list:
+    "[tuple(d[k] for k in keys) for d in dicts], with `missing` for absent keys and None values."
+    if not keys:
+        return [() for _ in dicts]
+    get = operator.itemgetter(*keys)
+    single = len(keys) == 1  # itemgetter returns the bare value for one key
+    out = []
+    for d in dicts:
+        try:
+            row = (get(d),) if single else get(d)
+        except KeyError:
+            row = tuple(d.get(k, missing) for k in keys)
+        if None in row:
+            row = tuple(missing if v is None else v for v in row)
+        out.append(row)
+    return out
+
+class _PriceRow(Mapping):
+    "Read-only {month: price} view of one buyer's row; months without a price are absent."
+    __slots__ = ("_book", "_i")
+
+    def __init__(self, book: "BuyerBook", i: int):
+        self._book, self._i = book, i
+
+    def __getitem__(self, month: str) -> float:
+        v = self._book.price[self._i, self._book.month_index[month]]
+        if v != v:  # NaN = no price
+            raise KeyError(month)
+        return float(v)
+
+    def __iter__(self):
+        row = self._book.price[self._i]
+        return (m for m, v in zip(self._book.months, row) if v == v)
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(~np.isnan(self._book.price[self._i])))
+
+class BuyerRow:
+    "LNGBuyer-compatible view of one BuyerBook row (no per-buyer storage)."
+    __slots__ = ("_book", "_i")
+
+    def __init__(self, book: "BuyerBook", i: int):
+        self._book, self._i = book, i
+
+    name = property(lambda self: self._book.names[self._i])
+    country = property(lambda self: self._book.country_labels[self._book.country_code[self._i]])
+    profile = property(lambda self: self._book.profile_labels[self._book.profile_code[self._i]])
+    credit_rating = property(lambda self: self._book.rating_labels[self._book.rating_code[self._i]])
+    negotiation_factor = property(lambda self: float(self._book.negotiation_factor[self._i]))
+    probability_of_default = property(lambda self: float(self._book.pd[self._i]))
+    price = property(lambda self: _PriceRow(self._book, self._i))
+
+    def caps(self) -> Dict[str, float]:
+        return dict(zip(self._book.months, self._book.caps[self._i].tolist()))
+
+    def to_buyer(self) -> LNGBuyer:
+        return LNGBuyer(self.name, self.country, self.profile, self.credit_rating, self.negotiation_factor,
+                        dict(self.price), self.probability_of_default)
+
+    def __repr__(self) -> str:
+        return f"BuyerRow({self.name!r}, {self.country!r}, {self.credit_rating!r})"
+
+class BuyerBook:
+    """
+    Buyers as aligned arrays instead of one LNGBuyer (and one price dict) each.
+
+    price (buyers x months, NaN = no price), caps (buyers x months, MMBtu),
+    negotiation_factor and pd (buyers,), country/profile/rating as int32
+    codes into *_labels. `book[i]` / iteration give BuyerRow views that
+    behave like LNGBuyer for existing code; allocators read the arrays.
+    """
+
+    __slots__ = ("months", "month_index", "names", "name_index", "price", "caps", "negotiation_factor", "pd",
+                 "country_labels", "country_code", "profile_labels", "profile_code", "rating_labels", "rating_code")
+
+    def __init__(self, months: Sequence[str], names: Sequence[str], countries: Sequence[str],
+                 profiles: Sequence[str], ratings: Sequence[str], negotiation_factor, price,
+                 pd=None, caps=None):
+        self.months = list(months)
+        self.month_index = {m: j for j, m in enumerate(self.months)}
+        self.names = list(names)
+        self.name_index = {n: i for i, n in enumerate(self.names)}
+        if len(self.name_index) != len(self.names):
+            raise ValueError("buyer names must be unique")
+        n, n_m = len(self.names), len(self.months)
+        self.price = np.asarray(price, dtype=float).reshape(n, n_m)
+        self.caps = np.zeros((n, n_m)) if caps is None else np.asarray(caps, dtype=float).reshape(n, n_m)
+        self.negotiation_factor = np.asarray(negotiation_factor, dtype=float).reshape(n)
+        self.country_labels, self.country_code = _codes(countries)
+        self.profile_labels, self.profile_code = _codes(profiles)
+        self.rating_labels, self.rating_code = _codes(ratings)
+        if pd is None:
+            by_rating = np.array([PD_TABLE.get(r.upper(), DEFAULT_PD) for r in self.rating_labels])
+            pd = by_rating[self.rating_code] if n else np.zeros(0)
+        else:
+            pd = np.asarray([np.nan if v is None else v for v in pd], dtype=float)
+            if np.isnan(pd).any():  # per-row None -> rating default, as LNGBuyer does
+                by_rating = np.array([PD_TABLE.get(r.upper(), DEFAULT_PD) for r in self.rating_labels])
+                pd = np.where(np.isnan(pd), by_rating[self.rating_code], pd)
+        self.pd = pd
+
+    @classmethod
+    def from_records(cls, records: Iterable[Mapping], months: Optional[Sequence[str]] = None) -> "BuyerBook":
+        """
+        Build from LNGBuyer-shaped mappings (name, country, profile, credit_rating,
+        negotiation_factor, price {month: $/MMBtu}, optional probability_of_default
+        and caps {month: MMBtu}) without creating per-buyer objects.
+        """
+        records = list(records)
+        if months is None:
+            months = list(dict.fromkeys(m for r in records for m in r["price"]))
+        price = np.array(_rows([r["price"] for r in records], months, float("nan")), dtype=float)
+        caps = None
+        if any(r.get("caps") for r in records):
+            caps = np.array(_rows([r.get("caps") or {} for r in records], months, 0.0), dtype=float)
+        return cls(months, [r["name"] for r in records], [r["country"] for r in records],
+                   [r["profile"] for r in records], [r["credit_rating"] for r in records],
+                   [r["negotiation_factor"] for r in records], price,
+                   [r.get("probability_of_default") for r in records], caps)
+
+    @classmethod
+    def from_buyers(cls, buyers: Iterable[LNGBuyer], months: Optional[Sequence[str]] = None,
+                    caps_by_month: Optional[Mapping[str, Mapping[str, float]]] = None) -> "BuyerBook":
+        "Build from LNGBuyer objects; caps_by_month is the app's {month: {buyer: MMBtu}}."
+        buyers = list(buyers)
+        book = cls.from_records((vars(b) for b in buyers), months)
+        if caps_by_month is not None:
+            book.set_caps(caps_by_month)
+        return book
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, i: int) -> BuyerRow:
+        if i < 0:
+            i += len(self.names)
+        if not 0 <= i < len(self.names):
+            raise IndexError(i)
+        return BuyerRow(self, i)
+
+    def __iter__(self):
+        return (BuyerRow(self, i) for i in range(len(self.names)))
+
+    def row(self, name: str) -> BuyerRow:
+        return BuyerRow(self, self.name_index[name])
+
+    @property
+    def country(self) -> np.ndarray:
+        "Country label per buyer (object array)."
+        return np.asarray(self.country_labels, dtype=object)[self.country_code]
+
+    def select(self, mask) -> "BuyerBook":
+        "Sub-book of the rows where `mask` is True (or of the given indices)."
+        idx = np.flatnonzero(mask) if np.asarray(mask).dtype == bool else np.asarray(mask, dtype=int)
+        return BuyerBook(self.months, [self.names[i] for i in idx], self.country[idx].tolist(),
+                         [self.profile_labels[c] for c in self.profile_code[idx]],
+                         [self.rating_labels[c] for c in self.rating_code[idx]],
+                         self.negotiation_factor[idx], self.price[idx], self.pd[idx], self.caps[idx])
+
+    def price_matrix(self, months: Optional[Sequence[str]] = None) -> np.ndarray:
+        "(months x buyers) prices, the orientation the allocators use; NaN = no price."
+        if months is None:
+            return self.price.T
+        out = np.full((len(months), len(self.names)), np.nan)
+        for k, m in enumerate(months):
+            j = self.month_index.get(m)
+            if j is not None:
+                out[k] = self.price[:, j]
+        return out
+
+    def cap_matrix(self, months: Optional[Sequence[str]] = None) -> np.ndarray:
+        "(months x buyers) caps."
+        if months is None:
+            return self.caps.T
+        out = np.zeros((len(months), len(self.names)))
+        for k, m in enumerate(months):
+            j = self.month_index.get(m)
+            if j is not None:
+                out[k] = self.caps[:, j]
+        return out
+
+    def set_caps(self, caps_by_month: Mapping[str, Mapping[str, float]]) -> None:
+        "Overwrite caps from {month: {buyer: MMBtu}}; buyers/months not listed keep their value."
+        for m, per_buyer in caps_by_month.items():
+            j = self.month_index.get(m)
+            if j is None:
+                continue
+            for name, v in per_buyer.items():
+                i = self.name_index.get(name)
+                if i is not None:
+                    self.caps[i, j] = v
+
+    def caps_by_month(self) -> Dict[str, Dict[str, float]]:
+        return {m: dict(zip(self.names, self.caps[:, j].tolist())) for j, m in enumerate(self.months)}
+
+    def to_buyers(self) -> List[LNGBuyer]:
+        return [row.to_buyer() for row in self]
+
+# =========================
+# VECTORISED MARKET HORIZON
+# =========================
+class MonthView:
+    "LNGMonth-compatible view of one MarketHorizon period (no per-month storage)."
+    __slots__ = ("_h", "_i")
+
+    def __init__(self, horizon: "MarketHorizon", i: int):
+        self._h, self._i = horizon, i
+
+    month = property(lambda self: self._h.labels[self._i])
+    cost_usd_hh_mmbtu = property(lambda self: float(self._h.hh[self._i]))
+    price_usd_brent_mmbtu = property(lambda self: float(self._h.brent[self._i]))
+    price_usd_jkm_mmbtu = property(lambda self: float(self._h.jkm[self._i]))
+    BLNG3g = property(lambda self: float(self._h.blng3g[self._i]))
+    freight_cost = property(lambda self: dict(zip(self._h.dests, self._h.freight[self._i].tolist())))
+    final_cost_usd_mmbtu = property(lambda self: dict(zip(self._h.dests, self._h.final_cost[self._i].tolist())))
+    cost_usd_hh_total = property(lambda self: float(self._h.hh[self._i]) * SHIPMENT_VOLUME)
+    price_usd_brent_total = property(lambda self: float(self._h.brent[self._i]) * SHIPMENT_VOLUME)
+    price_usd_jkm_total = property(lambda self: float(self._h.jkm[self._i]) * SHIPMENT_VOLUME)
+    target_sell_price_mmbtu_sg = property(lambda self: self._h.sell_band("SG", self._i))
+    target_sell_price_mmbtu_jp = property(lambda self: self._h.sell_band("JP", self._i))
+    target_sell_price_mmbtu_cn = property(lambda self: self._h.sell_band("CN", self._i))
+
+    def to_month(self) -> LNGMonth:
+        return LNGMonth(self.month, self.cost_usd_hh_mmbtu, self.price_usd_brent_mmbtu, self.price_usd_jkm_mmbtu,
+                        self.BLNG3g, self.freight_cost, self.final_cost_usd_mmbtu)
+
+    def __repr__(self) -> str:
+        return f"MonthView({self.month!r})"
+
+class MarketHorizon:
+    """
+    A delivery horizon (months, weeks or days) as aligned arrays.
+
+    hh, brent, jkm, blng3g are (periods,); freight and final_cost are
+    (periods x destinations) in `dests` order; sell_lo / sell_hi are
+    (periods x SELL_MARKETS). Everything is computed once in __init__;
+    `horizon[i]` / `horizon["Jan-2026"]` / iteration give MonthView objects
+    that read like LNGMonth.
+    """
+
+    __slots__ = ("labels", "label_index", "dates", "hh", "brent", "jkm", "blng3g", "dests", "voyage_days",
+                 "freight", "final_cost", "sell_lo", "sell_hi")
+
+    def __init__(self, labels: Sequence[str], hh, brent_mmbtu, jkm, blng3g,
+                 voyage_days: Mapping[str, float], dates=None, freight=None):
+        self.labels = [str(l) for l in labels]
+        self.label_index = {l: i for i, l in enumerate(self.labels)}
+        if len(self.label_index) != len(self.labels):
+            raise ValueError("period labels must be unique")
+        n = len(self.labels)
+        self.dates = None if dates is None else np.asarray(dates)
+        self.hh, self.brent, self.jkm, self.blng3g = (np.asarray(v, dtype=float).reshape(n)
+                                                      for v in (hh, brent_mmbtu, jkm, blng3g))
+        self.dests = list(voyage_days)
+        self.voyage_days = np.array([voyage_days[d] for d in self.dests], dtype=float)
+        # same arithmetic as model.market.make_month, one broadcast for the whole horizon;
+        # `freight` (periods x dests USD, e.g. from a daily freight index) overrides it
+        if freight is None:
+            self.freight = self.blng3g[:, None] * self.voyage_days[None, :]
+        else:
+            self.freight = np.asarray(freight, dtype=float).reshape(n, len(self.dests))
+        self.final_cost = self.hh[:, None] + ((TOTAL_TERMINAL_COST + self.freight) / SHIPMENT_VOLUME)
+        bands = [target_sell_band(m, self.brent, self.jkm) for m in SELL_MARKETS]
+        self.sell_lo = np.stack([lo for lo, _ in bands], axis=1) if n else np.zeros((0, len(SELL_MARKETS)))
+        self.sell_hi = np.stack([hi for _, hi in bands], axis=1) if n else np.zeros((0, len(SELL_MARKETS)))
+
+    @classmethod
+    def from_months(cls, months: Iterable[LNGMonth]) -> "MarketHorizon":
+        "Pack existing LNGMonth objects (freight is taken as given, so voyage days are backed out)."
+        months = list(months)
+        h = cls([m.month for m in months], [m.cost_usd_hh_mmbtu for m in months],
+                [m.price_usd_brent_mmbtu for m in months], [m.price_usd_jkm_mmbtu for m in months],
+                [m.BLNG3g for m in months], {d: 0.0 for d in (months[0].freight_cost if months else {})})
+        if months:
+            h.freight = np.array([[m.freight_cost[d] for d in h.dests] for m in months], dtype=float)
+            h.final_cost = np.array([[m.final_cost_usd_mmbtu[d] for d in h.dests] for m in months], dtype=float)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                h.voyage_days = np.nanmean(h.freight / h.blng3g[:, None], axis=0)
+        return h
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __getitem__(self, key) -> MonthView:
+        i = self.label_index[key] if isinstance(key, str) else int(key)
+        if i < 0:
+            i += len(self.labels)
+        if not 0 <= i < len(self.labels):
+            raise IndexError(key)
+        return MonthView(self, i)
+
+    def __iter__(self):
+        return (MonthView(self, i) for i in range(len(self.labels)))
+
+    def index(self, labels: Sequence[str]) -> np.ndarray:
+        return np.array([self.label_index[l] for l in labels], dtype=int)
+
+    def sell_band(self, market: str, i=slice(None)):
+        "(lo, hi) for one market: floats for a single period, arrays otherwise."
+        j = SELL_MARKETS.index(market)
+        lo, hi = self.sell_lo[i, j], self.sell_hi[i, j]
+        return (float(lo), float(hi)) if np.ndim(lo) == 0 else (lo, hi)
+
+    def final_cost_matrix(self, dests: Optional[Sequence[str]] = None) -> np.ndarray:
+        "(periods x dests) $/MMBtu, in `dests` order (default: the horizon's)."
+        if dests is None:
+            return self.final_cost
+        return self.final_cost[:, [self.dests.index(d) for d in dests]]
+
+    def final_costs(self) -> Dict[str, Dict[str, float]]:
+        "{period: {dest: $/MMBtu}}, the shape the allocators take."
+        return {l: dict(zip(self.dests, row)) for l, row in zip(self.labels, self.final_cost.tolist())}
+
+    def totals(self, per_mmbtu) -> np.ndarray:
+        "Per-cargo USD for a $/MMBtu array (e.g. horizon.totals(horizon.jkm))."
+        return np.asarray(per_mmbtu, dtype=float) * SHIPMENT_VOLUME
+
+    def to_months(self) -> List[LNGMonth]:
+        return [v.to_month() for v in self]
@@ -0,0 +1,46 @@
+from __future__ import annotations
+import sys
+import threading
+
+import numpy as np
+
+from model.cache import ResultCache, stable_hash
+
+def test_lru_eviction_and_copies(tmp_path):
+    cache = ResultCache(max_entries=2, disk_dir=tmp_path)
+    cache.put("a", {"x": [1]})
+    cache.put("b", 2)
+    cache.get("a")["x"].append(9)  # callers get their own copy
+    cache.put("c", 3)  # evicts b, the least recent
+    assert cache.stats()["entries"] == 2
+    assert cache.get("a") == {"x": [1]}
+    cache.clear()
+    assert cache.get("b") == 2 and cache.stats()["disk_hits"] == 1  # promoted from disk
+
+def test_concurrent_get_put_with_eviction():
+    cache = ResultCache(max_entries=8)
+    keys = [stable_hash("k", i) for i in range(64)]
+    errors = []
+
+    def worker(seed):
+        rng = np.random.default_rng(seed)
+        try:
+            for _ in range(2000):
+                i = int(rng.integers(len(keys)))
+                assert cache.get_or_compute(keys[i], lambda: i) == i
+        except Exception as exc:  # noqa: BLE001 - surfaced below
+            errors.append(exc)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads often enough to hit check-then-act races
+    threads = [threading.Thread(target=worker, args=(s,)) for s in range(8)]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert not errors
+    stats = cache.stats()
+    assert stats["entries"] <= 8 and stats["hits"] + stats["misses"] == 8 * 2000
@@ -0,0 +1,37 @@
+from __future__ import annotations
+import json
+from pathlib import Path
+
+import pytest
+
+from model.cli import EXAMPLE_CONFIG, main
+
+DATA = Path(__file__).resolve().parent.parent / "data"
+
+@pytest.mark.parametrize("cmd", ["simulate", "stochastic"])
+def test_out_dash_keeps_stdout_jsonl(cmd, tmp_path, capsys):
+    cfg = dict(EXAMPLE_CONFIG, ports=str(DATA / "ports.csv"), base_inputs=str(DATA / "base_inputs.json"))
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps(cfg))
+    assert main([cmd, str(path), "--paths", "8", "--out", "-"]) == 0
+    out, err = capsys.readouterr()
+    records = [json.loads(line) for line in out.splitlines()]
+    assert records and all(isinstance(r, dict) for r in records)
+    assert isinstance(json.loads(err), dict)  # the summary
+
+def test_buyers_and_caps_inline_or_from_files(tmp_path):
+    from dataclasses import asdict
+    from model.market import BUYERS, HORIZON
+    buyers = [asdict(b) for b in BUYERS]
+    caps = {m: {b.name: 2.0e6 for b in BUYERS} for m in HORIZON.labels}
+    (tmp_path / "buyers.json").write_text(json.dumps(buyers))
+    (tmp_path / "caps.json").write_text(json.dumps(caps))
+    outs = []
+    for name, extra in [("inline", {"buyers": buyers, "caps": caps}),
+                        ("files", {"buyers": "buyers.json", "caps": "caps.json"})]:
+        path = tmp_path / f"{name}.json"
+        path.write_text(json.dumps(dict(EXAMPLE_CONFIG, scenarios={"named": ["Base"]}, **extra)))
+        out = tmp_path / f"{name}.jsonl"
+        assert main(["allocate", str(path), "--out", str(out), "--quiet"]) == 0
+        outs.append(out.read_text())
+    assert outs[0] and outs[0] == outs[1]
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+import numpy as np
+
+from model.curves import MMBTU_PER_BBL, curves_from_market_data, month_starts
+from model.ingest import load_market_data
+from model.market import DEFAULT_CURVES, build_horizon
+
+def test_market_data_curves_build_a_horizon(tmp_path):
+    tables = load_market_data(cache_dir=tmp_path, datasets=["henry_hub_forward", "jkm_forward",
+                                                            "brent_historical", "baltic_freight"])
+    curves = curves_from_market_data(tables)
+    months = month_starts("Jan-2026", 36)
+    horizon = build_horizon(months, curves)
+    assert len(horizon.labels) == 36
+    # the default curves are the Sep-25 HH strip plus the adder and the JKM strip
+    first = month_starts("Jan-2026", 6)
+    assert np.allclose(curves["HH"](first), DEFAULT_CURVES["HH"](first))
+    assert np.allclose(curves["JKM"](first), DEFAULT_CURVES["JKM"](first))
+    assert np.allclose(curves["BRENT_MMBTU"].values * MMBTU_PER_BBL, curves["BRENT"].values)
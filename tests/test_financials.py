@@ -0,0 +1,53 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+import pytest
+
+from model.financials import (build_unit_profit_cube, build_unit_profit_table, delivered_fraction,
+                              delivered_fraction_array, unit_profit_for_destination)
+
+ASSUMPTIONS = {"boiloff_rate_per_1000nm": 0.15, "freight_cost_per_nm_per_unit": 0.02,
+               "variable_cost_per_unit": 5.0, "carbon_cost_per_unit": 0.4}
+
+def _ports(rng, n: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "name": [f"Port {i}" for i in range(n)], "code": [f"P{i}" for i in range(n)],
+        # the longest voyages boil off everything, so the fraction clips to 0
+        "distance_nm": rng.uniform(0.0, 9000.0, n).round(1),
+        "monthly_capacity_cargo": rng.integers(1, 20, n), "handling_fee_per_unit": rng.uniform(0.0, 1.0, n),
+    })
+
+def _scalar(ports: pd.DataFrame, price: float, row: int) -> float:
+    return unit_profit_for_destination(
+        price, float(ports["distance_nm"][row]), float(ports["handling_fee_per_unit"][row]),
+        ASSUMPTIONS["boiloff_rate_per_1000nm"], ASSUMPTIONS["freight_cost_per_nm_per_unit"],
+        ASSUMPTIONS["variable_cost_per_unit"], ASSUMPTIONS["carbon_cost_per_unit"])
+
+@pytest.mark.parametrize("seed", range(5))
+def test_table_matches_scalar_exactly(seed):
+    rng = np.random.default_rng(seed)
+    ports = _ports(rng, 12)
+    price_map = dict(zip(ports["code"], rng.uniform(5.0, 20.0, 12)))
+    table = build_unit_profit_table(ports, price_map, ASSUMPTIONS)
+    for i, code in enumerate(ports["code"]):
+        assert table["unit_profit"][i] == _scalar(ports, price_map[code], i)
+        assert table["delivered_fraction"][i] == delivered_fraction(float(ports["distance_nm"][i]),
+                                                                    ASSUMPTIONS["boiloff_rate_per_1000nm"])
+    assert (table["delivered_fraction"] == 0.0).any()
+
+def test_delivered_fraction_array_matches_scalar():
+    distance = np.array([0.0, 500.0, 6666.6, 6666.7, 1e5, np.nan])
+    out = delivered_fraction_array(distance, 0.15)
+    assert out.tolist() == [delivered_fraction(d, 0.15) for d in distance]
+
+def test_cube_matches_table_per_slice():
+    rng = np.random.default_rng(7)
+    ports = _ports(rng, 6)
+    prices = rng.uniform(5.0, 20.0, (3, 4, 6))
+    cube = build_unit_profit_cube(ports, prices, ASSUMPTIONS, months=list("abcd"), scenarios=["lo", "mid", "hi"])
+    assert len(cube) == prices.size
+    for s, scenario in enumerate(["lo", "mid", "hi"]):
+        for m, month in enumerate("abcd"):
+            got = cube[(cube["scenario"] == scenario) & (cube["month"] == month)].reset_index(drop=True)
+            ref = build_unit_profit_table(ports, dict(zip(ports["code"], prices[s, m])), ASSUMPTIONS)
+            pd.testing.assert_frame_equal(got.drop(columns=["scenario", "month"]), ref, check_dtype=False)
@@ -0,0 +1,73 @@
+from __future__ import annotations
+import numpy as np
+import pytest
+
+from model.freight import (ROUTES, FreightIndex, cheapest_route, final_costs_for_route, horizon_freight,
+                           route_freight_cube)
+from model.market import HORIZON
+
+def _brute_hire(rates, x: float, days: float) -> float:
+    "Sum each calendar day's rate times its overlap with [x, x + days]; flat beyond both ends."
+    total = 0.0
+    for k in range(int(np.floor(x)), int(np.ceil(x + days))):
+        overlap = min(k + 1, x + days) - max(k, x)
+        total += rates[min(max(k, 0), len(rates) - 1)] * max(overlap, 0.0)
+    return total
+
+def test_hire_matches_integration():
+    rng = np.random.default_rng(0)
+    rates = rng.uniform(20_000, 200_000, 90)
+    index = FreightIndex("2026-01-01", rates)
+    for x, days in zip(rng.uniform(-10, 95, 50), rng.uniform(0.5, 45, 50)):
+        assert index.hire(x, days) == pytest.approx(_brute_hire(rates, x, days), rel=1e-12)
+
+def test_whole_days_are_exact():
+    rates = np.arange(1.0, 11.0)
+    index = FreightIndex("2026-01-01", rates)
+    assert index.hire(2, 3) == rates[2:5].sum()
+    assert index.hire(np.datetime64("2026-01-03"), 3) == rates[2:5].sum()
+    assert index.hire(8, 5) == rates[8] + rates[9] * 4  # last rate carries forward
+    assert index.hire(-2, 3) == rates[0] * 3  # first rate carries back
+
+def test_broadcasting_and_departure_grid():
+    rates = np.linspace(50_000, 80_000, 60)
+    index = FreightIndex("2026-01-01", rates)
+    grid = index.departure_grid("2026-01-01", "2026-01-31", [10.0, 25.5], route_mult=1.5)
+    assert grid["freight"].shape == (31, 2)
+    expected = index.hire(np.arange(31)[:, None], np.array([10.0, 25.5])[None, :]) * 1.5
+    np.testing.assert_allclose(grid["freight"], expected)
+
+def test_panama_without_delay_is_horizon_final_costs():
+    assert final_costs_for_route(HORIZON) == HORIZON.final_costs()
+    assert final_costs_for_route(HORIZON, "Panama", {"Panama": 0.0}) == HORIZON.final_costs()
+    cube = horizon_freight(HORIZON)
+    np.testing.assert_array_equal(cube["freight"][ROUTES.index("Panama")], HORIZON.freight.T)
+
+def test_scenario_delays_broadcast_to_leading_axes():
+    day_rate, voyage_days = HORIZON.blng3g, HORIZON.voyage_days
+    panama, suez = np.array([0.0, 5.0, 12.0]), np.array([[0.0], [3.0]])  # broadcast to (2, 3)
+    cube = route_freight_cube(day_rate, voyage_days, delay_days={"Panama": panama, "Suez": suez},
+                              demurrage_mult=1.5)
+    shape = (2, 3, len(ROUTES), len(voyage_days), len(day_rate))
+    assert cube.shape == shape
+    for i in range(2):
+        for j in range(3):
+            ref = route_freight_cube(day_rate, voyage_days, delay_days={"Panama": panama[j], "Suez": suez[i, 0]},
+                                     demurrage_mult=1.5)
+            np.testing.assert_array_equal(cube[i, j], ref)
+    idx, cost = cheapest_route(cube)
+    assert idx.shape == cost.shape == shape[:2] + shape[3:]
+    np.testing.assert_array_equal(cost, cube.min(axis=-3))
+    np.testing.assert_array_equal(idx, cube.argmin(axis=-3))
+
+def test_cheapest_route_final_costs():
+    delays = {"Panama": 7.0}  # Suez wins for the shortest voyage only
+    per_route = [final_costs_for_route(HORIZON, r, delays) for r in ROUTES]
+    cheapest = final_costs_for_route(HORIZON, "Cheapest", delays)
+    for m, row in cheapest.items():
+        for d, cost in row.items():
+            assert cost == min(fc[m][d] for fc in per_route)
+
+def test_delays_only_on_canal_routes():
+    with pytest.raises(ValueError, match="canal"):
+        route_freight_cube(HORIZON.blng3g, HORIZON.voyage_days, delay_days={"Cape": 3.0})
@@ -0,0 +1,38 @@
+from __future__ import annotations
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from model.grid import run_grid
+from model.scenarios import scenario_grid
+
+DATA = Path(__file__).resolve().parent.parent / "data"
+
+def _inputs():
+    inputs = json.loads((DATA / "base_inputs.json").read_text())
+    return pd.read_csv(DATA / "ports.csv"), inputs["prices_usd_per_unit"], inputs["assumptions"]
+
+def test_pool_matches_in_process_and_keeps_order():
+    ports, prices, assumptions = _inputs()
+    scenarios = list(scenario_grid({"JP": [0, 1, 2, 3]}, {"SLNG": [1.0, 0.5]}, [15, 20]))
+    serial = list(run_grid(ports, prices, assumptions, scenarios, workers=1))
+    pooled = list(run_grid(ports, prices, assumptions, scenarios, workers=2, chunksize=3))
+    assert [r["index"] for r in pooled] == list(range(len(scenarios)))
+    assert [r["objective"] for r in pooled] == [r["objective"] for r in serial]
+
+def test_pool_reads_a_bounded_window_ahead():
+    ports, prices, assumptions = _inputs()
+    drawn = []
+
+    def scenarios():
+        for i in range(50_000):
+            drawn.append(i)
+            yield {"name": str(i), "price_shocks": {"JP": i % 7}}
+
+    results = run_grid(ports, prices, assumptions, scenarios(), workers=2, chunksize=4)
+    first = next(results)
+    assert first["index"] == 0
+    # 2 * workers chunks in flight plus the refill
+    assert len(drawn) <= (2 * 2 + 1) * 4
+    results.close()
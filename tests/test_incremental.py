@@ -0,0 +1,55 @@
+from __future__ import annotations
+import copy
+
+import pandas as pd
+
+from model.allocation import greedy_profit_table
+from model.cache import ResultCache
+from model.incremental import IncrementalAllocator
+from model.market import (BUYERS, BUYER_OF_OPEN_PCT_DEFAULT, HORIZON, MARKET_BY_MC, OPEN_PCT_DEFAULT,
+                          default_buyer_pct_per_month, derive_open_and_buyer_totals)
+from models import LNGBuyer, SELL_POSITION
+
+MONTHS = list(HORIZON.labels)
+
+def _inputs():
+    open_by_mc, total_by_mc = derive_open_and_buyer_totals(MARKET_BY_MC, OPEN_PCT_DEFAULT, BUYER_OF_OPEN_PCT_DEFAULT)
+    return {"open_pct": OPEN_PCT_DEFAULT, "buyer_of_open_pct": BUYER_OF_OPEN_PCT_DEFAULT,
+            "buyer_pct": default_buyer_pct_per_month(open_by_mc, total_by_mc),
+            "active": {b.name for b in BUYERS}, "prices": {b.name: b.price for b in BUYERS},
+            "final_costs": HORIZON.final_costs(), "supply": SELL_POSITION}
+
+def _allocator(**kwargs) -> IncrementalAllocator:
+    engine = IncrementalAllocator(MONTHS, BUYERS, MARKET_BY_MC, **kwargs)
+    engine.update(**_inputs())
+    return engine
+
+def test_matches_greedy_profit_table():
+    engine = _allocator()
+    res = engine.result()
+    ref = greedy_profit_table(BUYERS, MONTHS, HORIZON.final_costs(), engine.caps(), SELL_POSITION)
+    pd.testing.assert_frame_equal(res["table"], ref["table"], check_dtype=False)
+    assert res["leftover"] == ref["leftover"]
+
+def test_one_buyer_month_edit_recomputes_one_country_month():
+    engine = _allocator()
+    engine.result()
+    engine.g.recomputed.clear()
+    inputs = _inputs()
+    buyer = BUYERS[0]
+    inputs["buyer_pct"] = copy.deepcopy(inputs["buyer_pct"])
+    inputs["buyer_pct"][buyer.name]["Mar-2026"] += 5.0
+    assert engine.update(**inputs) == 1
+    engine.result()
+    assert dict(engine.g.recomputed) == {"caps": 1, "month": 1}
+    assert not any(engine.g.is_stale(("caps", m, c)) for m in MONTHS for c in engine.countries)
+
+def test_cache_key_covers_table_columns():
+    cache = ResultCache()
+    _allocator(cache=cache).result()
+    renamed = [LNGBuyer(b.name, b.country, "Spot", b.credit_rating, b.negotiation_factor, b.price,
+                        b.probability_of_default) for b in BUYERS]
+    engine = IncrementalAllocator(MONTHS, renamed, MARKET_BY_MC, cache=cache)
+    engine.update(**_inputs())
+    table = engine.result()["table"]
+    assert (table["Profile"] == "Spot").all()
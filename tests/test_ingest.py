@@ -0,0 +1,30 @@
+from __future__ import annotations
+import datetime as dt
+
+import pandas as pd
+import pytest
+
+from model.ingest import _check_dates, _parse_wti_forward
+
+WTI = "WTI Forward (Extracted 23Sep25).xlsx"
+
+def _wti_sheet(start: str, n: int) -> pd.DataFrame:
+    # what Excel hands back for 'Nov25'-style labels: the right month, year 200<last digit>
+    months = pd.date_range(start, periods=n, freq="MS")
+    cells = [dt.datetime(2000 + m.year % 10, m.month, 1) for m in months]
+    rows = [["Month", "Last", "Close"]] + [[c, 60.0 + i, 60.5 + i] for i, c in enumerate(cells)]
+    return pd.DataFrame(rows)
+
+def test_wti_strip_recovers_contract_months():
+    out = _parse_wti_forward(_wti_sheet("2025-11-01", 124))
+    assert list(out["date"]) == list(pd.date_range("2025-11-01", periods=124, freq="MS"))
+    assert out["price"].iloc[0] == 60.5
+    _check_dates("wti_forward", WTI, out)
+
+def test_dates_outside_the_sheet_years_are_rejected():
+    strip = pd.DataFrame({"date": pd.date_range("2000-01-01", periods=120, freq="MS"), "contract": "CL",
+                          "price": 60.0})
+    with pytest.raises(ValueError, match="outside"):
+        _check_dates("wti_forward", WTI, strip)
+    history = strip.assign(date=pd.date_range("1987-05-01", periods=120, freq="MS"))
+    _check_dates("wti_historical", WTI.replace("Forward", "Historical"), history)
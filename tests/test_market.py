@@ -0,0 +1,12 @@
+from __future__ import annotations
+
+from model.market import DESTS, HORIZON, make_month
+
+def test_build_horizon_matches_make_month():
+    # the original app's January inputs
+    assert HORIZON["Jan-2026"].to_month() == make_month("Jan-2026", 6.665, 21.86775512, 11.64, 52691.62, DESTS)
+    for view in HORIZON:
+        ref = make_month(view.month, view.cost_usd_hh_mmbtu, view.price_usd_brent_mmbtu,
+                         view.price_usd_jkm_mmbtu, view.BLNG3g, DESTS)
+        assert view.to_month() == ref
+        assert view.target_sell_price_mmbtu_jp == ref.target_sell_price_mmbtu_jp
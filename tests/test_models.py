@@ -0,0 +1,68 @@
+from __future__ import annotations
+import dataclasses
+import math
+
+import numpy as np
+import pytest
+
+from models import BuyerBook, LNGBuyer, LNGMonth, MarketHorizon
+from model.market import BUYERS, HORIZON
+
+def _record(name, price, caps=None, pd_=None):
+    rec = {"name": name, "country": "JP", "profile": "Term", "credit_rating": "A",
+           "negotiation_factor": 1.0, "price": price, "probability_of_default": pd_}
+    if caps is not None:
+        rec["caps"] = caps
+    return rec
+
+def test_from_buyers_round_trip():
+    months = ["Jan-2026", "Feb-2026", "Mar-2026"]
+    caps = {m: {b.name: 1e5 * (i + 1) for i, b in enumerate(BUYERS)} for m in months}
+    book = BuyerBook.from_buyers(BUYERS, months, caps_by_month=caps)
+    for orig, back in zip(BUYERS, book.to_buyers()):
+        assert back == LNGBuyer(orig.name, orig.country, orig.profile, orig.credit_rating,
+                                orig.negotiation_factor, {m: orig.price[m] for m in months if m in orig.price},
+                                orig.probability_of_default)
+    assert book.caps_by_month() == caps
+
+@pytest.mark.parametrize("months", [["Jan-2026"], ["Jan-2026", "Feb-2026"]])
+def test_from_records_missing_and_none(months):
+    recs = [_record("a", {m: 10.0 for m in months}, caps={m: 5.0 for m in months}),
+            _record("b", {}, caps={months[-1]: None}),  # no prices, a None cap
+            _record("c", {months[0]: None}, pd_=0.2)]  # None price, no caps
+    book = BuyerBook.from_records(recs, months)
+    assert book.price.shape == book.caps.shape == (3, len(months))
+    assert np.all(book.price[0] == 10.0) and np.isnan(book.price[1:]).all()
+    assert np.all(book.caps[0] == 5.0) and not book.caps[1:].any()
+    assert dict(book[1].price) == {} and book[2].probability_of_default == 0.2
+    assert math.isclose(book[0].probability_of_default, LNGBuyer("a", "JP", "Term", "A", 1.0, {}).probability_of_default)
+
+def test_from_records_infers_months_in_first_seen_order():
+    recs = [_record("a", {"Feb-2026": 1.0}), _record("b", {"Jan-2026": 2.0, "Feb-2026": 3.0})]
+    book = BuyerBook.from_records(recs)
+    assert book.months == ["Feb-2026", "Jan-2026"]
+    assert dict(book.row("a").price) == {"Feb-2026": 1.0}
+    assert np.array_equal(book.price_matrix(["Jan-2026", "Mar-2026"]), [[np.nan, 2.0], [np.nan, np.nan]],
+                          equal_nan=True)
+
+# LNGMonth's dataclass fields plus its derived properties
+MONTH_ATTRS = [f.name for f in dataclasses.fields(LNGMonth)] + [
+    n for n, v in vars(LNGMonth).items() if isinstance(v, property)]
+
+def test_month_view_reads_like_lng_month():
+    for view in HORIZON:
+        month = view.to_month()
+        assert isinstance(month, LNGMonth)
+        for attr in MONTH_ATTRS:
+            assert getattr(view, attr) == getattr(month, attr), attr
+    assert HORIZON[-1].month == HORIZON.labels[-1] and HORIZON["Feb-2026"].month == "Feb-2026"
+    with pytest.raises(IndexError):
+        HORIZON[len(HORIZON)]
+
+def test_from_months_round_trip():
+    months = HORIZON.to_months()
+    back = MarketHorizon.from_months(months)
+    assert back.labels == HORIZON.labels and back.dests == HORIZON.dests
+    np.testing.assert_allclose(back.voyage_days, HORIZON.voyage_days)
+    assert back.final_costs() == HORIZON.final_costs()
+    assert back.to_months() == months
@@ -0,0 +1,67 @@
+from __future__ import annotations
+import numpy as np
+import pulp
+import pytest
+
+from model.network import allocate_network
+
+def _instance(seed: int, n_m: int = 4, n_b: int = 8, n_c: int = 3, n_t: int = 2):
+    rng = np.random.default_rng(seed)
+    price = rng.normal(10.0, 2.0, (n_m, n_b))
+    price[rng.random(price.shape) < 0.15] = np.nan  # no bid
+    return {
+        "price": price, "cost": rng.normal(9.0, 1.5, (n_m, n_b)), "cap": rng.uniform(0.0, 4.0, (n_m, n_b)),
+        "pd_": rng.uniform(0.0, 0.2, n_b), "country_idx": rng.integers(0, n_c, n_b),
+        "country_totals": rng.uniform(1.0, 8.0, (n_m, n_c)), "month_supply": rng.uniform(2.0, 12.0, n_m),
+        "total_supply": float(rng.uniform(5.0, 30.0)),
+        "terminal_supply": rng.uniform(0.0, 6.0, (n_t, n_m)), "terminal_cost": rng.uniform(0.0, 1.0, n_t),
+        "storage_cost": float(rng.uniform(0.0, 0.5)),
+    }
+
+def _lp(inst, terminals: bool, storage: bool) -> float:
+    "The same network as an LP: max margin * x less terminal and storage costs."
+    margin = inst["price"] - inst["cost"]
+    cap = np.where(np.isnan(margin), 0.0, inst["cap"])
+    n_m, n_b = margin.shape
+    supply = inst["terminal_supply"] if terminals else inst["month_supply"][None, :]
+    t_cost = inst["terminal_cost"] if terminals else np.zeros(1)
+    m = pulp.LpProblem("network", pulp.LpMaximize)
+    x = [[pulp.LpVariable(f"x_{i}_{j}", 0, float(cap[i, j])) for j in range(n_b)] for i in range(n_m)]
+    y = [[pulp.LpVariable(f"y_{t}_{i}", 0, float(supply[t, i])) for i in range(n_m)] for t in range(len(supply))]
+    s = [pulp.LpVariable(f"s_{i}", 0) if storage else 0.0 for i in range(n_m - 1)] + [0.0]
+    m += (pulp.lpSum(float(np.nan_to_num(margin[i, j])) * x[i][j] for i in range(n_m) for j in range(n_b))
+          - pulp.lpSum(float(t_cost[t]) * y[t][i] for t in range(len(supply)) for i in range(n_m))
+          - inst["storage_cost"] * pulp.lpSum(s[:-1]))
+    for i in range(n_m):
+        sold = pulp.lpSum(x[i])
+        carried_in = s[i - 1] if i else 0.0
+        m += pulp.lpSum(y[t][i] for t in range(len(supply))) + carried_in == sold + s[i]
+        m += sold <= float(inst["month_supply"][i])
+        for c in range(inst["country_totals"].shape[1]):
+            m += pulp.lpSum(x[i][j] for j in np.flatnonzero(inst["country_idx"] == c)) <= float(inst["country_totals"][i, c])
+    m += pulp.lpSum(x[i][j] for i in range(n_m) for j in range(n_b)) <= inst["total_supply"]
+    m.solve(pulp.PULP_CBC_CMD(msg=False))
+    return float(pulp.value(m.objective))
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("terminals, storage", [(False, False), (False, True), (True, True)])
+def test_matches_lp(seed, terminals, storage):
+    inst = _instance(seed)
+    kwargs = {k: inst[k] for k in ("price", "cost", "cap", "pd_", "country_idx", "country_totals",
+                                   "month_supply", "total_supply")}
+    if terminals:
+        kwargs.update(terminal_supply=inst["terminal_supply"], terminal_cost=inst["terminal_cost"])
+    if storage:
+        kwargs.update(storage_cost=inst["storage_cost"])
+    res = allocate_network(**kwargs)
+    assert res["method"] == ("ssp" if terminals or storage else "tree")
+    assert np.isclose(res["objective"], _lp(inst, terminals, storage), rtol=1e-7, atol=1e-7)
+
+    x = res["allocation"]
+    assert (x >= -1e-9).all() and (x <= np.where(np.isnan(inst["price"]), 0.0, inst["cap"]) + 1e-9).all()
+    assert (x.sum(axis=1) <= inst["month_supply"] + 1e-9).all() and x.sum() <= inst["total_supply"] + 1e-9
+    assert (res["country_flow"] <= inst["country_totals"] + 1e-9).all()
+    margin = np.nan_to_num(inst["price"] - inst["cost"])
+    assert (x[margin <= 0] == 0).all()  # only profitable arcs carry flow
+    if not storage:
+        assert np.isclose(res["objective"], (margin * x).sum())
@@ -0,0 +1,143 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+import pulp
+import pytest
+
+from model import optimisation
+from model.financials import build_unit_profit_table
+from model.optimisation import AllocationModel, optimise_cargo_lots, sort_and_fill, sort_and_fill_batch
+from model.scenarios import scenario_grid
+
+def _table(rng, n: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "code": [f"P{i}" for i in range(n)],
+        "unit_profit": rng.normal(1.0, 2.0, n),
+        "monthly_capacity_cargo": rng.uniform(0.5, 5.0, n),
+    })
+
+@pytest.mark.parametrize("seed", range(8))
+def test_closed_form_matches_cbc(seed):
+    rng = np.random.default_rng(seed)
+    table = _table(rng, int(rng.integers(2, 12)))
+    supply = float(rng.uniform(0.0, table["monthly_capacity_cargo"].sum() * 1.2))
+    closed = AllocationModel(table, supply).solve(sensitivity=True)
+    # a no-op extra constraint forces the PuLP/CBC path
+    cbc = AllocationModel(table, supply, extra_constraints=[lambda m, x: None]).solve(sensitivity=True)
+
+    assert closed["objective"] == pytest.approx(cbc["objective"], rel=1e-6, abs=1e-6)
+    for c in table["code"]:
+        assert closed["allocation"][c] == pytest.approx(cbc["allocation"][c], abs=1e-6)
+        assert closed["sensitivity"]["reduced_cost"][c] == pytest.approx(cbc["sensitivity"]["reduced_cost"][c],
+                                                                         abs=1e-6)
+    assert closed["sensitivity"]["supply_dual"] == pytest.approx(cbc["sensitivity"]["supply_dual"], abs=1e-6)
+
+def test_batch_matches_scalar():
+    rng = np.random.default_rng(1)
+    profit = rng.normal(0.5, 2.0, (4, 6, 7))
+    cap = rng.uniform(0.0, 3.0, 7)
+    supply = rng.uniform(0.0, 15.0, (4, 6))
+    x = sort_and_fill_batch(profit, cap, supply)
+    for i in range(4):
+        for j in range(6):
+            np.testing.assert_allclose(x[i, j], sort_and_fill(profit[i, j], cap, supply[i, j]))
+
+def test_infinite_capacity_stays_finite():
+    x = sort_and_fill(np.array([1.0, 3.0, 2.0]), np.array([np.inf, 2.0, 1.0]), 10.0)
+    np.testing.assert_array_equal(x, [7.0, 2.0, 1.0])
+    x = sort_and_fill_batch(np.array([[3.0, 2.0]]), np.array([np.inf, 5.0]), [4.0])
+    np.testing.assert_array_equal(x, [[4.0, 0.0]])
+
+def _rebuilt_table(ports, price_map, assumptions, scenario) -> pd.DataFrame:
+    "Unit table rebuilt at the scenario's shocked prices and scaled capacities."
+    prices = {c: p + scenario["price_shocks"].get(c, 0.0) for c, p in price_map.items()}
+    ports = ports.assign(monthly_capacity_cargo=ports["monthly_capacity_cargo"]
+                         * ports["code"].map(scenario["capacity_multipliers"]).fillna(1.0))
+    return build_unit_profit_table(ports, prices, assumptions)
+
+def test_apply_scenario_and_warm_resolve_match_rebuild():
+    rng = np.random.default_rng(11)
+    ports = pd.DataFrame({"name": [f"Port {i}" for i in range(6)], "code": [f"P{i}" for i in range(6)],
+                          "distance_nm": rng.uniform(300.0, 3000.0, 6),
+                          "monthly_capacity_cargo": rng.uniform(2.0, 8.0, 6),
+                          "handling_fee_per_unit": rng.uniform(0.0, 0.5, 6)})
+    price_map = dict(zip(ports["code"], rng.uniform(10.0, 16.0, 6)))
+    assumptions = {"boiloff_rate_per_1000nm": 0.0015, "freight_cost_per_nm_per_unit": 0.002,
+                   "variable_cost_per_unit": 5.0}
+
+    def joint_cap(m, x):  # keeps every solve on the CBC path
+        m += x["P0"] + x["P1"] <= 5.0, "JointCap"
+
+    model = AllocationModel(build_unit_profit_table(ports, price_map, assumptions), 10.0, [joint_cap])
+    scenarios = list(scenario_grid({"P0": [0.0, 4.0], "P3": [0.0, -6.0]}, {"P1": [1.0, 0.25]}, [8.0, 25.0]))
+    lp = None
+    for sc in scenarios:
+        model.apply_scenario(sc)
+        model.set_supply(sc["supply"])
+        got = model.solve(sensitivity=True)
+        lp = lp or model._lp
+        assert model._lp is lp  # updated in place, not rebuilt
+
+        table = _rebuilt_table(ports, price_map, assumptions, sc)
+        assert np.allclose(model.profit, table["unit_profit"], rtol=0, atol=1e-12)
+        assert np.allclose(model.capacity, table["monthly_capacity_cargo"], rtol=0, atol=0)
+        ref = AllocationModel(table, sc["supply"], [joint_cap]).solve(sensitivity=True)
+        assert np.isclose(got["objective"], ref["objective"], rtol=1e-9)
+        assert np.allclose(list(got["allocation"].values()), list(ref["allocation"].values()), atol=1e-9)
+        assert np.isclose(got["sensitivity"]["supply_dual"], ref["sensitivity"]["supply_dual"], atol=1e-9)
+
+def _lots_instance(T: int, D: int = 5, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    season = np.cos(2 * np.pi * np.arange(T) / 12.0)[:, None]
+    up = 1.0 + 1.5 * season * rng.uniform(0.5, 1.5, D) + rng.normal(0.0, 1.0, (T, D))
+    return up, rng.integers(0, 4, (T, D)), np.full(T, 4), rng.integers(1, 4, D)
+
+def _assert_feasible(res, cap, lots, voyage_months, fleet):
+    x = res["lots"]
+    assert np.array_equal(x, np.round(x)) and (x >= 0).all() and (x <= cap).all()
+    assert np.allclose(res["lifted"] + res["cancelled"], lots) and (res["cancelled"] >= 0).all()
+    T = len(x)
+    at_sea = np.zeros(T + int(voyage_months.max()))
+    for t, d in zip(*np.nonzero(x)):
+        at_sea[t:t + voyage_months[d]] += x[t, d]
+    assert (at_sea[:T] <= fleet + 1e-9).all()
+
+@pytest.mark.parametrize("seed", range(3))
+def test_cargo_lots_feasible_and_bounded(seed):
+    up, cap, lots, vm = _lots_instance(24, seed=seed)
+    res = optimise_cargo_lots(up, cap, lots, 1.5, vm, fleet=5, window=8, overlap=4, lot_volume=1.0,
+                              window_bounds=True)
+    _assert_feasible(res, cap, lots, vm, 5)
+    assert res["objective"] <= res["bound"] + 1e-6
+    for w in res["windows"]:
+        assert w["objective"] <= w["bound"] + 1e-6
+
+def test_cargo_lots_windows_vs_monolithic():
+    up, cap, lots, vm = _lots_instance(12, seed=4)
+    mono = optimise_cargo_lots(up, cap, lots, 1.5, vm, fleet=5, window=12, overlap=0, time_limit=None,
+                               lot_volume=1.0)
+    roll = optimise_cargo_lots(up, cap, lots, 1.5, vm, fleet=5, window=6, overlap=3, lot_volume=1.0)
+    assert roll["objective"] <= mono["objective"] + 1e-6 <= mono["bound"] + 2e-6
+    assert len(mono["windows"]) == 1 and np.isnan(mono["windows"][0]["bound"])
+    # without a fleet the months decouple, so rolling windows lose nothing
+    mono = optimise_cargo_lots(up, cap, lots, 1.5, window=12, overlap=0, lot_volume=1.0)
+    roll = optimise_cargo_lots(up, cap, lots, 1.5, window=4, overlap=2, lot_volume=1.0)
+    assert np.isclose(roll["objective"], mono["objective"])
+
+def test_cargo_lots_rounds_relaxation_without_incumbent(monkeypatch):
+    window = optimisation._lot_window
+
+    def no_incumbent(*args, relax):
+        m, n = window(*args, relax=relax)
+        if not relax:  # as if CBC hit the time limit before finding a solution
+            def solve(solver=None):
+                m.status, m.sol_status = pulp.LpStatusNotSolved, pulp.LpSolutionNoSolutionFound
+                return m.status
+            m.solve = solve
+        return m, n
+    monkeypatch.setattr(optimisation, "_lot_window", no_incumbent)
+    up, cap, lots, vm = _lots_instance(12, seed=1)
+    res = optimise_cargo_lots(up, cap, lots, 1.5, vm, fleet=5, window=6, overlap=3, lot_volume=1.0)
+    assert {w["status"] for w in res["windows"]} == {"Rounded relaxation"}
+    _assert_feasible(res, cap, lots, vm, 5)
+    assert res["objective"] <= res["bound"] + 1e-6
@@ -0,0 +1,24 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+
+from model.pool import bounded_map, worker_pool
+
+def test_bounded_map_keeps_order_and_reads_a_bounded_window_ahead():
+    drawn = []
+
+    def jobs():
+        for i in range(10_000):
+            drawn.append(i)
+            yield i
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = bounded_map(pool, lambda i: i * i, jobs(), in_flight=4)
+        assert [next(results) for _ in range(3)] == [0, 1, 4]
+        assert len(drawn) <= 4 + 3  # the window plus one refill per result
+        results.close()
+        assert list(bounded_map(pool, lambda i: -i, range(50), in_flight=3)) == [-i for i in range(50)]
+
+def test_worker_pool_in_process_runs_the_initializer():
+    base = {}
+    with worker_pool(1, base.update, ({"k": 3},)) as run:
+        assert list(run(lambda i: i + base["k"], range(4))) == [3, 4, 5, 6]
@@ -0,0 +1,43 @@
+from __future__ import annotations
+import random
+
+import numpy as np
+import pytest
+
+from model.schedule import SegmentTree, schedule_sendout
+
+def test_segment_tree_matches_brute_force():
+    rng = random.Random(1)
+    n = 365
+    values = np.array([rng.uniform(0, 10) for _ in range(n)])
+    tree = SegmentTree(values)
+    for _ in range(3000):
+        op, lo = rng.randrange(4), rng.randrange(n)
+        hi = rng.randrange(lo + 1, n + 1)
+        if op == 0:
+            v = rng.uniform(-3, 3)
+            tree.add(lo, hi, v)
+            values[lo:hi] += v
+        elif op == 1:
+            assert tree.sum(lo, hi) == pytest.approx(values[lo:hi].sum())
+        elif op == 2:
+            assert tree.max(lo, hi) == pytest.approx(values[lo:hi].max())
+        else:
+            th = rng.uniform(0, 10)
+            above = np.flatnonzero(values[lo:] > th)
+            assert tree.first_above(lo, th) == (lo + above[0] if len(above) else -1)
+    np.testing.assert_allclose(tree.values(), values)
+
+def test_schedule_conserves_volume_within_capacity():
+    months = [f"{m}-2026" for m in ("Jan", "Feb", "Mar", "Apr")]
+    volume = {m: 11_400_000.0 for m in months}
+    res = schedule_sendout(volume, outages=[("2026-02-10", "2026-02-20", 0.8)])
+    assert res["sendout"].sum() == pytest.approx(sum(volume.values()))
+    assert (res["sendout"] <= res["capacity"] + 1e-6).all()
+    assert (res["berths_used"] <= 1).all()
+    assert res["feasible"]
+
+def test_schedule_reports_unserved_volume():
+    res = schedule_sendout({"Jan-2026": 5e7}, daily_cap=1_000_000)
+    assert res["unserved"]["Jan-2026"] == pytest.approx(5e7 - 31 * 1_000_000)
+    assert not res["feasible"]
@@ -0,0 +1,46 @@
+from __future__ import annotations
+import numpy as np
+import pytest
+
+from model.optimisation import sort_and_fill
+from model.sensitivity import fill_sensitivity
+
+def _objective(p, u, S) -> float:
+    return float(p @ sort_and_fill(p, u, S))
+
+@pytest.mark.parametrize("seed", range(10))
+def test_duals_match_finite_differences(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(2, 9))
+    p, u = rng.normal(1.0, 2.0, n), rng.uniform(0.5, 4.0, n)
+    S = float(rng.uniform(0.0, u.sum() * 1.2))
+    s = fill_sensitivity(p[None], u[None], S, sort_and_fill(p, u, S)[None])
+    h = 1e-6  # random data: no breakpoint within h of the solution
+    base = _objective(p, u, S)
+    assert s["supply_dual"][0] == pytest.approx((_objective(p, u, S + h) - base) / h, abs=1e-4)
+    for d in range(n):
+        bumped = u.copy()
+        bumped[d] += h
+        assert s["cap_dual"][0, d] == pytest.approx((_objective(p, bumped, S) - base) / h, abs=1e-4)
+
+@pytest.mark.parametrize("seed", range(10))
+def test_ranges_keep_the_basis(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(2, 9))
+    p, u = rng.normal(1.0, 2.0, n), rng.uniform(0.5, 4.0, n)
+    S = float(rng.uniform(0.0, u.sum() * 1.2))
+    x = sort_and_fill(p, u, S)
+    s = fill_sensitivity(p[None], u[None], S, x[None])
+    lo, hi = s["supply_range"][0]
+    lam = s["supply_dual"][0]
+    for S2 in np.linspace(lo, min(hi, lo + 10.0), 5)[1:-1]:
+        # inside the range the objective is linear in supply with slope lam
+        assert _objective(p, u, S2) == pytest.approx(_objective(p, u, S) + lam * (S2 - S), abs=1e-9)
+
+def test_infinite_capacity():
+    p, u = np.array([1.0, 3.0, 2.0]), np.array([np.inf, 2.0, 1.0])
+    x = sort_and_fill(p, u, 10.0)
+    s = fill_sensitivity(p[None], u[None], 10.0, x[None])
+    assert s["supply_dual"][0] == 1.0
+    assert np.isfinite(s["supply_range"][0, 0])
+    np.testing.assert_allclose(s["cap_dual"][0], [0.0, 2.0, 1.0])
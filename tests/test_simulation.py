@@ -0,0 +1,55 @@
+from __future__ import annotations
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from model.financials import unit_profit_arrays
+from model.optimisation import sort_and_fill_batch
+from model.simulation import price_model, simulate_pnl, simulate_prices
+
+DATA = Path(__file__).resolve().parent.parent / "data"
+MONTHS = [f"2026-{m:02d}" for m in range(1, 13)]
+
+def _inputs():
+    return pd.read_csv(DATA / "ports.csv"), json.loads((DATA / "base_inputs.json").read_text())
+
+@pytest.mark.parametrize("kind", ["gbm", "ou"])
+def test_mean_price_is_the_seasonal_forward(kind):
+    ports, inputs = _inputs()
+    model = price_model(ports, inputs, MONTHS, kind=kind)
+    prices = simulate_prices(model, 200_000, seed=1)
+    stderr = prices.std(axis=0) / np.sqrt(len(prices))
+    assert np.all(np.abs(prices.mean(axis=0) - model["forward"]) < 5 * stderr)
+    # seasonality comes through: January (winter) above June (summer) for every port
+    assert np.all(model["forward"][0] > model["forward"][5])
+
+def test_pnl_does_not_depend_on_workers():
+    ports, inputs = _inputs()
+    kwargs = dict(paths=3_000, chunk_paths=700, seed=5, kind="ou", elastic_capacity=True)
+    serial = simulate_pnl(ports, inputs, MONTHS, workers=1, **kwargs)
+    pooled = simulate_pnl(ports, inputs, MONTHS, workers=2, **kwargs)
+    assert np.array_equal(serial["pnl"], pooled["pnl"])
+    for key in ("month_pnl_mean", "allocation_mean", "price_mean"):
+        assert np.array_equal(serial[key], pooled[key])
+
+def test_elastic_capacity_scales_with_price():
+    ports, inputs = _inputs()
+    supply = 40.0  # above the base caps, so capacity binds
+    res = simulate_pnl(ports, inputs, MONTHS, paths=500, seed=2, supply=supply, elastic_capacity=True)
+    model = price_model(ports, inputs, MONTHS)
+    prices = simulate_prices(model, 500, np.random.SeedSequence(2).spawn(1)[0])
+    profit = unit_profit_arrays(ports, prices, inputs["assumptions"])["unit_profit"]
+    cap = ports["monthly_capacity_cargo"].to_numpy(dtype=float) * (prices / model["forward"]) ** model["elasticity"]
+    x = sort_and_fill_batch(profit, cap, supply)
+    np.testing.assert_allclose(res["pnl"], (x * profit).sum(axis=(1, 2)), rtol=1e-12)
+    fixed = simulate_pnl(ports, inputs, MONTHS, paths=500, seed=2, supply=supply)
+    assert not np.allclose(res["pnl"], fixed["pnl"])
+
+    # with no volatility prices sit on the forward and elastic caps are the base caps
+    flat = dict(inputs, market_volatility={})
+    a = simulate_pnl(ports, flat, MONTHS, paths=50, supply=supply, elastic_capacity=True)
+    b = simulate_pnl(ports, flat, MONTHS, paths=50, supply=supply)
+    np.testing.assert_allclose(a["pnl"], b["pnl"], rtol=1e-12)
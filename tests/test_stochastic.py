@@ -0,0 +1,41 @@
+from __future__ import annotations
+import itertools
+
+import numpy as np
+import pytest
+
+from model.optimisation import sort_and_fill_batch
+from model.stochastic import solve_two_stage
+
+def _instance(seed: int):
+    rng = np.random.default_rng(seed)
+    profit = rng.normal(0.5, 2.0, (40, 3, 4))
+    capacity = rng.integers(0, 3, (40, 3, 4)).astype(float)
+    return profit, capacity, rng.dirichlet(np.ones(40))
+
+def _plan_value(profit, capacity, prob, plan, lots, cancel, distress) -> float:
+    p = profit + distress
+    x = sort_and_fill_batch(p, capacity, np.broadcast_to(plan, profit.shape[:2]))
+    q = (p * x).sum(axis=-1) - distress * np.asarray(plan)
+    return float(prob @ q.sum(axis=1) - cancel * (lots - np.asarray(plan)).sum())
+
+@pytest.mark.parametrize("seed,max_cancel", [(0, None), (1, 3), (2, 1)])
+def test_benders_matches_enumeration(seed, max_cancel):
+    profit, capacity, prob = _instance(seed)
+    lots = np.array([5.0, 4.0, 6.0])
+    kw = dict(cancel_cost=0.7, distress_cost=2.0)
+    res = solve_two_stage(profit, capacity, lots, prob, max_cancel=max_cancel, **kw)
+    best = max(_plan_value(profit, capacity, prob, plan, lots, 0.7, 2.0)
+               for plan in itertools.product(*(range(int(n) + 1) for n in lots))
+               if max_cancel is None or (lots - plan).sum() <= max_cancel)
+    assert res["objective"] == pytest.approx(best, abs=1e-9)
+    assert res["objective"] == pytest.approx(_plan_value(profit, capacity, prob, res["lift"], lots, 0.7, 2.0))
+    assert res["gap"] <= 1e-6
+
+def test_workers_do_not_change_the_result():
+    profit, capacity, prob = _instance(3)
+    kw = dict(cancel_cost=0.5, max_cancel=2, chunk_scenarios=7)
+    one = solve_two_stage(profit, capacity, 4.0, prob, workers=1, **kw)
+    two = solve_two_stage(profit, capacity, 4.0, prob, workers=2, **kw)
+    np.testing.assert_array_equal(one["lift"], two["lift"])
+    np.testing.assert_array_equal(one["scenario_value"], two["scenario_value"])
@@ -0,0 +1,29 @@
+from __future__ import annotations
+import threading
+
+from model import trace
+
+def _session(on: bool, name: str, ready: threading.Barrier, out: dict) -> None:
+    run = trace.start_run(on)
+    ready.wait()  # both runs started before either records
+    for _ in range(3):
+        with trace.span(name):
+            pass
+    ready.wait()  # and both finished before either reads
+    out[name] = (run, trace.enabled(), trace.snapshot(run=True), trace.events(run))
+
+def test_runs_are_isolated_per_thread():
+    out, ready = {}, threading.Barrier(2)
+    threads = [threading.Thread(target=_session, args=(True, "a", ready, out)),
+               threading.Thread(target=_session, args=(False, "b", ready, out))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    run_a, on_a, rows_a, events_a = out["a"]
+    run_b, on_b, rows_b, events_b = out["b"]
+    assert run_a != run_b and on_a and not on_b
+    assert [(r["span"], r["count"]) for r in rows_a] == [("a", 3)]
+    assert rows_b == [] and events_b == []
+    assert {e["name"] for e in events_a} == {"a"}
+    assert trace.current_run() is None and trace.snapshot(run=True) == []